@@ -2,7 +2,7 @@ from .ttree import BasicUISettings, BasicUIParseArgs, EraseTemplateFiles, \
     StackableCommand, PopCommand, PopRightCommand, PopLeftCommand, \
     PushCommand, PushLeftCommand, PushRightCommand, ScopeCommand, \
     WriteVarBindingsFile, StaticObj, InstanceObj, ExtractFormattingCommands, \
-    BasicUI, ScopeBegin, ScopeEnd, WriteFileCommand, Render
+    BasicUI, ScopeBegin, ScopeEnd, WriteFileCommand, Render, VarBindingFullName
 from .ttree_lex import TtreeShlex, split, LineLex, SplitQuotedString, \
     EscCharStrToChar, SafelyEncodeString, RemoveOuterQuotes, MaxLenStr, \
     HasWildcard, InputError, ErrorLeader, SrcLoc, OSrcLoc, TextBlock, VarRef, \
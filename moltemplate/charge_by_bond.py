@@ -5,8 +5,8 @@
 # All rights reserved.
 
 g_program_name = __file__.split('/')[-1]   # = 'charge_by_bond.py'
-g_date_str = '2017-10-03'
-g_version_str = '0.14.0'
+g_date_str = '2026-10-18'
+g_version_str = '0.15.0'
 
 
 import sys
@@ -21,6 +21,51 @@ except (SystemError, ValueError):
     import ttree_lex
     from lttree_styles import AtomStyle2ColNames, ColNames2AidAtypeMolid
 
+try:
+    import numpy as np
+except ImportError:
+    # (numpy is optional.  It is only used to speed up the final summation.)
+    np = None
+
+
+def _SplitLine(line):
+    """
+    Split a line into tokens and replace escape sequences in each token.
+    (Most lines contain no quotes or backslashes.  In that case we can skip
+     the slow character-by-character parsing in SplitQuotedString().)
+
+    """
+    if ('\\' in line) or ('\"' in line) or ('\'' in line):
+        return [ttree_lex.EscCharStrToChar(token)
+                for token in ttree_lex.SplitQuotedString(line)]
+    return line.split()
+
+
+
+def _MatchChargePairRules(atomtype1, atomtype2, typepattern_to_chargepairs):
+    """
+    Find the total change in charge of two bonded atoms (of type atomtype1
+    and atomtype2) by applying every rule in typepattern_to_chargepairs.
+    Returns a tuple (dq1, dq2, found) where "found" is False if no rules
+    matched this pair of atom types.
+
+    """
+    dq1 = 0.0
+    dq2 = 0.0
+    found = False
+    for typepattern, chargepair in typepattern_to_chargepairs:
+        # use string comparisons to check if atom types match the pattern
+        if ttree_lex.MatchesAll((atomtype1, atomtype2), typepattern):
+            # ("MatchesAll()" defined in "ttree_lex.py")
+            dq1 += chargepair[0]
+            dq2 += chargepair[1]
+            found = True
+        elif ttree_lex.MatchesAll((atomtype2, atomtype1), typepattern):
+            dq1 += chargepair[1]
+            dq2 += chargepair[0]
+            found = True
+    return dq1, dq2, found
+
 
 
 def LookupChargePairs(chargebyatomid,
@@ -61,9 +106,14 @@ def LookupChargePairs(chargebyatomid,
     column_names = AtomStyle2ColNames(atom_style)
     i_atomid, i_atomtype, i_molid = ColNames2AidAtypeMolid(column_names)
 
+    # Atom-ids are mapped to integer row indices, and atom-types are mapped
+    # to small integers, so that the rules only need to be matched once for
+    # each distinct pair of atom types (rather than once for every bond).
     atomids = []
-    atomtypes = []
-    atomids2types = {}
+    atomid2index = {}
+    atomtype2itype = {}
+    atomtypes = []      # <-- the distinct atom types, in order of appearance
+    atom_itypes = []    # <-- the type (index into atomtypes) for each atom
 
     for iv in range(0, len(lines_atoms)):
         line = lines_atoms[iv].strip()
@@ -71,24 +121,26 @@ def LookupChargePairs(chargebyatomid,
             icomment = line.find('#')
             line = (line[:icomment]).strip()
         if len(line) > 0:
-            tokens = ttree_lex.SplitQuotedString(line)
+            tokens = _SplitLine(line)
             if ((len(tokens) <= i_atomid) or (len(tokens) <= i_atomtype)):
                 sys.stderr.write("\"" + line + "\"\n")
                 raise(ttree_lex.InputError(
                     'Error not enough columns on line ' + str(iv + 1) + ' of \"Atoms\" section.'))
-            tokens = ttree_lex.SplitQuotedString(line)
-            atomid = ttree_lex.EscCharStrToChar(tokens[i_atomid])
-            atomids.append(atomid)
-            atomtype = ttree_lex.EscCharStrToChar(tokens[i_atomtype])
-            atomtypes.append(atomtype)
-            atomids2types[atomid] = atomtype
-
-    #assert(isinstance(bond_ids, list))
-    #assert(isinstance(bond_types, list))
-    #assert(isinstance(bond_pairs, list))
-    #del bond_ids[:]
-    #del bond_types[:]
-    #del bond_pairs[:]
+            atomid = tokens[i_atomid]
+            atomtype = tokens[i_atomtype]
+            itype = atomtype2itype.get(atomtype)
+            if itype is None:
+                itype = len(atomtypes)
+                atomtype2itype[atomtype] = itype
+                atomtypes.append(atomtype)
+            if atomid in atomid2index:
+                # (If an atom-id appears twice, the last definition wins.)
+                atom_itypes[atomid2index[atomid]] = itype
+            else:
+                atomid2index[atomid] = len(atomids)
+                atomids.append(atomid)
+                atom_itypes.append(itype)
+
     bond_pairs = []
 
     for ie in range(0, len(lines_bond_list)):
@@ -98,11 +150,9 @@ def LookupChargePairs(chargebyatomid,
             line = (line[:icomment]).strip()
         if len(line) == 0:
             continue
-        tokens = ttree_lex.SplitQuotedString(line)
+        tokens = _SplitLine(line)
         if len(tokens) == 3:
-            # bond_ids.append(ttree_lex.EscCharStrToChar(tokens[0]))
-            bond_pairs.append((ttree_lex.EscCharStrToChar(tokens[1]),
-                               ttree_lex.EscCharStrToChar(tokens[2])))
+            bond_pairs.append((tokens[1], tokens[2]))
         else:
             raise(ttree_lex.InputError('Incorrect number of columns on line ' +
                                        str(ie + 1) + ' of \"' + section_name + '\" section.'))
@@ -114,33 +164,13 @@ def LookupChargePairs(chargebyatomid,
             line = (line[:icomment]).strip()
         if len(line) == 0:
             continue
-        tokens = ttree_lex.SplitQuotedString(line)
+        tokens = _SplitLine(line)
         if len(tokens) == 4:
-            # bond_ids.append(ttree_lex.EscCharStrToChar(tokens[0]))
-            # bond_types.append(ttree_lex.EscCharStrToChar(tokens[1]))
-            bond_pairs.append((ttree_lex.EscCharStrToChar(tokens[2]),
-                               ttree_lex.EscCharStrToChar(tokens[3])))
+            bond_pairs.append((tokens[2], tokens[3]))
         else:
             raise(ttree_lex.InputError('Incorrect number of columns on line ' +
                                        str(ie + 1) + ' of \"' + section_name + '\" section.'))
 
-    # for ie in range(0, len(lines_bonds_atomid_atomid)):
-    #    line = lines_bonds_atomid_atomid[ie].strip()
-    #    if '#' in line:
-    #        icomment = line.find('#')
-    #        line = (line[:icomment]).strip()
-    #    if len(line) == 0:
-    #        continue
-    #    tokens = ttree_lex.SplitQuotedString(line)
-    #    if len(tokens) == 2:
-    #        #bondid_n = bond_ids_offset + len(bond_ids) + 1
-    #        #bond_ids.append(prefix+str(bondid_n)+suffix)
-    #        bond_pairs.append( (ttree_lex.EscCharStrToChar(tokens[0]),
-    #                            ttree_lex.EscCharStrToChar(tokens[1])) )
-    #    else:
-    #        raise(ttree_lex.InputError('Incorrect number of columns on line '+str(ie+1)+' of \"'+section_name+'\" section.'))
-
-    #assert(len(bond_types) == 0)
     typepattern_to_chargepairs = []
     warning_unassigned_chargepairs = None
 
@@ -173,41 +203,75 @@ def LookupChargePairs(chargebyatomid,
 
             typepattern_to_chargepairs.append([typepattern, chargepair])
 
+    # Convert the bonded pairs of atom-ids into pairs of integer row indices.
+    # "bond_atoms" stores them interleaved: [a1, b1, a2, b2, ...]
+    # so that the charge increments are accumulated in the same order as the
+    # bonds appear in the file (which keeps the floating point sums identical).
+    bond_atoms = []
     for atomid1, atomid2 in bond_pairs:
-
-        if atomid1 not in atomids2types:
-            raise ttree_lex.InputError('Error: atom \"' + atomid1 + '\" not defined in \"Data Atoms\".\n'
-                                       '       This usually happens when the user mistypes one of the names of the\n'
-                                       '       $atoms in either a \"Data Atoms\" or \"Data Bond List\" section.\n'
-                                       '       To find out where the mistake occured, search the \n'
-                                       '       \"ttree_assignments.txt\" file for:\n'
-                                       '       \"' + atomid1 + '\"\n')
-
-        if atomid2 not in atomids2types:
-            raise ttree_lex.InputError('Error: atom \"' + atomid2 + '\" not defined in \"Data Atoms\".\n'
-                                       '       This usually happens when the user mistypes one of the names of the\n'
-                                       '       $atoms in either a \"Data Atoms\" or \"Data Bond List\" section.\n'
-                                       '       To find out where the mistake occured, search the \n'
-                                       '       \"ttree_assignments.txt\" file for:\n'
-                                       '       \"' + atomid2 + '\"\n')
-
-        atomtype1 = atomids2types[atomid1]
-        atomtype2 = atomids2types[atomid2]
-
-        found = False
-        for typepattern, chargepair in typepattern_to_chargepairs:
-            # use string comparisons to check if atom types match the pattern
-            if ttree_lex.MatchesAll((atomtype1, atomtype2), typepattern):
-                # ("MatchesAll()" defined in "ttree_lex.py")
-                chargebyatomid[atomid1] += chargepair[0]
-                chargebyatomid[atomid2] += chargepair[1]
-                found = True
-            elif ttree_lex.MatchesAll((atomtype2, atomtype1), typepattern):
-                chargebyatomid[atomid1] += chargepair[1]
-                chargebyatomid[atomid2] += chargepair[0]
-                found = True
+        for atomid in (atomid1, atomid2):
+            if atomid not in atomid2index:
+                raise ttree_lex.InputError('Error: atom \"' + atomid + '\" not defined in \"Data Atoms\".\n'
+                                           '       This usually happens when the user mistypes one of the names of the\n'
+                                           '       $atoms in either a \"Data Atoms\" or \"Data Bond List\" section.\n'
+                                           '       To find out where the mistake occured, search the \n'
+                                           '       \"ttree_assignments.txt\" file for:\n'
+                                           '       \"' + atomid + '\"\n')
+            bond_atoms.append(atomid2index[atomid])
+
+    # Look up the change in charge for each bond.  The rules are matched
+    # against each distinct pair of atom types only once and then cached.
+    typepair2chargepair = {}
+    bond_dq = []     # <-- charge increments (interleaved like "bond_atoms")
+    bond_found = []  # <-- did any rule match this bond? (also interleaved)
+    for ib in range(0, len(bond_pairs)):
+        iatom1 = bond_atoms[2 * ib]
+        iatom2 = bond_atoms[2 * ib + 1]
+        typepair = (atom_itypes[iatom1], atom_itypes[iatom2])
+        cached = typepair2chargepair.get(typepair)
+        if cached is None:
+            cached = _MatchChargePairRules(atomtypes[typepair[0]],
+                                           atomtypes[typepair[1]],
+                                           typepattern_to_chargepairs)
+            typepair2chargepair[typepair] = cached
+        dq1, dq2, found = cached
+        bond_dq.append(dq1)
+        bond_dq.append(dq2)
+        bond_found.append(found)
+        bond_found.append(found)
         if (not found) and (not warning_unassigned_chargepairs):
-            warning_unassigned_chargepairs = (atomid1, atomid2)
+            warning_unassigned_chargepairs = bond_pairs[ib]
+
+    # Now add up the charge increments for each atom.
+    natoms = len(atomids)
+    if np is not None:
+        if len(bond_atoms) > 0:
+            bond_atoms = np.array(bond_atoms, dtype=np.intp)
+            bond_found = np.array(bond_found, dtype=bool)
+            # np.bincount() adds the weights in the order they appear
+            dq_by_atom = np.bincount(bond_atoms[bond_found],
+                                     weights=np.array(bond_dq)[bond_found],
+                                     minlength=natoms).tolist()
+            # list the atoms in the order they first appear in a bond
+            assigned, ifirst = np.unique(bond_atoms[bond_found],
+                                         return_index=True)
+            assigned = assigned[np.argsort(ifirst)].tolist()
+        else:
+            assigned = []
+    else:
+        dq_by_atom = [0.0 for iatom in range(0, natoms)]
+        assigned_flags = [False for iatom in range(0, natoms)]
+        assigned = []
+        for i in range(0, len(bond_atoms)):
+            if bond_found[i]:
+                iatom = bond_atoms[i]
+                dq_by_atom[iatom] += bond_dq[i]
+                if not assigned_flags[iatom]:
+                    assigned_flags[iatom] = True
+                    assigned.append(iatom)
+
+    for iatom in assigned:
+        chargebyatomid[atomids[iatom]] += dq_by_atom[iatom]
 
     if warning_unassigned_chargepairs:
         sys.stderr.write('---------------------------------------------------------------------------\n'
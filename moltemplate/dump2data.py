@@ -22,12 +22,45 @@ A reference DATA file is needed (argument).
 # All rights reserved.
 
 g_program_name = 'dump2data.py'
-g_date_str = '2017-9-12'
-g_version_str = '0.54.1'
+g_date_str = '2026-10-18'
+g_version_str = '0.59.0'
 
 import sys
+import os
+import stat
+import io
+import struct
+import array
+import locale
+import multiprocessing
+import threading
+import zlib
+import bz2
 from collections import defaultdict
 from operator import itemgetter, attrgetter
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # (python 2)
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma  # (python 2)
+    except ImportError:
+        lzma = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    from cStringIO import StringIO  # (python 2)
+except ImportError:
+    from io import StringIO
 
 
 class InputError(Exception):
@@ -56,6 +89,9 @@ class MiscSettings(object):
         self.multi = True
         self.skip_interval = 1
         self.scale = None
+        self.dump_file_name = None
+        self.nproc = 1
+        self.binary_dump = False
 
 
 class AtomStyleSettings(object):
@@ -83,6 +119,7 @@ class DataSettings(AtomStyleSettings):
         AtomStyleSettings.__init__(self)
         self.contents = ''
         self.file_name = ''
+        self.template = None  # <-- DataFileTemplate built from "contents"
 
 
 # Atom Styles in LAMMPS as of 2011-7-29
@@ -484,6 +521,24 @@ def ParseArgs(argv,
             misc_settings.scale = float(argv[i + 1])
             del(argv[i:i + 2])
 
+        elif (argv[i].lower() == '-nproc'):
+            if ((i + 1 >= len(argv)) or (not str.isdigit(argv[i + 1]))):
+                raise InputError('Error(dump2data): ' + argv[i] + ' flag should be followed by a positive integer\n'
+                                 '       (the number of processes used to convert frames with -multi).\n')
+            misc_settings.nproc = max(int(argv[i + 1]), 1)
+            del(argv[i:i + 2])
+
+        elif (argv[i].lower() == '-binary'):
+            misc_settings.binary_dump = True
+            del(argv[i:i + 1])
+
+        elif (argv[i].lower() == '-dump'):
+            if i + 1 >= len(argv):
+                raise InputError('Error(dump2data): ' + argv[i] + ' flag should be followed by the name of a\n'
+                                 '       LAMMPS dump file (trajectory).\n')
+            misc_settings.dump_file_name = argv[i + 1]
+            del(argv[i:i + 2])
+
         elif ((argv[i][0] == '-') and (__name__ == "__main__")):
             raise InputError(
                 'Error(dump2data): Unrecogized command line argument \"' + argv[i] + '\"\n')
@@ -576,10 +631,1507 @@ dump2data.py -t t -atomstyle style orig.data < dump.lammpstrj > new.data
         # '########################################################\n')
 
 
+# Section names which WriteFrameToData() recognizes in a LAMMPS data file
+g_data_section_names = set(['Masses', 'Velocities', 'Atoms',
+                            'Bond Coeffs', 'Angle Coeffs',
+                            'Dihedral Coeffs', 'Improper Coeffs',
+                            'Bonds', 'Angles', 'Dihedrals', 'Impropers'])
+
+
+class DumpFrameIndex(object):
+    """
+    DumpFrameIndex stores the location (byte offset) of every frame
+    (every "ITEM: TIMESTEP" line) in a LAMMPS dump file, as well as the
+    timestep and the number of atoms in each frame.  This makes it possible
+    to jump directly to the frame(s) we want without parsing the frames
+    which preceed it.  Building the index requires reading the file once
+    (but only searching it for "ITEM: TIMESTEP", which is fast).
+    If a file name is given, the index is cached in a "sidecar" file
+    (file_name + g_frame_index_suffix), which is reused later as long as
+    the size and modification time of the dump file have not changed.
+    If the dump file has only grown since then (because the simulation is
+    still running), only the new portion of the file is scanned.
+
+    """
+
+    def __init__(self, f, file_name=None):
+        """ f is a dump file which was opened in binary mode ('rb'). """
+        self.offsets = []
+        self.timesteps = []  # <-- timesteps (stored as strings)
+        self.natoms = []
+        st = os.fstat(f.fileno())
+        self.file_size = st.st_size
+        self.file_mtime = repr(st.st_mtime)
+        offset_scan = 0
+        index_file_name = None
+        if file_name != None:
+            index_file_name = file_name + g_frame_index_suffix
+            offset_scan = self._Load(f, index_file_name)
+            if offset_scan == self.file_size:
+                return
+        self._Scan(f, offset_scan)
+        if index_file_name != None:
+            self._Save(index_file_name)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def _Load(self, f, index_file_name):
+        """
+        Read the cached index (if present).  Returns the offset in the dump
+        file from which we should resume scanning (which is self.file_size
+        if the cached index is up to date).
+        """
+        try:
+            index_file = open(index_file_name, 'r')
+        except IOError:
+            return 0
+        try:
+            tokens = index_file.readline().split()
+            if ((len(tokens) != 2) or
+                (int(tokens[0]) > self.file_size)):
+                return 0
+            for line in index_file:
+                tokens = line.split()
+                if len(tokens) == 3:
+                    self.offsets.append(int(tokens[0]))
+                    self.timesteps.append(tokens[1])
+                    self.natoms.append(int(tokens[2]))
+        except ValueError:
+            del self.offsets[:]
+            del self.timesteps[:]
+            del self.natoms[:]
+            return 0
+        finally:
+            index_file.close()
+        if ((int(tokens[0]) == self.file_size) and
+            (tokens[1] == self.file_mtime)):
+            return self.file_size
+        # Otherwise the file was modified.  If the file has only grown,
+        # everything up to the beginning of the last frame is still valid.
+        # (The last frame might have been incomplete at the time.)
+        # Make sure that the frame is still located where we left it.
+        if len(self.offsets) > 0:
+            header = _ReadDumpFrameHeader(f, self.offsets[-1])
+            if header == (self.timesteps[-1], self.natoms[-1]):
+                offset_scan = self.offsets.pop()
+                self.timesteps.pop()
+                self.natoms.pop()
+                return offset_scan
+        del self.offsets[:]
+        del self.timesteps[:]
+        del self.natoms[:]
+        return 0
+
+    def _Save(self, index_file_name):
+        try:
+            index_file = open(index_file_name, 'w')
+        except IOError:
+            return  # (not a problem.  Perhaps we lack write permission.)
+        index_file.write(str(self.file_size) + ' ' + self.file_mtime + '\n')
+        for i in range(0, len(self.offsets)):
+            index_file.write(str(self.offsets[i]) + ' ' +
+                             self.timesteps[i] + ' ' +
+                             str(self.natoms[i]) + '\n')
+        index_file.close()
+
+    def _Scan(self, f, offset):
+        offsets = _FindDumpFrames(f, offset)
+        for offset in offsets:
+            timestep_str, natoms = _ReadDumpFrameHeader(f, offset)
+            self.offsets.append(offset)
+            self.timesteps.append(timestep_str)
+            self.natoms.append(natoms)
+
+    def FirstFrame(self, tstart):
+        """
+        Return the index of the first frame whose timestep is >= tstart
+        (or len(self) if there are no such frames).
+        """
+        for i in range(0, len(self.timesteps)):
+            if int(self.timesteps[i]) >= tstart:
+                return i
+        return len(self.timesteps)
+
+
+g_frame_index_suffix = '.frame_index'
+g_frame_tag = b'ITEM: TIMESTEP'
+g_scan_chunk_size = 1 << 22
+
+
+def _AtLineStart(buf, i):
+    """ Is buf[i] the first non-whitespace character on a line? """
+    return buf[buf.rfind(b'\n', 0, i) + 1:i].strip() == b''
+
+
+def _FindDumpFrames(f, offset=0):
+    """
+    Return a list of the byte offsets of every line beginning with
+    "ITEM: TIMESTEP" in file f (opened in binary mode), starting at offset
+    (which should be the beginning of a line).  The file is searched in
+    large chunks, so this is much faster than reading it line-by-line.
+
+    """
+    offsets = []
+    f.seek(offset)
+    while True:
+        buf = f.read(g_scan_chunk_size)
+        if len(buf) == 0:
+            break
+        if buf[-1:] != b'\n':
+            buf += f.readline()  # (so that buf ends at the end of a line)
+        i = buf.find(g_frame_tag)
+        while i != -1:
+            if _AtLineStart(buf, i):
+                offsets.append(offset + buf.rfind(b'\n', 0, i) + 1)
+            i = buf.find(g_frame_tag, i + 1)
+        offset += len(buf)
+    return offsets
+
+
+def _FindLastDumpFrame(f):
+    """
+    Return the byte offset of the last line beginning with "ITEM: TIMESTEP"
+    in file f (opened in binary mode), or None if there aren't any.
+    The file is searched backwards from the end, so the time required
+    is proportional to the size of the last frame (not the entire file).
+
+    """
+    f.seek(0, 2)
+    offset = f.tell()
+    buf = b''
+    while offset > 0:
+        chunk_size = min(g_scan_chunk_size, offset)
+        offset -= chunk_size
+        f.seek(offset)
+        buf = f.read(chunk_size) + buf
+        i = buf.rfind(g_frame_tag)
+        while i != -1:
+            i_line = buf.rfind(b'\n', 0, i) + 1
+            if (((i_line > 0) or (offset == 0)) and
+                (buf[i_line:i].strip() == b'')):
+                return offset + i_line
+            i = buf.rfind(g_frame_tag, 0, i)
+        # Discard the portion of the buffer we have already searched.
+        # (Keep the first line, since it might be incomplete.)
+        i_line = buf.find(b'\n')
+        if i_line != -1:
+            buf = buf[:i_line + 1]
+    return None
+
+
+def _ReadDumpFrameHeader(f, offset):
+    """
+    Read the timestep and number of atoms in the frame beginning
+    at this offset in file f (opened in binary mode).
+    Returns a tuple: (timestep_str, natoms)  (natoms = -1 if unknown)
+
+    """
+    f.seek(offset)
+    section = b''
+    timestep_str = None
+    natoms = -1
+    while True:
+        line = f.readline()
+        if len(line) == 0:
+            break
+        line = line.strip()
+        if line.find(b'ITEM:') == 0:
+            if ((section != b'') and
+                (line.find(b'ITEM: NUMBER OF ATOMS') != 0)):
+                break
+            section = line
+        elif (len(line) > 0) and (line[0:1] != b'#'):
+            if section.find(b'ITEM: TIMESTEP') == 0:
+                timestep_str = line.decode('latin-1')
+                if sys.version < '3':
+                    timestep_str = line
+            elif section == b'ITEM: NUMBER OF ATOMS':
+                natoms = int(line)
+                break
+    return timestep_str, natoms
+
+
+def _OpenBinary(in_coord_file):
+    """
+    If in_coord_file is a regular file (not a pipe), open a separate
+    binary file object for it (which can be searched and moved
+    independently).  Otherwise return None.
+
+    """
+    try:
+        fd = in_coord_file.fileno()
+        if not stat.S_ISREG(os.fstat(fd).st_mode):
+            return None
+        return os.fdopen(os.dup(fd), 'rb')
+    except (AttributeError, IOError, OSError, ValueError):
+        return None
+
+
+# The first few bytes of a compressed file reveal the compression format:
+g_compression_magic = [(b'\x1f\x8b', 'gzip'),
+                       (b'BZh', 'bzip2'),
+                       (b'\xfd7zXZ\x00', 'xz'),
+                       (b'\x28\xb5\x2f\xfd', 'zstd')]
+
+
+def _CompressionFormat(magic):
+    for prefix, compression in g_compression_magic:
+        if magic.startswith(prefix):
+            return compression
+    return None
+
+
+def _NewDecompressor(compression):
+    if compression == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif compression == 'bzip2':
+        return bz2.BZ2Decompressor()
+    else:
+        assert(compression == 'xz')
+        return lzma.LZMADecompressor()
+
+
+def _DecompressedChunks(binary_file, compression):
+    """
+    Read a compressed file, and yield the decompressed contents
+    (in chunks).  Files containing multiple compressed streams
+    (eg. created using "cat a.gz b.gz > c.gz") are supported.
+
+    """
+    if compression == 'zstd':
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            binary_file, read_across_frames=True)
+        while True:
+            chunk = reader.read(g_scan_chunk_size)
+            if len(chunk) == 0:
+                return
+            yield chunk
+
+    decompressor = _NewDecompressor(compression)
+    while True:
+        buf = binary_file.read(g_scan_chunk_size)
+        if len(buf) == 0:
+            if not getattr(decompressor, 'eof', True):
+                raise EOFError('Compressed file ended before the end-of-stream marker was reached')
+            return
+        while len(buf) > 0:
+            if getattr(decompressor, 'eof', False):
+                # Then the previous stream ended.  Start a new one.
+                decompressor = _NewDecompressor(compression)
+            try:
+                chunk = decompressor.decompress(buf)
+            except EOFError:
+                # (python 2 does not have "eof".  Start a new stream.)
+                decompressor = _NewDecompressor(compression)
+                chunk = decompressor.decompress(buf)
+            if len(chunk) > 0:
+                yield chunk
+            buf = decompressor.unused_data
+            if len(buf) > 0:
+                decompressor = _NewDecompressor(compression)
+
+
+class DecompressedFile(io.RawIOBase):
+    """
+    A read-only file containing the decompressed contents of a compressed
+    (binary) file.  The decompression is carried out in a separate thread
+    so that it can proceed while the caller is busy parsing the text.
+    (The zlib, bz2, and lzma modules release the GIL while decompressing.)
+
+    """
+
+    def __init__(self, binary_file, compression, file_name='(stdin)'):
+        io.RawIOBase.__init__(self)
+        self.compression = compression
+        self.file_name = file_name
+        self._chunks = queue.Queue(8)  # <-- limits memory usage
+        self._chunk = b''
+        self._pos = 0
+        self._done = False
+        thread = threading.Thread(target=self._Decompress,
+                                  args=(binary_file,))
+        thread.daemon = True
+        thread.start()
+
+    def _Decompress(self, binary_file):
+        try:
+            for chunk in _DecompressedChunks(binary_file, self.compression):
+                self._chunks.put(chunk)
+            self._chunks.put(None)
+        except Exception as err:
+            self._chunks.put(err)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._pos == len(self._chunk):
+            if self._done:
+                return 0
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._done = True
+                return 0
+            if isinstance(chunk, Exception):
+                self._done = True
+                raise InputError('Error(dump2data): Unable to decompress \"' +
+                                 self.file_name + '\" (' +
+                                 self.compression + ' format):\n'
+                                 '       ' + str(chunk) + '\n')
+            self._chunk = chunk
+            self._pos = 0
+        n = min(len(b), len(self._chunk) - self._pos)
+        b[:n] = self._chunk[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+
+def IsBinaryDump(first_bytes):
+    """
+    Do these bytes (from the beginning of a file) look like the beginning
+    of a binary LAMMPS dump file?  (Recent versions of LAMMPS begin each
+    frame of a binary dump file with a negative number followed by a
+    string such as "DUMPATOM" or "DUMPCUSTOM".  Older binary dump files
+    lack this header and can not be detected this way.)
+
+    """
+    if len(first_bytes) < 12:
+        return False
+    for endian in ('<', '>'):
+        n = struct.unpack(endian + 'q', first_bytes[:8])[0]
+        if (-64 <= n < 0) and (first_bytes[8:12] == b'DUMP'):
+            return True
+    return False
+
+
+def OpenDumpFile(file_name=None, binary=False):
+    """
+    Open the file containing the coordinates (or trajectory) for reading.
+    (If file_name is None, read from the standard input.)
+    Files compressed using gzip, bzip2, xz, or zstd are detected
+    automatically (using the first few bytes of the file), and
+    decompressed while they are being read.
+    Returns a tuple containing the file object, and a boolean indicating
+    whether the file is a binary dump file.  (Binary dump files are
+    detected automatically, or if the "binary" argument is True.)
+    Binary files are opened in binary mode.
+
+    """
+    if file_name != None:
+        binary_file = io.open(file_name, 'rb')
+        first_bytes = binary_file.read(16)
+        compression = _CompressionFormat(first_bytes)
+        if compression is None:
+            if binary or IsBinaryDump(first_bytes):
+                binary_file.seek(0)
+                return binary_file, True
+            binary_file.close()
+            return open(file_name, 'r'), False
+        binary_file.seek(0)
+    else:
+        file_name = '(stdin)'
+        try:
+            fd = sys.stdin.fileno()
+            is_regular_file = stat.S_ISREG(os.fstat(fd).st_mode)
+        except (AttributeError, IOError, OSError, ValueError):
+            return sys.stdin, False
+        if is_regular_file:
+            # Read the first few bytes, without disturbing sys.stdin
+            pos = os.lseek(fd, 0, os.SEEK_CUR)
+            first_bytes = os.read(fd, 16)
+            os.lseek(fd, pos, os.SEEK_SET)
+            compression = _CompressionFormat(first_bytes)
+            if compression is None:
+                if binary or IsBinaryDump(first_bytes):
+                    return io.open(fd, 'rb', closefd=False), True
+                return sys.stdin, False
+            binary_file = io.open(fd, 'rb', closefd=False)
+        else:
+            # For pipes, use peek() to read the first few bytes.
+            if sys.version < '3':
+                # (In python 2, sys.stdin does not support peek(). Since
+                #  "str" and "bytes" are the same, use binary_file instead.)
+                binary_file = io.open(fd, 'rb', closefd=False)
+            else:
+                binary_file = sys.stdin.buffer
+            first_bytes = binary_file.peek(16)[:16]
+            compression = _CompressionFormat(first_bytes)
+            if compression is None:
+                if binary or IsBinaryDump(first_bytes):
+                    return binary_file, True
+                if sys.version < '3':
+                    return binary_file, False
+                return sys.stdin, False
+
+    if ((compression == 'xz') and (lzma is None)):
+        raise InputError('Error(dump2data): \"' + file_name + '\" is compressed using xz.\n'
+                         '       Reading this file requires the \"lzma\" python module.\n')
+    if ((compression == 'zstd') and (zstandard is None)):
+        raise InputError('Error(dump2data): \"' + file_name + '\" is compressed using zstd.\n'
+                         '       Reading this file requires the \"zstandard\" python module.\n'
+                         '       (Try \"pip install zstandard\")\n')
+    decompressed_file = io.BufferedReader(DecompressedFile(binary_file,
+                                                           compression,
+                                                           file_name),
+                                          g_scan_chunk_size)
+    if binary or IsBinaryDump(decompressed_file.peek(16)[:16]):
+        return decompressed_file, True
+    if sys.version < '3':
+        return decompressed_file, False
+    return io.TextIOWrapper(decompressed_file), False
+
+
+def OpenCoordFile(file_name=None):
+    """
+    Open a text file containing coordinates (or a trajectory) for reading.
+    (See OpenDumpFile() for details.)  Returns a file object.
+
+    """
+    in_file, is_binary = OpenDumpFile(file_name)
+    return in_file
+
+
+def SeekToFirstFrame(in_coord_file, misc_settings):
+    """
+    If in_coord_file is a regular file (not a pipe), use the byte offsets
+    of the frames in that file to skip over the frames we don't need.
+    (For example, if the user only wants the last frame, or the frames
+    starting at a certain timestep.)  This function moves the file pointer
+    of in_coord_file to the first frame we need.
+
+    """
+    if not (misc_settings.last_frame or
+            misc_settings.timestep_str or
+            (misc_settings.multi and misc_settings.tstart)):
+        return
+    f = _OpenBinary(in_coord_file)
+    if f is None:
+        return
+    try:
+        offset = None
+        if misc_settings.last_frame:
+            offset = _FindLastDumpFrame(f)
+        else:
+            frame_index = DumpFrameIndex(f, misc_settings.dump_file_name)
+            if misc_settings.timestep_str:
+                tstart = int(misc_settings.timestep_str)
+            else:
+                tstart = misc_settings.tstart
+            i = frame_index.FirstFrame(tstart)
+            if i < len(frame_index):
+                offset = frame_index.offsets[i]
+            elif len(frame_index) > 0:
+                # None of the frames are late enough.  Read the last frame
+                # anyway (so the program ends the same way it would if
+                # it had read every frame).
+                offset = frame_index.offsets[-1]
+    finally:
+        f.close()
+    if offset != None:
+        in_coord_file.seek(offset)
+
+
+class FrameColumn(object):
+    """
+    A read-only dictionary-like view of one of the per-atom arrays
+    (lists) stored in a DumpFrame, indexed by atom-ID (a string).
+    ("rows" maps each atom-ID to the corresponding row of the array.)
+    This way, the per-atom data does not have to be copied into a
+    separate dictionary for every atom in every frame.
+
+    """
+    __slots__ = ('rows', 'values')
+
+    def __init__(self, rows, values):
+        self.rows = rows
+        self.values = values
+
+    def __contains__(self, atomid):
+        return atomid in self.rows
+
+    def __getitem__(self, atomid):
+        return self.values[self.rows[atomid]]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def items(self):
+        values = self.values
+        return [(atomid, values[row]) for atomid, row in self.rows.items()]
+
+
+class DumpFrame(object):
+    """
+    The contents of one frame of a LAMMPS dump file.
+    The per-atom information is stored in lists (with one entry per atom)
+    in the order the atoms appear in the dump file.  "rows" is a dictionary
+    which maps each atom-ID (a string) to the corresponding entry in these
+    lists.  (If an atom-ID appears more than once, the last one is used.)
+
+    """
+
+    def __init__(self):
+        self.timestep_str = ''
+        self.natoms = -1
+        self.xlo_str = self.xhi_str = None
+        self.ylo_str = self.yhi_str = None
+        self.zlo_str = self.zhi_str = None
+        self.xy_str = self.xz_str = self.yz_str = None
+        self.avec = [1.0, 0.0, 0.0]
+        self.bvec = [0.0, 1.0, 0.0]
+        self.cvec = [0.0, 0.0, 1.0]
+        self.column_names = []
+        self.rows = {}
+        self.atomids = []
+        self.atomtypes = []
+        self.molids = None
+        self.coords = []         # <-- [x,y,z] for each atom
+        self.coords_ixiyiz = None  # <-- [ix,iy,iz] for each atom (optional)
+        self.velocities = []     # <-- [vx,vy,vz] for each atom
+        self.vects = []          # <-- directional data for each atom
+        # The text from the "ITEM: ATOMS" section is stored here
+        # temporarily until the entire frame has been read:
+        self.atom_tokens = []      # <-- tokens from a block of atoms (flat)
+        self.atom_token_lists = []  # <-- tokens from any remaining atoms
+
+    def HasAtoms(self):
+        return (len(self.atom_tokens) > 0) or (len(self.atom_token_lists) > 0)
+
+
+class DumpColumns(object):
+    """
+    Which columns in the "ITEM: ATOMS" section of a dump file store the
+    information we need?  (This is determined once from the header line.)
+
+    """
+
+    def __init__(self, header_line, data_settings):
+        dump_column_names = header_line[12:].split()
+        self.column_names = dump_column_names
+        self.i_atomid, self.i_atomtype, self.i_molid = \
+            ColNames2AidAtypeMolid(dump_column_names)
+
+        # For each axis, find the column storing the coordinate.
+        # (The "u" suffix indicates the coordinate is already unwrapped.
+        #  The "s" suffix indicates a scaled (fractional) coordinate.)
+        self.i_xyz = []
+        self.already_unwrapped = []
+        self.scaled = []
+        for axis in ('x', 'y', 'z'):
+            for suffix in ('', 'u', 's', 'su'):
+                if axis + suffix in dump_column_names:
+                    self.i_xyz.append(dump_column_names.index(axis + suffix))
+                    self.already_unwrapped.append(suffix in ('u', 'su'))
+                    self.scaled.append(suffix in ('s', 'su'))
+                    break
+            else:
+                raise InputError('Error(dump2data): \"ATOMS\" section of dump file lacks a \"' + axis + '\" column.\n' +
+                                 '       (excerpt below)\n' + header_line)
+        if self.scaled[0] != self.scaled[1] or self.scaled[1] != self.scaled[2]:
+            raise InputError('Error(dump2data): \"ATOMS\" section of dump file mixes scaled and unscaled\n'
+                             '       coordinates. (excerpt below)\n' + header_line)
+
+        self.ii_vects = ColNames2Vects(dump_column_names)
+        if (len(self.ii_vects) != len(data_settings.ii_vects)):
+            raise InputError('Error(dump2data): atom styles in data and dump files differ.\n'
+                             '      Some needed columns from the atom_styles are missing in the dump file.')
+        # Which vect is it (mux,muy,muz) or (quati,quatj,quatk)?
+        # The columns could be listed in a different order
+        # in the data file and in the dump file.
+        # Figure out which vector it is in the data file (stored
+        # in self.I_data[I]) so that column names match.
+        self.I_data = []
+        for I in range(0, len(self.ii_vects)):
+            name_vx = dump_column_names[self.ii_vects[I][0]]
+            i_vx_data = 0
+            I_data = -1
+            while i_vx_data < len(data_settings.column_names):
+                if name_vx == data_settings.column_names[i_vx_data]:
+                    I_data = 0
+                    while I_data < len(data_settings.ii_vects):
+                        if self.ii_vects[I] == data_settings.ii_vects[I_data]:
+                            break
+                        I_data += 1
+
+                if (0 < I_data) and (I_data < len(data_settings.ii_vects)):
+                    break
+
+                i_vx_data += 1
+            if not ((0 <= I_data) and (I_data < len(data_settings.ii_vects))):
+                I_data = None
+                self.name_vx_missing = name_vx
+            self.I_data.append(I_data)
+
+        self.i_ixiyiz = []
+        for name in ('ix', 'iy', 'iz'):
+            if name in dump_column_names:
+                self.i_ixiyiz.append(dump_column_names.index(name))
+            else:
+                self.i_ixiyiz.append(-1)
+
+        self.i_vxvyvz = []
+        for name in ('vx', 'vy', 'vz'):
+            if name in dump_column_names:
+                self.i_vxvyvz.append(dump_column_names.index(name))
+            else:
+                self.i_vxvyvz.append(-1)
+
+
+def _FloatColumn(column):
+    if np is not None:
+        return np.array(column, dtype=float)
+    return [float(s) for s in column]
+
+
+def ParseDumpAtoms(frame, columns, misc_settings):
+    """
+    Convert the text from the "ITEM: ATOMS" section of this frame
+    into per-atom lists.  Every column is processed at once (using numpy
+    array operations if numpy is available).
+
+    """
+    ncols = len(columns.column_names)
+    atom_tokens = frame.atom_tokens
+    atom_token_lists = frame.atom_token_lists
+
+    def Column(i):
+        column = atom_tokens[i::ncols]
+        if len(atom_token_lists) > 0:
+            column += [tokens[i] for tokens in atom_token_lists]
+        return column
+
+    def FloatColumn(i):
+        return _FloatColumn(Column(i))
+
+    StoreDumpAtoms(frame, columns, misc_settings, Column, FloatColumn)
+    frame.atom_tokens = []
+    frame.atom_token_lists = []
+
+
+def StoreDumpAtoms(frame, columns, misc_settings, Column, FloatColumn):
+    """
+    Store the per-atom information from one frame of a dump file in
+    the lists in "frame".  Column(i) returns the contents of the i'th
+    column of the "ITEM: ATOMS" section (as a list of strings).
+    FloatColumn(i) returns the same column as a list (or numpy array)
+    of floating point numbers.
+
+    """
+    frame.column_names = columns.column_names
+    frame.atomids = Column(columns.i_atomid)
+    natoms = len(frame.atomids)
+    frame.rows = dict(zip(frame.atomids, range(0, natoms)))
+    frame.atomtypes = Column(columns.i_atomtype)
+    if columns.i_molid:
+        frame.molids = Column(columns.i_molid)
+
+    x = FloatColumn(columns.i_xyz[0])
+    y = FloatColumn(columns.i_xyz[1])
+    z = FloatColumn(columns.i_xyz[2])
+    avec = frame.avec
+    bvec = frame.bvec
+    cvec = frame.cvec
+
+    if columns.scaled[0]:
+        # avec, bvec, cvec described here:
+        # http://lammps.sandia.gov/doc/Section-howto.html#howto_12
+        xlo = float(frame.xlo_str)
+        ylo = float(frame.ylo_str)
+        zlo = float(frame.zlo_str)
+        xs = x
+        ys = y
+        zs = z
+        if np is not None:
+            x = xlo + xs * avec[0] + ys * bvec[0] + zs * cvec[0]
+            y = ylo + xs * avec[1] + ys * bvec[1] + zs * cvec[1]
+            z = zlo + xs * avec[2] + ys * bvec[2] + zs * cvec[2]
+        else:
+            x = [xlo + xs[i] * avec[0] + ys[i] * bvec[0] + zs[i] * cvec[0]
+                 for i in range(0, natoms)]
+            y = [ylo + xs[i] * avec[1] + ys[i] * bvec[1] + zs[i] * cvec[1]
+                 for i in range(0, natoms)]
+            z = [zlo + xs[i] * avec[2] + ys[i] * bvec[2] + zs[i] * cvec[2]
+                 for i in range(0, natoms)]
+
+    # Now deal with ix, iy, iz
+    unwrap = (misc_settings.center_frame or
+              (misc_settings.output_format != 'data'))
+    for d, vec in ((0, avec), (1, bvec), (2, cvec)):
+        i_id = columns.i_ixiyiz[d]
+        if (i_id == -1) or columns.already_unwrapped[d]:
+            continue
+        if unwrap:
+            if np is not None:
+                image = np.asarray(FloatColumn(i_id)).astype(int)
+                x = x + image * vec[0]
+                y = y + image * vec[1]
+                z = z + image * vec[2]
+            else:
+                image = [int(s) for s in FloatColumn(i_id)]
+                x = [x[i] + image[i] * vec[0] for i in range(0, natoms)]
+                y = [y[i] + image[i] * vec[1] for i in range(0, natoms)]
+                z = [z[i] + image[i] * vec[2] for i in range(0, natoms)]
+        else:
+            if frame.coords_ixiyiz is None:
+                frame.coords_ixiyiz = [['0', '0', '0']
+                                       for i in range(0, natoms)]
+            for i, s in enumerate(Column(i_id)):
+                frame.coords_ixiyiz[i][d] = str(int(s))
+
+    if np is not None:
+        frame.coords = np.column_stack((x, y, z)).tolist()
+    else:
+        frame.coords = [list(xyz) for xyz in zip(x, y, z)]
+
+    # (The lists stored in frame.velocities and frame.vects are never
+    #  modified later, so atoms which lack this information share them.)
+    if columns.i_vxvyvz == [-1, -1, -1]:
+        frame.velocities = [[0.0, 0.0, 0.0]] * natoms
+    else:
+        v = []
+        for d in range(0, 3):
+            if columns.i_vxvyvz[d] != -1:
+                v.append(FloatColumn(columns.i_vxvyvz[d]))
+            else:
+                v.append([0.0] * natoms)
+        if np is not None:
+            frame.velocities = np.column_stack(v).tolist()
+        else:
+            frame.velocities = [list(vxvyvz) for vxvyvz in zip(*v)]
+
+    # NOTE:
+    # There can be multiple "vects" associated with each atom
+    # (for example, dipole moments, ellipsoid directions, etc..)
+    if len(columns.ii_vects) == 0:
+        frame.vects = [[]] * natoms
+    else:
+        frame.vects = [[None for I in range(0, len(columns.ii_vects))]
+                       for i in range(0, natoms)]
+    for I in range(0, len(columns.ii_vects)):
+        I_data = columns.I_data[I]
+        if (I_data is None) and (natoms > 0):
+            raise InputError('Error(dump2data): You have a vector coordinate in your dump file named \"' + columns.name_vx_missing + '\"\n'
+                             '       However there are no columns with this name in your data file\n'
+                             '       (or the column was not in the expected place).\n'
+                             '       Hence, the atom styles in the dump and data files do not match.')
+        vx = Column(columns.ii_vects[I][0])
+        vy = Column(columns.ii_vects[I][1])
+        vz = Column(columns.ii_vects[I][2])
+        for i in range(0, natoms):
+            frame.vects[i][I_data] = (vx[i], vy[i], vz[i])
+
+
+class DumpReader(object):
+    """
+    Read a text LAMMPS dump file (trajectory) one frame at a time.
+    The lines in the "ITEM: ATOMS" section are read in a single block
+    and split all at once (whenever possible) instead of line by line.
+
+    """
+
+    def __init__(self, in_file, misc_settings, data_settings):
+        self.in_file = in_file
+        self.misc_settings = misc_settings
+        self.data_settings = data_settings
+        self.pending = []  # <-- lines we have read but not processed yet
+        self.section = ''
+        self.natoms = -1
+        self.columns = None
+        self.frame = DumpFrame()
+        self.avec = [1.0, 0.0, 0.0]
+        self.bvec = [0.0, 1.0, 0.0]
+        self.cvec = [0.0, 0.0, 1.0]
+        self.eof = False
+
+    def _ReadLine(self):
+        if len(self.pending) > 0:
+            return self.pending.pop()
+        return self.in_file.readline()
+
+    def _ReadAtomBlock(self):
+        """
+        Read the next "natoms" lines all at once.  If they all contain
+        atom data (which is usually the case), store all of the tokens in
+        a single list.  Otherwise, put them back so that they can be
+        processed one line at a time.
+
+        """
+        if (self.natoms <= 0) or (len(self.pending) > 0):
+            return
+        readline = self.in_file.readline
+        lines = [readline() for i in range(0, self.natoms)]
+        text = ''.join(lines)
+        tokens = text.split()
+        if ((len(tokens) == self.natoms * len(self.columns.column_names)) and
+            (text.find('ITEM:') == -1) and
+            (text.find('#') == -1)):
+            self.frame.atom_tokens = tokens
+        else:
+            while (len(lines) > 0) and (lines[-1] == ''):
+                lines.pop()  # (we reached the end of the file)
+            lines.reverse()
+            self.pending = lines
+
+    def ReadFrame(self):
+        """
+        Read the next frame.  Returns a DumpFrame object (or None if there
+        are no frames left).  Afterwards, self.eof indicates whether we
+        have reached the end of the file.
+
+        """
+        frame = self.frame
+        while True:
+            line = self._ReadLine()
+            if line == '':  # if EOF
+                self.eof = True
+                if frame.HasAtoms():
+                    break
+                return None
+
+            line = line.strip()
+            if (line.find('ITEM:') == 0):
+                if ((line.find('ITEM: TIMESTEP') == 0) and frame.HasAtoms()):
+                    self.pending.append(line)
+                    break
+                self.section = line
+                if (line.find('ITEM: ATOMS ') == 0):
+                    self.columns = DumpColumns(line, self.data_settings)
+                    self._ReadAtomBlock()
+                elif (line.find('ITEM: BOX BOUNDS') == 0):
+                    self.avec = [1.0, 0.0, 0.0]
+                    self.bvec = [0.0, 1.0, 0.0]
+                    self.cvec = [0.0, 0.0, 1.0]
+
+            elif ((len(line) > 0) and (line[0] != '#')):
+                section = self.section
+                if (section.find('ITEM: TIMESTEP') == 0):
+                    frame = self.frame = DumpFrame()
+                    frame.timestep_str = line
+
+                elif (section == 'ITEM: NUMBER OF ATOMS'):
+                    self.natoms = int(line)
+
+                elif (section.find('ITEM: BOX BOUNDS') == 0):
+                    is_triclinic = (section.find('xy xz yz') == 0)
+
+                    tokens = line.split()
+                    if not frame.xlo_str:
+                        assert(not frame.xhi_str)
+                        frame.xlo_str = tokens[0]
+                        frame.xhi_str = tokens[1]
+                        self.avec[0] = float(frame.xhi_str) - float(frame.xlo_str)
+                        if (is_triclinic and (len(tokens) > 2)):
+                            frame.xy_str = tokens[2]
+                            self.bvec[0] = float(frame.xy_str)
+                            # See http://lammps.sandia.gov/doc/Section-howto.html#howto_12
+
+                    elif not frame.ylo_str:
+                        assert(not frame.yhi_str)
+                        frame.ylo_str = tokens[0]
+                        frame.yhi_str = tokens[1]
+                        self.bvec[1] = float(frame.yhi_str) - float(frame.ylo_str)
+                        if (is_triclinic and (len(tokens) > 2)):
+                            frame.xz_str = tokens[2]
+                            self.cvec[0] = float(frame.xz_str)
+                            # See http://lammps.sandia.gov/doc/Section-howto.html#howto_12
+
+                    elif not frame.zlo_str:
+                        assert(not frame.zhi_str)
+                        frame.zlo_str = tokens[0]
+                        frame.zhi_str = tokens[1]
+                        self.cvec = [0.0, 0.0, float(
+                            frame.zhi_str) - float(frame.zlo_str)]
+                        if (is_triclinic and (len(tokens) > 2)):
+                            frame.yz_str = tokens[2]
+                            self.cvec[1] = float(frame.yz_str)
+                            # See http://lammps.sandia.gov/doc/Section-howto.html#howto_12
+
+                elif (section.find('ITEM: ATOMS') == 0):
+                    frame.atom_token_lists.append(line.split())
+
+        frame.natoms = self.natoms
+        frame.avec = self.avec
+        frame.bvec = self.bvec
+        frame.cvec = self.cvec
+        ParseDumpAtoms(frame, self.columns, self.misc_settings)
+        self.frame = DumpFrame()
+        return frame
+
+
+def _NumbersToStrings(values):
+    """
+    Convert a list of floating point numbers to strings.  (Numbers
+    which are integers, such as atom-IDs and atom types, are written
+    without a decimal point.)
+
+    """
+    try:
+        ints = [int(v) for v in values]
+        if ints == values:
+            return list(map(str, ints))
+    except (OverflowError, ValueError):  # (inf or nan)
+        pass
+    return [('%d' % v) if (v == v) and (abs(v) != float('inf')) and
+            (v == int(v)) else repr(v)
+            for v in values]
+
+
+class BinaryDumpReader(object):
+    """
+    Read a binary LAMMPS dump file (trajectory) one frame at a time.
+    (For example, files created using "dump atom" or "dump custom"
+     with a file name ending in ".bin".  See "tools/binary2txt.cpp" in
+     the LAMMPS source code for a description of the format.)
+    The numbers in each frame are read in a single block.  (If numpy is
+    available, the columns are numpy arrays which refer to this block
+    without copying it.)  The resulting DumpFrame objects are identical
+    to the ones created by DumpReader for the equivalent text file.
+
+    """
+
+    def __init__(self, in_file, misc_settings, data_settings):
+        self.in_file = in_file
+        self.misc_settings = misc_settings
+        self.data_settings = data_settings
+        self.endian = '<'
+        if sys.byteorder == 'big':
+            self.endian = '>'
+        self.columns = None
+        self.column_str = None
+        self.eof = False
+
+    def _Read(self, num_bytes, required=True):
+        buf = self.in_file.read(num_bytes)
+        if (len(buf) < num_bytes) and (required or (len(buf) > 0)):
+            raise InputError('Error(dump2data): The binary dump file ends unexpectedly.\n'
+                             '       (Is this really a binary LAMMPS dump file?)\n')
+        return buf
+
+    def _Unpack(self, fmt):
+        size = struct.calcsize(self.endian + fmt)
+        return struct.unpack(self.endian + fmt, self._Read(size))
+
+    def _ReadString(self, length):
+        return self._Read(length).decode('latin-1')
+
+    def _ReadHeader(self):
+        """
+        Read the header of the next frame.  Returns a tuple containing the
+        timestep, the number of atoms, the box boundaries, the number of
+        columns (size_one), and the number of chunks in the frame.
+        Returns None at the end of the file.
+
+        """
+        buf = self._Read(8, required=False)
+        if len(buf) == 0:
+            return None
+        ntimestep = struct.unpack(self.endian + 'q', buf)[0]
+        if ntimestep < -64:
+            # Perhaps the file was written on a machine whose byte order
+            # differs from ours.  (The magic string length is small.)
+            swapped = {'<': '>', '>': '<'}[self.endian]
+            if -64 <= struct.unpack(swapped + 'q', buf)[0] < 0:
+                self.endian = swapped
+                ntimestep = struct.unpack(self.endian + 'q', buf)[0]
+        revision = 0
+        magic_str = None
+        if ntimestep < 0:
+            # Newer binary dump files begin with a "magic" string,
+            # (eg "DUMPATOM"), and an integer indicating the endianness.
+            magic_str = self._ReadString(-ntimestep)
+            if self._Unpack('i')[0] != 1:  # (check the byte order)
+                raise InputError('Error(dump2data): Unable to determine the byte order of the binary dump file.\n')
+            revision = self._Unpack('i')[0]
+            ntimestep = self._Unpack('q')[0]
+        natoms = self._Unpack('q')[0]
+        triclinic = self._Unpack('i')[0]
+        self._Unpack('6i')  # (boundary conditions are ignored)
+        box = list(self._Unpack('6d'))
+        if triclinic:
+            box += list(self._Unpack('3d'))
+        size_one = self._Unpack('i')[0]
+        if (magic_str != None) and (revision > 1):
+            length = self._Unpack('i')[0]
+            if length > 0:
+                self._ReadString(length)  # (the unit_style is ignored)
+            if struct.unpack('b', self._Read(1))[0]:
+                self._Unpack('d')  # (the simulation time is ignored)
+            length = self._Unpack('i')[0]
+            self.column_str = self._ReadString(length)
+        elif self.column_str is None:
+            # Older files do not say which column stores what information.
+            # Assume the file was created using "dump atom".
+            if size_one == 5:
+                self.column_str = 'id type xs ys zs'
+            elif size_one == 8:
+                self.column_str = 'id type xs ys zs ix iy iz'
+            else:
+                raise InputError('Error(dump2data): This binary dump file does not specify the names of\n'
+                                 '       the columns it contains.  (It was probably created by an older\n'
+                                 '       version of LAMMPS.)  Only \"dump atom\" files can be read.\n')
+        nchunk = self._Unpack('i')[0]
+        return ntimestep, natoms, box, size_one, nchunk
+
+    def ReadFrame(self):
+        """
+        Read the next frame.  Returns a DumpFrame object (or None if there
+        are no frames left).  Afterwards, self.eof indicates whether we
+        have reached the end of the file.
+
+        """
+        while True:
+            header = self._ReadHeader()
+            if header is None:
+                self.eof = True
+                return None
+            ntimestep, natoms, box, size_one, nchunk = header
+
+            # Read the numbers from every chunk into a single buffer.
+            buf = bytearray()
+            for i in range(0, nchunk):
+                n = self._Unpack('i')[0]
+                buf += self._Read(8 * n)
+            if len(buf) > 0:
+                break  # (skip frames which contain no atoms)
+        # Is this the last frame?
+        self.eof = (len(self.in_file.peek(1)) == 0)
+
+        if (len(buf) // 8) % size_one != 0:
+            raise InputError('Error(dump2data): Corrupt binary dump file.  The number of values in\n'
+                             '       the frame at timestep ' + str(ntimestep) +
+                             ' is not a multiple of the number of columns.\n')
+        if self.columns is None:
+            self.columns = DumpColumns('ITEM: ATOMS ' + self.column_str,
+                                       self.data_settings)
+        if len(self.columns.column_names) != size_one:
+            raise InputError('Error(dump2data): The number of columns in the binary dump file (' +
+                             str(size_one) + ')\n'
+                             '       does not match the number of column names:\n'
+                             '       \"' + self.column_str + '\"\n')
+
+        if np is not None:
+            values = np.frombuffer(buf, dtype=self.endian + 'f8')
+            values = values.reshape((-1, size_one))
+
+            def FloatColumn(i):
+                return values[:, i]
+
+            def Column(i):
+                column = values[:, i]
+                ints = column.astype(np.int64)
+                if np.array_equal(ints, column):
+                    return list(map(str, ints.tolist()))
+                return _NumbersToStrings(column.tolist())
+        else:
+            values = array.array('d')
+            if sys.version < '3':
+                values.fromstring(bytes(buf))
+            else:
+                values.frombytes(buf)
+            if self.endian != {'little': '<', 'big': '>'}[sys.byteorder]:
+                values.byteswap()
+
+            def FloatColumn(i):
+                return values[i::size_one].tolist()
+
+            def Column(i):
+                return _NumbersToStrings(values[i::size_one].tolist())
+
+        # The box boundaries are stored the same way DumpReader stores them
+        frame = DumpFrame()
+        frame.timestep_str = str(ntimestep)
+        frame.natoms = natoms
+        frame.xlo_str = repr(box[0])
+        frame.xhi_str = repr(box[1])
+        frame.ylo_str = repr(box[2])
+        frame.yhi_str = repr(box[3])
+        frame.zlo_str = repr(box[4])
+        frame.zhi_str = repr(box[5])
+        frame.avec = [box[1] - box[0], 0.0, 0.0]
+        frame.bvec = [0.0, box[3] - box[2], 0.0]
+        frame.cvec = [0.0, 0.0, box[5] - box[4]]
+        StoreDumpAtoms(frame, self.columns, self.misc_settings,
+                       Column, FloatColumn)
+        return frame
+
+
+def CenterFrame(frame):
+    """
+    Translate the coordinates of the atoms in this frame so that their
+    average position lies at the origin.  (The coordinates are converted
+    to strings, and the periodic image flags are set to 0.)
+
+    """
+    rows = list(frame.rows.values())
+    natoms = len(rows)
+    if np is not None:
+        coords = np.array(frame.coords, dtype=float)
+        # (cumsum() adds the numbers in the same order a loop would.)
+        cm = np.cumsum(coords[rows], axis=0)[-1] / float(natoms)
+        frame.coords = [["%.7g" % crd for crd in xyz]
+                        for xyz in (coords - cm).tolist()]
+    else:
+        cm = [0.0, 0.0, 0.0]
+        for row in rows:
+            for d in range(0, 3):
+                cm[d] += float(frame.coords[row][d])
+        for d in range(0, 3):
+            cm[d] /= float(natoms)
+        frame.coords = [["%.7g" % (float(xyz[d]) - cm[d])
+                         for d in range(0, 3)]
+                        for xyz in frame.coords]
+    frame.coords_ixiyiz = [["0", "0", "0"]
+                           for i in range(0, len(frame.coords))]
+
+
 def GetIntAtomID(pair):
     return int(pair[0])
 
 
+def _ReplaceBoxTokens(line,
+                      xlo_str, xhi_str,
+                      ylo_str, yhi_str,
+                      zlo_str, zhi_str,
+                      xy_str, xz_str, yz_str):
+    """
+    If this line (from the header of a DATA file) contains the boundaries
+    of the simulation box, replace them with the numbers in the arguments.
+    (Arguments which are None are ignored.)
+
+    """
+    tokens = line.split()
+    if ((len(tokens) >= 2) and
+            ((tokens[-2] == 'xlo') and (tokens[-1] == 'xhi')) and
+            ((xlo_str != None) and (xhi_str != None))):
+        tokens[0] = xlo_str
+        tokens[1] = xhi_str
+        line = ' '.join(tokens)
+    elif ((len(tokens) >= 2) and
+          ((tokens[-2] == 'ylo') and (tokens[-1] == 'yhi')) and
+          ((ylo_str != None) and (yhi_str != None))):
+        tokens[0] = ylo_str
+        tokens[1] = yhi_str
+        line = ' '.join(tokens)
+    elif ((len(tokens) >= 2) and
+          ((tokens[-2] == 'zlo') and (tokens[-1] == 'zhi')) and
+          ((zlo_str != None) and (zhi_str != None))):
+        tokens[0] = zlo_str
+        tokens[1] = zhi_str
+        line = ' '.join(tokens)
+    elif ((len(tokens) >= 3) and
+          ((tokens[-3] == 'xy') and
+           (tokens[-2] == 'xz') and
+           (tokens[-1] == 'yz')) and
+          ((xy_str != None) and
+           (xz_str != None) and
+           (yz_str != None))):
+        tokens[0] = xy_str
+        tokens[1] = xz_str
+        tokens[2] = yz_str
+        line = ' '.join(tokens)
+    return line
+
+
+def _ColumnValues(column, atomids, row_cache):
+    """
+    Look up the entries in a dictionary (or FrameColumn) for every atom-ID
+    in the list "atomids".  Missing entries are replaced by None.
+    (The rows corresponding to these atom-IDs are stored in "row_cache",
+     so that they can be reused by other FrameColumns from the same frame.)
+
+    """
+    if len(atomids) == 0:
+        return []
+    if not isinstance(column, FrameColumn):
+        if len(column) == 0:
+            return [None] * len(atomids)
+        return [column[atomid] if atomid in column else None
+                for atomid in atomids]
+    rows = column.rows
+    if row_cache.get('rows') is not rows:
+        row_cache['rows'] = rows
+        try:
+            # (This is faster, but only works if no atoms are missing.)
+            row_cache['indices'] = list(itemgetter(*atomids)(rows))
+            row_cache['complete'] = True
+        except KeyError:
+            row_cache['indices'] = [rows.get(atomid) for atomid in atomids]
+            row_cache['complete'] = False
+        if len(atomids) == 1:
+            row_cache['indices'] = [rows.get(atomids[0])]
+            row_cache['complete'] = (row_cache['indices'][0] is not None)
+    indices = row_cache['indices']
+    values = column.values
+    if row_cache['complete'] and (len(indices) > 1):
+        return itemgetter(*indices)(values)
+    return [values[i] if i is not None else None
+            for i in indices]
+
+
+class DataFileTemplate(object):
+    """
+    The contents of a LAMMPS DATA file, parsed once, so that the same
+    file can be written many times (once per frame) with different
+    coordinates.  The file is stored as a list of "segments".
+    Each segment is a tuple whose first entry indicates its type:
+      ('text', text)      text which never changes (including newlines)
+      ('header', line)    a line from the header (eg. box boundaries)
+      ('Atoms', lines)    consecutive lines from the "Atoms" section
+      ('Velocities', lines)          ...from the "Velocities" section
+    In the last two cases, "lines" is a list of (atomid, tokens, line)
+    tuples (one per line), where "tokens" is the result of line.split().
+    (Comments and leading/trailing whitespace are removed from every line.)
+
+    """
+
+    def __init__(self, contents):
+        self.first_line = ''
+        self.segments = []
+        section = ''
+        firstline = True
+        text = []
+        lines = None
+        for line in contents:
+            ic = line.find('#')
+            if ic != -1:
+                line = line[:ic]
+            line = line.strip()
+
+            if firstline:
+                # (The first line is a description, which is
+                #  replaced every time the file is written.)
+                self.first_line = line
+                firstline = False
+                continue
+
+            if ((len(line) > 0) and (section in ('Atoms', 'Velocities')) and
+                    (line not in g_data_section_names)):
+                if lines is None:
+                    if len(text) > 0:
+                        self.segments.append(('text', ''.join(text)))
+                        text = []
+                    lines = []
+                    self.segments.append((section, lines))
+                # (Tuples are used because they are ignored by the
+                #  garbage collector, which matters for large files.)
+                tokens = tuple(line.split())
+                lines.append((tokens[0], tokens, line))
+                continue
+            lines = None
+
+            if len(line) > 0:
+                if section == '':
+                    if len(text) > 0:
+                        self.segments.append(('text', ''.join(text)))
+                        text = []
+                    self.segments.append(('header', line))
+                    if line in g_data_section_names:
+                        section = line
+                    continue
+                if line in g_data_section_names:
+                    section = line
+            text.append(line + '\n')
+
+        if len(text) > 0:
+            self.segments.append(('text', ''.join(text)))
+
+    def Write(self,
+              out_file,
+              descr_str,
+              misc_settings,
+              data_settings,
+              dump_column_names,
+              coords,
+              coords_ixiyiz,
+              vects,
+              velocities,
+              atomtypes,
+              molids,
+              box_strs):
+        """
+        Write the DATA file to out_file, replacing the box boundaries,
+        atom types, molecule-IDs, coordinates, vectors, image flags,
+        and velocities with the corresponding information in the
+        arguments.  (See WriteFrameToData() for details.)
+
+        """
+        # Construct a new descriptive header line:
+        line = self.first_line
+        if descr_str != None:
+            line = descr_str
+        if len(line) > 0:
+            line = _ReplaceBoxTokens(line, *box_strs)
+        out_file.write(line + '\n')
+
+        for segment in self.segments:
+            if segment[0] == 'text':
+                out_file.write(segment[1])
+            elif segment[0] == 'header':
+                out_file.write(_ReplaceBoxTokens(segment[1], *box_strs) + '\n')
+            elif segment[0] == 'Atoms':
+                self._WriteAtoms(out_file,
+                                 segment[1],
+                                 misc_settings,
+                                 data_settings,
+                                 dump_column_names,
+                                 coords,
+                                 coords_ixiyiz,
+                                 vects,
+                                 atomtypes,
+                                 molids)
+            else:
+                self._WriteVelocities(out_file, segment[1], velocities)
+
+    @staticmethod
+    def _WriteAtoms(out_file,
+                    lines,
+                    misc_settings,
+                    data_settings,
+                    dump_column_names,
+                    coords,
+                    coords_ixiyiz,
+                    vects,
+                    atomtypes,
+                    molids):
+        atomids = [atomid for atomid, tokens, line in lines]
+        # Look up the information for every atom at once:
+        row_cache = {}
+        all_xyz = _ColumnValues(coords, atomids, row_cache)
+        all_ixiyiz = _ColumnValues(coords_ixiyiz, atomids, row_cache)
+        all_vects = None
+        if len(data_settings.ii_vects) > 0:
+            all_vects = _ColumnValues(vects, atomids, row_cache)
+        all_atomtypes = None
+        if atomtypes:
+            all_atomtypes = _ColumnValues(atomtypes, atomids, row_cache)
+        all_molids = None
+        if molids and data_settings.i_molid:
+            all_molids = _ColumnValues(molids, atomids, row_cache)
+        i_atomtype = data_settings.i_atomtype
+        i_molid = data_settings.i_molid
+        i_x = data_settings.i_coords[0]
+        i_y = data_settings.i_coords[1]
+        i_z = data_settings.i_coords[2]
+        i_xyz_max = max(i_x, i_y, i_z)
+        ii_vects = data_settings.ii_vects
+        num_columns = len(data_settings.column_names)
+        append_ixiyiz = not misc_settings.center_frame
+
+        out_lines = []
+        k = -1
+        for (atomid, tokens, line), xyz, ixiyiz in zip(lines,
+                                                       all_xyz,
+                                                       all_ixiyiz):
+            k += 1
+            tokens = list(tokens)
+
+            # update the atomtype and molID
+            # (which may change during the simulation)
+            if all_atomtypes is not None:
+                atomtype = all_atomtypes[k]
+                if atomtype is None:
+                    atomtype = atomtypes[atomid]  # (raises KeyError)
+                tokens[i_atomtype] = atomtype
+            if all_molids is not None:
+                molid = all_molids[k]
+                if molid is None:
+                    molid = molids[atomid]  # (raises KeyError)
+                tokens[i_molid] = molid
+
+            if xyz is None:
+                out_lines.append(line)
+                continue
+
+            # Loop over all of the vector degrees of
+            # freedom of the particle, excluding coords
+            # (for example: mu_x, mu_y, mu_z,
+            #            or quat_i, quat_j, quat_k)
+            # In principle, depending on the atom_style,
+            # there could be multiple vectors per atom.
+            for I in range(0, len(ii_vects)):
+                i_vx = ii_vects[I][0]
+                i_vy = ii_vects[I][1]
+                i_vz = ii_vects[I][2]
+                if all_vects[k] is not None:
+                    vxvyvz = all_vects[k][I]
+                    assert((type(vxvyvz) is tuple) and
+                           (len(vxvyvz) == 3))
+                    if ((i_vx >= len(tokens)) or
+                        (i_vy >= len(tokens)) or
+                        (i_vz >= len(tokens))):
+                        raise InputError('Error(dump2data): Atom style incompatible with data file.\n'
+                                         '       Specify the atom_style using -atomstyle style.\n')
+
+                    # Replace the vector components with numbers
+                    # from the dump file
+                    tokens[i_vx] = vxvyvz[0]
+                    tokens[i_vy] = vxvyvz[1]
+                    tokens[i_vz] = vxvyvz[2]
+
+                else:
+                    if (dump_column_names and
+                        (data_settings.column_names[
+                            i_vx] not in dump_column_names)):
+                        raise InputError('Error(dump2data): You have a vector coordinate in your DATA file named \"' + data_settings.column_names[i_vx] + '\"\n'
+                                         '       However there are no columns with this name in your DUMP file\n'
+                                         '       (or the column was not in the expected place).\n'
+                                         '       Hence, the atom styles in the dump and data files do not match.')
+
+            if i_xyz_max >= len(tokens):
+                raise InputError('Error(dump2data): Atom style incompatible with data file.\n'
+                                 '       Specify the atom_style using -atomstyle style.\n')
+            # Replace the coordinates with coordinates from
+            # the dump file into tokens[i_x]...
+            tokens[i_x] = str(xyz[0])
+            tokens[i_y] = str(xyz[1])
+            tokens[i_z] = str(xyz[2])
+
+            # Are there there any integer coords
+            # (ix, iy, iz) in the dump file?
+            if ixiyiz:
+                assert(len(ixiyiz) == 3)
+                # Integer coords stored in the DATA file too?
+                if len(tokens) == (num_columns + 3):
+                    # Then replace the last 3 columns of the
+                    # line in the data file with: ix iy iz
+                    tokens[-3:] = ixiyiz
+                elif append_ixiyiz:
+                    # Append them to the end of the line:
+                    tokens.extend(ixiyiz)
+
+            # Now finally paste all the tokens together:
+            out_lines.append(' '.join(tokens))
+
+        out_lines.append('')
+        out_file.write('\n'.join(out_lines))
+
+    @staticmethod
+    def _WriteVelocities(out_file, lines, velocities):
+        atomids = [atomid for atomid, tokens, line in lines]
+        all_vxvyvz = _ColumnValues(velocities, atomids, {})
+        out_lines = []
+        for (atomid, tokens, line), vxvyvz in zip(lines, all_vxvyvz):
+            if vxvyvz is None:
+                out_lines.append(line)
+                continue
+            if len(tokens) < 4:
+                raise InputError(
+                    'Error(dump2data): Not enough columns in the \"Velocities\" file.\n')
+            # Replace the velocities with velocities from the dump file
+            tokens = list(tokens)
+            tokens[1] = str(vxvyvz[0])
+            tokens[2] = str(vxvyvz[1])
+            tokens[3] = str(vxvyvz[2])
+            out_lines.append(' '.join(tokens))
+
+        out_lines.append('')
+        out_file.write('\n'.join(out_lines))
+
+
 def WriteFrameToData(out_file,
                      descr_str,
                      misc_settings,
@@ -597,183 +2149,285 @@ def WriteFrameToData(out_file,
                      zlo_str, zhi_str,
                      xy_str, xz_str, yz_str):
     """
-    Open a data file.  Read the LAMMPS DATA file line by line.
+    Write a copy of the LAMMPS DATA file (data_settings.contents).
     When the line contains information which is also in the dump file,
     replace that information with information from the dump file.
     (Information from a dump file is stored in the arguments to this function.)
     The resulting file also has LAMMPS DATA format.
+    The DATA file is only parsed once (the first time this function is
+    invoked).  The result is stored in data_settings.template.
 
     """
+    if data_settings.template is None:
+        data_settings.template = DataFileTemplate(data_settings.contents)
+    data_settings.template.Write(out_file,
+                                 descr_str,
+                                 misc_settings,
+                                 data_settings,
+                                 dump_column_names,
+                                 coords,
+                                 coords_ixiyiz,
+                                 vects,
+                                 velocities,
+                                 atomtypes,
+                                 molids,
+                                 (xlo_str, xhi_str,
+                                  ylo_str, yhi_str,
+                                  zlo_str, zhi_str,
+                                  xy_str, xz_str, yz_str))
+    return
 
-    section = ''
-    firstline = True
-    for line in data_settings.contents:
-        ic = line.find('#')
-        if ic != -1:
-            line = line[:ic]
-        line = line.strip()
 
-        if firstline:  # Construct a new descriptive header line:
-            if descr_str != None:
-                line = descr_str
-            firstline = False
+def ProcessFrame(frame, misc_settings):
+    """
+    Check the number of atoms in the frame, and scale and/or center
+    the coordinates (if requested by the user).
 
-        if (len(line) > 0):
-            # The initial section (section='') is assumed to be
-            # the "LAMMPS Description" section.  This is where the
-            # box boundaries are specified.
-            if section == '':
-                tokens = line.split()
-                if ((len(tokens) >= 2) and
-                        ((tokens[-2] == 'xlo') and (tokens[-1] == 'xhi')) and
-                        ((xlo_str != None) and (xhi_str != None))):
-                    tokens[0] = xlo_str
-                    tokens[1] = xhi_str
-                    line = ' '.join(tokens)
-                elif ((len(tokens) >= 2) and
-                      ((tokens[-2] == 'ylo') and (tokens[-1] == 'yhi')) and
-                      ((ylo_str != None) and (yhi_str != None))):
-                    tokens[0] = ylo_str
-                    tokens[1] = yhi_str
-                    line = ' '.join(tokens)
-                elif ((len(tokens) >= 2) and
-                      ((tokens[-2] == 'zlo') and (tokens[-1] == 'zhi')) and
-                      ((zlo_str != None) and (zhi_str != None))):
-                    tokens[0] = zlo_str
-                    tokens[1] = zhi_str
-                    line = ' '.join(tokens)
-                elif ((len(tokens) >= 3) and
-                      ((tokens[-3] == 'xy') and
-                       (tokens[-2] == 'xz') and
-                       (tokens[-1] == 'yz')) and
-                      ((xy_str != None) and
-                       (xz_str != None) and
-                       (yz_str != None))):
-                    tokens[0] = xy_str
-                    tokens[1] = xz_str
-                    tokens[2] = yz_str
-                    line = ' '.join(tokens)
-            if (line in set(['Masses', 'Velocities', 'Atoms',
-                             'Bond Coeffs', 'Angle Coeffs',
-                             'Dihedral Coeffs', 'Improper Coeffs',
-                             'Bonds', 'Angles', 'Dihedrals', 'Impropers'])):
-                section = line
+    """
+    if misc_settings.scale != None:
+        scale = misc_settings.scale
+        frame.coords = [[str(float(crd) * scale) for crd in xyz]
+                        for xyz in frame.coords]
+
+    if len(frame.rows) != frame.natoms:
+        err_msg = 'Number of lines in \"ITEM: ATOMS\" section disagrees with\n' \
+            + '           \"ITEM: NUMBER OF ATOMS\" declared earlier in this file.\n'
+        raise InputError(err_msg)
+
+    if misc_settings.center_frame:
+        CenterFrame(frame)
+
+
+def SelectFrame(timestep_str, misc_settings):
+    """
+    When converting multiple frames (-multi), should the frame at this
+    timestep be written?  Returns a tuple of two booleans:
+    (write_this_frame, stop)  where "stop" indicates that this frame
+    (and all subsequent frames) lie beyond the last timestep requested.
+
+    """
+    write_this_frame = True
+    stop = False
+    if (misc_settings.tstart and
+            (int(timestep_str) < misc_settings.tstart)):
+        write_this_frame = False
+    if (misc_settings.tstop and
+            (int(timestep_str) > misc_settings.tstop)):
+        write_this_frame = False
+        stop = True
+
+    if misc_settings.tstart:
+        tstart = misc_settings.tstart
+    else:
+        tstart = 0
+
+    if ((int(timestep_str) - tstart)
+            %
+            misc_settings.skip_interval) != 0:
+        write_this_frame = False
+
+    return write_this_frame, stop
+
+
+def WriteFrame(out_file, frame, misc_settings, data_settings):
+    """
+    Write the frame to out_file, in the format requested by the user
+    (raw, xyz, or LAMMPS data format).
+
+    """
+    frame_coords = FrameColumn(frame.rows, frame.coords)
+    frame_timestep_str = frame.timestep_str
+
+    # Print the frame
+    # First check which format to output the data:
+    if misc_settings.output_format == 'raw':
+        # Print out the coordinates in simple 3-column text
+        # format
+        for atomid, xyz in iter(sorted(frame_coords.items(), key=GetIntAtomID)):
+            if misc_settings.scale == None:
+                out_file.write(
+                    str(xyz[0]) + ' ' + str(xyz[1]) + ' ' + str(xyz[2]) + '\n')
             else:
-                if (section == 'Atoms'):
-                    tokens = line.split()
-                    atomid = tokens[0]
-
-                    # update the atomtype and molID
-                    # (which may change during the simulation)
-                    if atomtypes:
-                        tokens[data_settings.i_atomtype] = atomtypes[atomid]
-                    if molids and data_settings.i_molid:
-                        tokens[data_settings.i_molid] = molids[atomid]
-
-                    if atomid in coords:
-                        # Loop over all of the vector degrees of
-                        # freedom of the particle, excluding coords
-                        # (for example: mu_x, mu_y, mu_z,
-                        #            or quat_i, quat_j, quat_k)
-                        # In principle, depending on the atom_style,
-                        # there could be multiple vectors per atom.
-                        for I in range(0, len(data_settings.ii_vects)):
-                            i_vx = data_settings.ii_vects[I][0]
-                            i_vy = data_settings.ii_vects[I][1]
-                            i_vz = data_settings.ii_vects[I][2]
-                            if atomid in vects:
-                                vxvyvz = vects[atomid][I]
-                                assert((type(vxvyvz) is tuple) and
-                                       (len(vxvyvz) == 3))
-                                if ((i_vx >= len(tokens)) or
-                                    (i_vy >= len(tokens)) or
-                                    (i_vz >= len(tokens))):
-                                    raise InputError('Error(dump2data): Atom style incompatible with data file.\n'
-                                                     '       Specify the atom_style using -atomstyle style.\n')
-
-                                # Replace the vector components with numbers
-                                # from the dump file
-                                tokens[i_vx] = vxvyvz[0]
-                                tokens[i_vy] = vxvyvz[1]
-                                tokens[i_vz] = vxvyvz[2]
-
-                            else:
-                                if (dump_column_names and
-                                    (data_settings.column_names[
-                                        i_vx] not in dump_column_names)):
-                                    raise InputError('Error(dump2data): You have a vector coordinate in your DATA file named \"' + data_settings.column_names[i_vx] + '\"\n'
-                                                     '       However there are no columns with this name in your DUMP file\n'
-                                                     '       (or the column was not in the expected place).\n'
-                                                     '       Hence, the atom styles in the dump and data files do not match.')
-
-                        # Now loop over the coordinates of each atom.
-                        # for I in range(0,len(data_settings.ii_coords)):
-                        #    xyz = coords[atomid][I]
-                        #            THIS LOOP IS SILLY.
-                        #            EACH ATOM ONLY HAS ONE SET OF X,Y,Z
-                        #            COORDINATES. COMMENTING OUT THIS LOOP:
-                        #    i_x = data_settings.ii_coords[I][0]
-                        #    i_y = data_settings.ii_coords[I][1]
-                        #    i_z = data_settings.ii_coords[I][2]
-                        # USING THIS INSTEAD:
-
-                        xyz = coords[atomid]
-                        i_x = data_settings.i_coords[0]
-                        i_y = data_settings.i_coords[1]
-                        i_z = data_settings.i_coords[2]
-                        if ((i_x >= len(tokens)) or
-                            (i_y >= len(tokens)) or
-                            (i_z >= len(tokens))):
-                            raise InputError('Error(dump2data): Atom style incompatible with data file.\n'
-                                             '       Specify the atom_style using -atomstyle style.\n')
-                        # Replace the coordinates with coordinates from
-                        # the dump file into tokens[i_x]...
-                        tokens[i_x] = str(xyz[0])
-                        tokens[i_y] = str(xyz[1])
-                        tokens[i_z] = str(xyz[2])
-
-                        # Are there there any integer coords
-                        # (ix, iy, iz) in the dump file?
-                        if coords_ixiyiz[atomid]:
-                            assert(len(coords_ixiyiz[atomid]) == 3)
-                            # Integer coords stored in the DATA file too?
-                            if len(tokens) == (len(data_settings.column_names) + 3):
-                                # Then replace the last 3 columns of the
-                                # line in the data file with: ix iy iz
-                                tokens[-3] = coords_ixiyiz[atomid][0]
-                                tokens[-2] = coords_ixiyiz[atomid][1]
-                                tokens[-1] = coords_ixiyiz[atomid][2]
-                            else:
-                                if (not misc_settings.center_frame):
-                                    # Append them to the end of the line:
-                                    tokens.append(coords_ixiyiz[atomid][0])
-                                    tokens.append(coords_ixiyiz[atomid][1])
-                                    tokens.append(coords_ixiyiz[atomid][2])
-
-                        # Now finally paste all the tokens together:
-                        line = ' '.join(tokens)
-
-                elif (section == 'Velocities'):
-                    tokens = line.split()
-                    atomid = tokens[0]
-                    if atomid in velocities:
-
-                        vxvyvz = velocities[atomid]
-                        if len(tokens) < 4:
-                            raise InputError(
-                                'Error(dump2data): Not enough columns in the \"Velocities\" file.\n')
-                        # Replace the coordinates with coordinates from
-                        # the dump file into tokens[i_x]...
-                        tokens[1] = str(vxvyvz[0])
-                        tokens[2] = str(vxvyvz[1])
-                        tokens[3] = str(vxvyvz[2])
-
-                        # Now finally paste all the tokens together:
-                        line = ' '.join(tokens)
+                # Only convert to float and back if
+                # misc_settings.scale != None
+                out_file.write(str(misc_settings.scale * float(xyz[0])) + ' ' +
+                               str(misc_settings.scale * float(xyz[1])) + ' ' +
+                               str(misc_settings.scale * float(xyz[2])) + '\n')
+        out_file.write('\n')
+
+    elif misc_settings.output_format == 'xyz':
+        # Print out the coordinates in simple 3-column text
+        # format
+        out_file.write(str(len(frame_coords)) + '\n')
+        descr_str = 'LAMMPS data from timestep ' + frame_timestep_str
+        out_file.write(descr_str + '\n')
+        for atomid, xyz in iter(sorted(frame_coords.items(), key=GetIntAtomID)):
+            if misc_settings.scale == None:
+                out_file.write(str(atomid) + ' ' +
+                               str(xyz[0]) + ' ' +
+                               str(xyz[1]) + ' ' +
+                               str(xyz[2]) + '\n')
+            else:
+                # Only convert to float and back if
+                # misc_settings.scale != None
+                out_file.write(str(atomid) + ' ' +
+                               str(misc_settings.scale * float(xyz[0])) + ' ' +
+                               str(misc_settings.scale * float(xyz[1])) + ' ' +
+                               str(misc_settings.scale * float(xyz[2])) + '\n')
 
-        out_file.write(line + '\n')
+    else:
+        # Parse the DATA file specified by the user
+        # and replace appropriate lines or fields with
+        # the corresponding text from the DUMP file.
+        descr_str = 'LAMMPS data from timestep ' + frame_timestep_str
+        if frame.coords_ixiyiz is not None:
+            frame_coords_ixiyiz = FrameColumn(frame.rows,
+                                              frame.coords_ixiyiz)
+        else:
+            frame_coords_ixiyiz = defaultdict(list)
+        if frame.molids is not None:
+            frame_molids = FrameColumn(frame.rows, frame.molids)
+        else:
+            frame_molids = {}
 
-    return
+        WriteFrameToData(out_file,
+                         descr_str,
+                         misc_settings,
+                         data_settings,
+                         frame.column_names,
+                         frame.natoms,
+                         frame_coords,
+                         frame_coords_ixiyiz,
+                         FrameColumn(frame.rows, frame.vects),
+                         FrameColumn(frame.rows, frame.velocities),
+                         FrameColumn(frame.rows, frame.atomtypes),
+                         frame_molids,
+                         frame.xlo_str, frame.xhi_str,
+                         frame.ylo_str, frame.yhi_str,
+                         frame.zlo_str, frame.zhi_str,
+                         frame.xy_str, frame.xz_str, frame.yz_str)
+
+
+# Settings shared by the worker processes used by WriteFramesInParallel()
+g_worker_settings = None
+
+
+def _InitWorker(misc_settings, data_settings):
+    global g_worker_settings
+    g_worker_settings = (misc_settings, data_settings)
+
+
+def _ConvertFrame(job):
+    """
+    Convert one frame of a dump file (in a worker process).
+    "job" is a tuple containing the text of the frame (bytes) and
+    the name of the file we should write to (or None).
+    Returns a tuple containing the text that should be written to the
+    standard output, and an error message (or None).
+    (Error messages are returned instead of raised, because InputError
+     objects can not be sent between processes.)
+
+    """
+    frame_text, out_file_name = job
+    misc_settings, data_settings = g_worker_settings
+    if sys.version >= '3':
+        frame_text = frame_text.decode(locale.getpreferredencoding(False))
+    try:
+        dump_reader = DumpReader(StringIO(frame_text),
+                                 misc_settings,
+                                 data_settings)
+        frame = dump_reader.ReadFrame()
+        ProcessFrame(frame, misc_settings)
+        if out_file_name != None:
+            out_file = open(out_file_name, 'w')
+            WriteFrame(out_file, frame, misc_settings, data_settings)
+            out_file.close()
+            return '', None
+        out_file = StringIO()
+        WriteFrame(out_file, frame, misc_settings, data_settings)
+        return out_file.getvalue(), None
+    except (ValueError, InputError) as err:
+        return '', str(err)
+
+
+def WriteFramesInParallel(in_coord_file, misc_settings, data_settings):
+    """
+    Convert multiple frames (-multi) using misc_settings.nproc processes.
+    The frames are located using a DumpFrameIndex, read in batches, and
+    handed to a pool of worker processes.  The results are written in the
+    same order as they would have been if they were converted one at a
+    time, so the output is identical.  Returns False (without doing
+    anything) if in_coord_file is not a regular file (e.g. a pipe,
+    or a compressed file).
+
+    """
+    f = _OpenBinary(in_coord_file)
+    if f is None:
+        sys.stderr.write('WARNING(dump2data): -nproc requires reading the dump file from a\n'
+                         '         regular file (not a pipe or a compressed file).\n'
+                         '         Converting frames serially.\n')
+        return False
+
+    frame_index = DumpFrameIndex(f, misc_settings.dump_file_name)
+    if len(frame_index) == 0:
+        f.close()
+        return False
+
+    # Decide which frames to write, and the numbers assigned to them.
+    selected = []
+    for i in range(0, len(frame_index)):
+        if frame_index.natoms[i] == 0:
+            continue
+        write_this_frame, stop = SelectFrame(frame_index.timesteps[i],
+                                             misc_settings)
+        if stop:
+            break
+        if write_this_frame:
+            selected.append(i)
+
+    pool = multiprocessing.Pool(misc_settings.nproc,
+                                _InitWorker,
+                                (misc_settings, data_settings))
+    batch_size = 4 * misc_settings.nproc
+    num_frames_out = 0
+    try:
+        for i_batch in range(0, len(selected), batch_size):
+            jobs = []
+            messages = []
+            for i in selected[i_batch:i_batch + batch_size]:
+                num_frames_out += 1
+                message = ('  (writing frame ' + str(num_frames_out) +
+                           ' at timestep ' + frame_index.timesteps[i] + ')\n')
+                out_file_name = None
+                if misc_settings.output_format == 'data':
+                    out_file_name = data_settings.file_name + '.'\
+                        + str(num_frames_out)
+                    message += ('  (creating file \"' +
+                                out_file_name + '\")\n')
+                if i + 1 < len(frame_index):
+                    offset_stop = frame_index.offsets[i + 1]
+                else:
+                    offset_stop = frame_index.file_size
+                f.seek(frame_index.offsets[i])
+                frame_text = f.read(offset_stop - frame_index.offsets[i])
+                jobs.append((frame_text, out_file_name))
+                messages.append(message)
+            results = pool.map(_ConvertFrame, jobs, 1)
+            for i in range(0, len(jobs)):
+                out_text, err_msg = results[i]
+                if err_msg != None:
+                    # Discard files created for frames beyond this one
+                    for frame_text, out_file_name in jobs[i + 1:]:
+                        if ((out_file_name != None) and
+                                os.path.exists(out_file_name)):
+                            os.remove(out_file_name)
+                    raise InputError(err_msg)
+                sys.stderr.write(messages[i])
+                sys.stdout.write(out_text)
+    finally:
+        pool.terminate()
+        f.close()
+    return True
 
 
 def main():
@@ -797,505 +2451,100 @@ def main():
         # Skip to the line containing the correct frame/timestep.
         # (this is the last frame by default).
         # Read the "BOX BOUNDS" and the "ATOMS" sections.
-        # Store the x,y,z coordinates in the "coords" associative array
-        # (indexed by atom id, which could be non-numeric in general).
-
-        section = ''
-
-        #coords = defaultdict(list)
-        #coords_ixiyiz = defaultdict(list)
-        #vects = defaultdict(list)
-        #xlo_str = xhi_str = ylo_str = yhi_str = zlo_str = zhi_str = None
-        #xy_str = xz_str = yz_str = None
-        #natoms = -1
-        #timestep_str = ''
-
-        frame_coords = defaultdict(list)
-        frame_coords_ixiyiz = defaultdict(list)
-        frame_vects = defaultdict(list)
-        frame_velocities = defaultdict(list)
-        frame_atomtypes = defaultdict(list)
-        frame_molid = defaultdict(list)
-        frame_xlo_str = frame_xhi_str = None
-        frame_ylo_str = frame_yhi_str = None
-        frame_zlo_str = frame_zhi_str = None
-        frame_xy_str = frame_xz_str = frame_yz_str = None
-        frame_natoms = -1
-        frame_timestep_str = ''
-        i_atomid = i_atomtype = i_molid = -1
-        i_x = i_y = i_z = i_xu = i_yu = i_zu = -1
-        i_xs = i_ys = i_zs = i_xsu = i_ysu = i_zsu = -1
-
-        dump_column_names = []
+        # Store the x,y,z coordinates in the "coords" list
+        # (indexed by the atom's row in the frame, see DumpFrame).
 
         #num_frames_in = -1
         num_frames_out = 0
-        finished_reading_frame = False
         read_last_frame = False
 
         #in_coord_file = open('tmp_atom_coords.dat','r')
-        in_coord_file = sys.stdin
-
-        while True:
-
-            line = in_coord_file.readline()
-            if line == '':  # if EOF
-                if len(frame_coords) > 0:
-                    finished_reading_frame = True
-                read_last_frame = True
+        in_coord_file, is_binary = OpenDumpFile(misc_settings.dump_file_name,
+                                                misc_settings.binary_dump)
+
+        if is_binary:
+            if misc_settings.multi and (misc_settings.nproc > 1):
+                sys.stderr.write('WARNING(dump2data): -nproc is ignored when reading binary dump files.\n')
+            dump_reader = BinaryDumpReader(in_coord_file,
+                                           misc_settings,
+                                           data_settings)
+        else:
+            SeekToFirstFrame(in_coord_file, misc_settings)
 
-            line = line.strip()
-            if (line.find('ITEM:') == 0):
-                section = line
-                if (section.find('ITEM: ATOMS ') == 0):
-                    dump_column_names = line[12:].split()
-                    i_atomid, i_atomtype, i_molid = \
-                        ColNames2AidAtypeMolid(dump_column_names)
-                    #ii_coords = ColNames2Coords(dump_column_names)
-
-                    x_already_unwrapped = False
-                    y_already_unwrapped = False
-                    z_already_unwrapped = False
-
-                    if 'x' in dump_column_names:
-                        i_x = dump_column_names.index('x')
-                    elif 'xu' in dump_column_names:
-                        i_xu = dump_column_names.index('xu')
-                        x_already_unwrapped = True
-                    elif 'xs' in dump_column_names:
-                        i_xs = dump_column_names.index('xs')
-                    elif 'xsu' in dump_column_names:
-                        i_xsu = dump_column_names.index('xsu')
-                        x_already_unwrapped = True
-                    else:
-                        raise InputError('Error(dump2data): \"ATOMS\" section of dump file lacks a \"x\" column.\n' +
-                                         '       (excerpt below)\n' + line)
-
-                    if 'y' in dump_column_names:
-                        i_y = dump_column_names.index('y')
-                    elif 'yu' in dump_column_names:
-                        i_yu = dump_column_names.index('yu')
-                        y_already_unwrapped = True
-                    elif 'ys' in dump_column_names:
-                        i_ys = dump_column_names.index('ys')
-                    elif 'ysu' in dump_column_names:
-                        i_ysu = dump_column_names.index('ysu')
-                        y_already_unwrapped = True
-                    else:
-                        raise InputError('Error(dump2data): \"ATOMS\" section of dump file lacks a \"y\" column.\n' +
-                                         '       (excerpt below)\n' + line)
-
-                    if 'z' in dump_column_names:
-                        i_z = dump_column_names.index('z')
-                    elif 'zu' in dump_column_names:
-                        i_zu = dump_column_names.index('zu')
-                        z_already_unwrapped = True
-                    elif 'zs' in dump_column_names:
-                        i_zs = dump_column_names.index('zs')
-                    elif 'zsu' in dump_column_names:
-                        i_zsu = dump_column_names.index('zsu')
-                        z_already_unwrapped = True
-                    else:
-                        raise InputError('Error(dump2data): \"ATOMS\" section of dump file lacks a \"z\" column.\n' +
-                                         '       (excerpt below)\n' + line)
-
-                    ii_vects = ColNames2Vects(dump_column_names)
-                    if (len(ii_vects) != len(data_settings.ii_vects)):
-                        raise InputError('Error(dump2data): atom styles in data and dump files differ.\n'
-                                         '      Some needed columns from the atom_styles are missing in the dump file.')
-
-                    i_ix = i_iy = i_iz = -1
-                    if 'ix' in dump_column_names:
-                        i_ix = dump_column_names.index('ix')
-                    if 'iy' in dump_column_names:
-                        i_iy = dump_column_names.index('iy')
-                    if 'iz' in dump_column_names:
-                        i_iz = dump_column_names.index('iz')
-
-                    i_vx = i_vy = i_vz = -1
-                    if 'vx' in dump_column_names:
-                        i_vx = dump_column_names.index('vx')
-                    if 'vy' in dump_column_names:
-                        i_vy = dump_column_names.index('vy')
-                    if 'vz' in dump_column_names:
-                        i_vz = dump_column_names.index('vz')
+            if misc_settings.multi and (misc_settings.nproc > 1):
+                if WriteFramesInParallel(in_coord_file,
+                                         misc_settings,
+                                         data_settings):
+                    exit(0)
 
-                elif (section.find('ITEM: BOX BOUNDS') == 0):
-                    avec = [1.0, 0.0, 0.0]
-                    bvec = [0.0, 1.0, 0.0]
-                    cvec = [0.0, 0.0, 1.0]
+            dump_reader = DumpReader(in_coord_file,
+                                     misc_settings,
+                                     data_settings)
 
-                elif (section.find('ITEM: TIMESTEP') == 0):
-                    if len(frame_coords) > 0:
-                        finished_reading_frame = True
+        while True:
 
-            elif ((len(line) > 0) and (line[0] != '#')):
-                if (section.find('ITEM: TIMESTEP') == 0):
-                    finished_reading_frame = False
-                    frame_timestep_str = line
-                    frame_coords = defaultdict(list)
-                    frame_coords_ixiyiz = defaultdict(list)
-                    frame_vects = defaultdict(list)
-                    frame_velocities = defaultdict(list)
-                    frame_atomtypes = defaultdict(list)
-                    frame_molids = defaultdict(list)
-                    frame_xlo_str = frame_xhi_str = None
-                    frame_ylo_str = frame_yhi_str = None
-                    frame_zlo_str = frame_zhi_str = None
-                    frame_xy_str = frame_xz_str = frame_yz_str = None
+            frame = dump_reader.ReadFrame()
+            if frame is None:
+                break  # (there are no frames left to write)
+            read_last_frame = dump_reader.eof
+            frame_timestep_str = frame.timestep_str
 
-                elif (section == 'ITEM: NUMBER OF ATOMS'):
-                    frame_natoms = int(line)
+            ProcessFrame(frame, misc_settings)
 
-                elif (section.find('ITEM: BOX BOUNDS') == 0):
-                    is_triclinic = (section.find('xy xz yz') == 0)
+            # if (num_frames_in == -1):
+            #    if (misc_settings.timestep_str != ''):
+            #        if (float(frame_timestep_str) >=
+            #            float(misc_settings.timestep_str)):
+            #            num_frames_in = 1
+            #        if not misc_settings.multi:
+            #            read_last_frame = True
+            #    else:
+            #        num_frames_in = 1
 
-                    tokens = line.split()
-                    if not frame_xlo_str:
-                        assert(not frame_xhi_str)
-                        frame_xlo_str = tokens[0]
-                        frame_xhi_str = tokens[1]
-                        avec[0] = float(frame_xhi_str) - float(frame_xlo_str)
-                        if (is_triclinic and (len(tokens) > 2)):
-                            frame_xy_str = tokens[2]
-                            bvec[0] = float(frame_xy_str)
-                            # See http://lammps.sandia.gov/doc/Section-howto.html#howto_12
-                        # sys.stderr.write('avec='+str(avec)+'\n')
+            # Should we write out the coordinates in this frame?
+            write_this_frame = False
 
-                    elif not frame_ylo_str:
-                        assert(not frame_yhi_str)
-                        frame_ylo_str = tokens[0]
-                        frame_yhi_str = tokens[1]
-                        bvec[1] = float(frame_yhi_str) - float(frame_ylo_str)
-                        if (is_triclinic and (len(tokens) > 2)):
-                            frame_xz_str = tokens[2]
-                            cvec[0] = float(frame_xz_str)
-                            # See http://lammps.sandia.gov/doc/Section-howto.html#howto_12
-                        # sys.stderr.write('bvec='+str(bvec)+'\n')
-
-                    elif not frame_zlo_str:
-                        assert(not frame_zhi_str)
-                        frame_zlo_str = tokens[0]
-                        frame_zhi_str = tokens[1]
-                        cvec = [0.0, 0.0, float(
-                            frame_zhi_str) - float(frame_zlo_str)]
-                        if (is_triclinic and (len(tokens) > 2)):
-                            frame_yz_str = tokens[2]
-                            cvec[1] = float(frame_yz_str)
-                            # See http://lammps.sandia.gov/doc/Section-howto.html#howto_12
-                        # sys.stderr.write('cvec='+str(cvec)+'\n')
+            if misc_settings.multi:
 
-                elif (section.find('ITEM: ATOMS') == 0):
-                    tokens = line.split()
-                    atomid = tokens[i_atomid]
-                    atomtype = tokens[i_atomtype]
-                    frame_atomtypes[atomid] = atomtype
-                    if i_molid:
-                        molid = tokens[i_molid]
-                        frame_molids[atomid] = molid
-
-                    if ((i_x != -1) and (i_y != -1) and (i_z != -1)):
-                        x = float(tokens[i_x])  # i_x determined above
-                        y = float(tokens[i_y])
-                        z = float(tokens[i_z])
-
-                    elif ((i_xu != -1) and (i_yu != -1) and (i_zu != -1)):
-                        x = float(tokens[i_xu])  # i_x determined above
-                        y = float(tokens[i_yu])
-                        z = float(tokens[i_zu])
-
-                    elif ((i_xs != -1) and (i_ys != -1) and (i_zs != -1)):
-                        xs = float(tokens[i_xs])  # i_xs determined above
-                        ys = float(tokens[i_ys])
-                        zs = float(tokens[i_zs])
-
-                        x = float(xlo_str) + xs * \
-                            avec[0] + ys * bvec[0] + zs * cvec[0]
-                        y = float(ylo_str) + xs * \
-                            avec[1] + ys * bvec[1] + zs * cvec[1]
-                        z = float(zlo_str) + xs * \
-                            avec[2] + ys * bvec[2] + zs * cvec[2]
-
-                    # avec, bvec, cvec described here:
-                    # http://lammps.sandia.gov/doc/Section-howto.html#howto_12
-
-                    elif ((i_xsu != -1) and (i_ysu != -1) and (i_zsu != -1)):
-                        xsu = float(tokens[i_xsu])  # i_xs determined above
-                        ysu = float(tokens[i_ysu])
-                        zsu = float(tokens[i_zsu])
-
-                        x = float(xlo_str) + xsu * \
-                            avec[0] + ysu * bvec[0] + zsu * cvec[0]
-                        y = float(ylo_str) + xsu * \
-                            avec[1] + ysu * bvec[1] + zsu * cvec[1]
-                        z = float(zlo_str) + xsu * \
-                            avec[2] + ysu * bvec[2] + zsu * cvec[2]
-
-                    # Now deal with ix, iy, iz
-                    if (i_ix != -1) and (not x_already_unwrapped):
-                        ix = int(tokens[i_ix])
-                        if (misc_settings.center_frame or
-                                (misc_settings.output_format != 'data')):
-                            #sys.stderr.write('atomid='+str(atomid)+', ix = '+str(ix)+', avec='+str(avec)+'\n')
-                            x += ix * avec[0]
-                            y += ix * avec[1]
-                            z += ix * avec[2]
-                        else:
-                            if atomid not in frame_coords_ixiyiz:
-                                frame_coords_ixiyiz[atomid] = ["0", "0", "0"]
-                            frame_coords_ixiyiz[atomid][0] = str(ix)
-
-                    if (i_iy != -1) and (not y_already_unwrapped):
-                        iy = int(tokens[i_iy])
-                        if (misc_settings.center_frame or
-                                (misc_settings.output_format != 'data')):
-                            #sys.stderr.write('atomid='+str(atomid)+', iy = '+str(iy)+', bvec='+str(bvec)+'\n')
-                            x += iy * bvec[0]
-                            y += iy * bvec[1]
-                            z += iy * bvec[2]
-                        else:
-                            if atomid not in frame_coords_ixiyiz:
-                                frame_coords_ixiyiz[atomid] = ["0", "0", "0"]
-                            frame_coords_ixiyiz[atomid][1] = str(iy)
-
-                    if (i_iz != -1) and (not z_already_unwrapped):
-                        iz = int(tokens[i_iz])
-                        if (misc_settings.center_frame or
-                                (misc_settings.output_format != 'data')):
-                            #sys.stderr.write('atomid='+str(atomid)+', iz = '+str(iz)+', cvec='+str(cvec)+'\n')
-                            x += iz * cvec[0]
-                            y += iz * cvec[1]
-                            z += iz * cvec[2]
-                        else:
-                            if atomid not in frame_coords_ixiyiz:
-                                frame_coords_ixiyiz[atomid] = ["0", "0", "0"]
-                            frame_coords_ixiyiz[atomid][2] = str(iz)
-
-                    #frame_coords[atomid] = [str(x), str(y), str(z)]
-                    frame_coords[atomid] = [x, y, z]
-
-                    vx = 0.0
-                    vy = 0.0
-                    vz = 0.0
-                    if i_vx != -1:
-                        vx = float(tokens[i_vx])
-                    if i_vy != -1:
-                        vy = float(tokens[i_vy])
-                    if i_vz != -1:
-                        vz = float(tokens[i_vz])
-
-                    frame_velocities[atomid] = [vx, vy, vz]
-
-                    # NOTE:
-                    # There can be multiple "vects" associated with each atom
-                    # (for example, dipole moments, ellipsoid directions, etc..)
-
-                    if atomid not in frame_vects:
-                        frame_vects[atomid] = [
-                            None for I in range(0, len(ii_vects))]
-
-                    for I in range(0, len(ii_vects)):
-                        i_vx = ii_vects[I][0]
-                        i_vy = ii_vects[I][1]
-                        i_vz = ii_vects[I][2]
-                        vx_str = tokens[i_vx]
-                        vy_str = tokens[i_vy]
-                        vz_str = tokens[i_vz]
-
-                        # Now the annoying part:
-                        # Which vect is it (mux,muy,muz) or (quati,quatj,quatk)?
-                        # The columns could be listed in a different order
-                        # in the data file and in the dump file.
-                        # Figure out which vector it is in the data file (stored
-                        # in the integer "I_data") so that column names match.
-                        name_vx = dump_column_names[i_vx]
-                        name_vy = dump_column_names[i_vy]
-                        name_vz = dump_column_names[i_vz]
-                        i_vx_data = 0
-                        I_data = -1
-                        # This code is ugly and inneficient.
-                        # I never want to touch this code again. (Hope it
-                        # works)
-                        while i_vx_data < len(data_settings.column_names):
-                            if name_vx == data_settings.column_names[i_vx_data]:
-                                I_data = 0
-                                while I_data < len(data_settings.ii_vects):
-                                    if ii_vects[I] == data_settings.ii_vects[I_data]:
-                                        break
-                                    I_data += 1
-
-                            if (0 < I_data) and (I_data < len(data_settings.ii_vects)):
-                                break
-
-                            i_vx_data += 1
-
-                        if (0 <= I_data) and (I_data < len(data_settings.ii_vects)):
-                            frame_vects[atomid][I_data] = (
-                                vx_str, vy_str, vz_str)
-                        else:
-                            raise InputError('Error(dump2data): You have a vector coordinate in your dump file named \"' + name_vx + '\"\n'
-                                             '       However there are no columns with this name in your data file\n'
-                                             '       (or the column was not in the expected place).\n'
-                                             '       Hence, the atom styles in the dump and data files do not match.')
-
-            if finished_reading_frame:
-
-                if misc_settings.scale != None:
-                    for atomid in frame_coords:
-                        for d in range(0, 3):
-                            crd = float(frame_coords[atomid][d])
-                            frame_coords[atomid][d] = str(
-                                crd * misc_settings.scale)
-
-                if len(frame_coords) != frame_natoms:
-                    err_msg = 'Number of lines in \"ITEM: ATOMS\" section disagrees with\n' \
-                        + '           \"ITEM: NUMBER OF ATOMS\" declared earlier in this file.\n'
-                    raise InputError(err_msg)
+                write_this_frame, stop = SelectFrame(frame_timestep_str,
+                                                     misc_settings)
+                if stop:
+                    read_last_frame = True
 
-                if misc_settings.center_frame:
-                    cm = [0.0, 0.0, 0.0]
-                    for atomid in frame_coords:
-                        for d in range(0, 3):
-                            cm[d] += float(frame_coords[atomid][d])
-                    for d in range(0, 3):
-                        cm[d] /= float(len(frame_coords))
-                    for atomid in frame_coords:
-                        for d in range(0, 3):
-                            frame_coords[atomid][d] = "%.7g" % (
-                                float(frame_coords[atomid][d]) - cm[d])
-                        frame_coords_ixiyiz[atomid] = ["0", "0", "0"]
-
-                    if misc_settings.output_format != 'data':
-                        frame_coords_ixiyiz[atomid] = ["0", "0", "0"]
-
-                # if (num_frames_in == -1):
-                #    if (misc_settings.timestep_str != ''):
-                #        if (float(frame_timestep_str) >=
-                #            float(misc_settings.timestep_str)):
-                #            num_frames_in = 1
-                #        if not misc_settings.multi:
-                #            read_last_frame = True
-                #    else:
-                #        num_frames_in = 1
-
-                # Should we write out the coordinates in this frame?
-                write_this_frame = False
-
-                if misc_settings.multi:
-
-                    write_this_frame = True
-                    if (misc_settings.tstart and
-                            (int(frame_timestep_str) < misc_settings.tstart)):
-                        write_this_frame = False
-                    if (misc_settings.tstop and
-                            (int(frame_timestep_str) > misc_settings.tstop)):
-                        write_this_frame = False
+            else:
+                if misc_settings.last_frame:
+                    if read_last_frame:
+                        write_this_frame = True
+                else:
+                    assert(misc_settings.timestep_str)
+                    if (int(frame_timestep_str) >=
+                            int(misc_settings.timestep_str)):
+                        write_this_frame = True
                         read_last_frame = True
 
-                    if misc_settings.tstart:
-                        tstart = misc_settings.tstart
-                    else:
-                        tstart = 0
+            if write_this_frame:
+
+                num_frames_out += 1
 
-                    if ((int(frame_timestep_str) - tstart)
-                            %
-                            misc_settings.skip_interval) != 0:
-                        write_this_frame = False
+                sys.stderr.write('  (writing frame ' + str(num_frames_out) +
+                                 ' at timestep ' + frame_timestep_str + ')\n')
 
+                if misc_settings.multi and (misc_settings.output_format == 'data'):
+                    out_file_name = data_settings.file_name + '.'\
+                        + str(num_frames_out)
+                    sys.stderr.write(
+                        '  (creating file \"' + out_file_name + '\")\n')
+                    out_file = open(out_file_name, 'w')
+                    WriteFrame(out_file, frame, misc_settings, data_settings)
+                    out_file.close()
                 else:
-                    if misc_settings.last_frame:
-                        if read_last_frame:
-                            write_this_frame = True
-                    else:
-                        assert(misc_settings.timestep_str)
-                        if (int(frame_timestep_str) >=
-                                int(misc_settings.timestep_str)):
-                            write_this_frame = True
-                            read_last_frame = True
-
-                if write_this_frame:
-
-                    num_frames_out += 1
-
-                    sys.stderr.write('  (writing frame ' + str(num_frames_out) +
-                                     ' at timestep ' + frame_timestep_str + ')\n')
-
-                    # Print the frame
-                    # First check which format to output the data:
-                    if misc_settings.output_format == 'raw':
-                        # Print out the coordinates in simple 3-column text
-                        # format
-                        for atomid, xyz in iter(sorted(frame_coords.items(), key=GetIntAtomID)):
-                            if misc_settings.scale == None:
-                                sys.stdout.write(
-                                    str(xyz[0]) + ' ' + str(xyz[1]) + ' ' + str(xyz[2]) + '\n')
-                            else:
-                                # Only convert to float and back if
-                                # misc_settings.scale != None
-                                sys.stdout.write(str(misc_settings.scale * float(xyz[0])) + ' ' +
-                                                 str(misc_settings.scale * float(xyz[1])) + ' ' +
-                                                 str(misc_settings.scale * float(xyz[2])) + '\n')
-                        sys.stdout.write('\n')
-
-                    elif misc_settings.output_format == 'xyz':
-                            # Print out the coordinates in simple 3-column text
-                            # format
-                        sys.stdout.write(str(len(frame_coords)) + '\n')
-                        descr_str = 'LAMMPS data from timestep ' + frame_timestep_str
-                        sys.stdout.write(descr_str + '\n')
-                        for atomid, xyz in iter(sorted(frame_coords.items(), key=GetIntAtomID)):
-                            if misc_settings.scale == None:
-                                sys.stdout.write(str(atomid) + ' ' +
-                                                 str(xyz[0]) + ' ' +
-                                                 str(xyz[1]) + ' ' +
-                                                 str(xyz[2]) + '\n')
-                            else:
-                                # Only convert to float and back if
-                                # misc_settings.scale != None
-                                sys.stdout.write(str(atomid) + ' ' +
-                                                 str(misc_settings.scale * float(xyz[0])) + ' ' +
-                                                 str(misc_settings.scale * float(xyz[1])) + ' ' +
-                                                 str(misc_settings.scale * float(xyz[2])) + '\n')
-
-                    else:
-                        # Parse the DATA file specified by the user
-                        # and replace appropriate lines or fields with
-                        # the corresponding text from the DUMP file.
-                        descr_str = 'LAMMPS data from timestep ' + frame_timestep_str
-                        if misc_settings.multi and (misc_settings.output_format == 'data'):
-                            out_file_name = data_settings.file_name + '.'\
-                                + str(num_frames_out)
-                            sys.stderr.write(
-                                '  (creating file \"' + out_file_name + '\")\n')
-                            out_file = open(out_file_name, 'w')
-                        else:
-                            out_file = sys.stdout
-
-                        WriteFrameToData(out_file,
-                                         descr_str,
-                                         misc_settings,
-                                         data_settings,
-                                         dump_column_names,
-                                         frame_natoms,
-                                         frame_coords,
-                                         frame_coords_ixiyiz,
-                                         frame_vects,
-                                         frame_velocities,
-                                         frame_atomtypes,
-                                         frame_molids,
-                                         frame_xlo_str, frame_xhi_str,
-                                         frame_ylo_str, frame_yhi_str,
-                                         frame_zlo_str, frame_zhi_str,
-                                         frame_xy_str, frame_xz_str, frame_yz_str)
-
-                        # if misc_settings.multi:
-                        #    out_file.close()
-
-                # if num_frames_in >= 0:
-                #    num_frames_in += 1
-
-                if read_last_frame:
-                    exit(0)
+                    WriteFrame(sys.stdout, frame, misc_settings, data_settings)
+
+            # if num_frames_in >= 0:
+            #    num_frames_in += 1
+
+            if read_last_frame:
+                exit(0)
 
         for warning_str in warning_strings:
             sys.stderr.write(warning_str + '\n')
@@ -17,6 +17,8 @@ For more details, see "doc/utils/docs_extract_lammps_data.txt"
 """
 
 import sys
+import mmap
+import locale
 
 lammps_data_sections = set(['Atoms',
                             'Masses',
@@ -109,28 +111,281 @@ def ExtractDataSection(f,
         i += 1
 
 
+class DataSection(object):
+    """
+    The location of one section of a LAMMPS data file (as recorded by
+    DataFileIndex).  Line numbers start at 0.  Byte offsets are measured from
+    the beginning of the file.  Ranges exclude their upper bound.
+        i_header           line number of the section name
+        i_begin, i_end     range of the lines in the body of the section
+        i_extent           the line following the last line which belongs to
+                           this section (including the section name, and the
+                           blank or comment lines which follow it)
+        offset_header, offset_begin, offset_end, offset_extent
+                           the corresponding byte offsets
+    """
+
+    __slots__ = ['name',
+                 'i_header', 'i_begin', 'i_end', 'i_extent',
+                 'offset_header', 'offset_begin', 'offset_end',
+                 'offset_extent']
+
+    def __init__(self, name, i_header, offset_header):
+        self.name = name
+        self.i_header = i_header
+        self.offset_header = offset_header
+        self.i_begin = self.i_end = self.i_extent = i_header + 1
+        self.offset_begin = self.offset_end = self.offset_extent = -1
+
+    def __len__(self):
+        return self.i_end - self.i_begin
+
+
+
+class DataFileIndex(object):
+    """
+    DataFileIndex scans a LAMMPS data file once and records the byte offsets
+    and line numbers of every section in the file.  Afterwards, the lines
+    in any section can be retrieved (lazily) without scanning the file again.
+    If possible, the file is memory-mapped (so that only the sections which
+    are actually requested are read from the disk).  Otherwise (for example,
+    if the file is a pipe), its contents are read into memory once.
+
+    Lines() and LineNums() return the same lines as ExtractDataSection().
+    (Any line whose text matches a section name in "lammps_data_sections",
+     or which is surrounded by blank lines, is a potential section name.
+     Additional section names can be supplied using the "section_names"
+     argument.)
+
+    Typical usage:
+
+    index = DataFileIndex(open('system.data', 'rb'))
+    for line in index.Lines('Atoms'):
+        ...
+    for line in index.Lines('Bonds'):
+        ...
+
+    """
+
+    def __init__(self, f, section_names=None, comment_char='#'):
+        if isinstance(f, str):
+            f = open(f, 'rb')
+        self.comment_char = comment_char
+        self.section_names = set(lammps_data_sections)
+        if section_names:
+            self.section_names.update(section_names)
+        self.buf = None
+        try:
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, ValueError, IOError, OSError,
+                EnvironmentError, mmap.error):
+            # (This happens for pipes, empty files, and file-like objects.)
+            if hasattr(f, 'buffer'):
+                f = f.buffer  # (python3 text streams: read raw bytes instead)
+            self.buf = f.read()
+            if not isinstance(self.buf, bytes):
+                self.buf = self.buf.encode(_g_encoding)
+        self.size = len(self.buf)
+        self.sections = {}       # maps section names to lists of DataSections
+        self.nlines = 0
+        self.i_header_end = 0    # (where the "Header" section ends)
+        self.offset_header_end = 0
+        self._Scan()
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        self.buf = None
+
+    def _IterLines(self, offset=0, offset_stop=None):
+        """
+        Yield (offset, offset_next, line) tuples for the lines of text found
+        in a range of bytes.  ("offset_next" is the offset of the next line.)
+        """
+        buf = self.buf
+        if offset_stop is None:
+            offset_stop = self.size
+        newline = b'\n'
+        while offset < offset_stop:
+            i_newline = buf.find(newline, offset, offset_stop)
+            if i_newline == -1:
+                offset_next = offset_stop
+            else:
+                offset_next = i_newline + 1
+            yield offset, offset_next, _Decode(buf[offset:offset_next])
+            offset = offset_next
+
+    def _Scan(self):
+        """
+        Read the file once, and record the location of every section.
+        This mimics the state-machine in ExtractDataSection().
+        """
+        sections_open = []    # sections whose body has not ended yet
+        candidate = None      # possible section name (if followed by blank)
+        prev_blank = True
+        nonheader_encountered = False
+        i = 0
+        offset = 0
+        for offset, offset_next, line_orig in self._IterLines():
+            if self.comment_char in line_orig:
+                line = DeleteComments(line_orig,
+                                      comment_char=self.comment_char).strip()
+            else:
+                line = line_orig.strip()
+            blank = (len(line) == 0)
+
+            # Was the previous line a (single-line) block of text which is
+            # surrounded by blank lines?  If so, treat it as a section name.
+            if candidate is not None:
+                if blank:
+                    sections_open.append(candidate)
+                    self.sections.setdefault(candidate.name,
+                                             []).append(candidate)
+                candidate = None
+
+            # Update the sections which are currently open
+            if len(sections_open) > 0:
+                still_open = []
+                for section in sections_open:
+                    if blank:
+                        if section.offset_begin != -1:
+                            # This blank line ends the section's body.
+                            section.i_extent = i + 1
+                            section.offset_extent = offset_next
+                            continue
+                    else:
+                        if section.offset_begin == -1:
+                            section.i_begin = i
+                            section.offset_begin = offset
+                        section.i_end = i + 1
+                        section.offset_end = offset_next
+                    still_open.append(section)
+                sections_open = still_open
+
+            if line in self.section_names:
+                if ((not nonheader_encountered) and
+                        (line in lammps_data_sections)):
+                    nonheader_encountered = True
+                    self.i_header_end = i
+                    self.offset_header_end = offset
+                section = DataSection(line, i, offset)
+                sections_open.append(section)
+                self.sections.setdefault(line, []).append(section)
+            elif (not blank) and prev_blank:
+                candidate = DataSection(line, i, offset)
+
+            prev_blank = blank
+            i += 1
+
+        offset = self.size
+        if candidate is not None:
+            # (A section name at the very end of the file.)
+            self.sections.setdefault(candidate.name, []).append(candidate)
+            sections_open.append(candidate)
+        for section in sections_open:
+            section.i_extent = i
+            section.offset_extent = offset
+        for section_list in self.sections.values():
+            for section in section_list:
+                if section.offset_begin == -1:
+                    # (No text follows this section name.)
+                    section.i_begin = section.i_end = section.i_extent
+                    section.offset_begin = section.offset_end = \
+                        section.offset_extent
+        if not nonheader_encountered:
+            self.i_header_end = i
+            self.offset_header_end = offset
+        self.nlines = i
+
+    def __contains__(self, section_name):
+        return section_name in self.sections
+
+    def SectionNames(self):
+        return list(self.sections.keys())
+
+    def Find(self, section_name):
+        """ Return a list of DataSection objects with this name. """
+        return self.sections.get(section_name, [])
+
+    def LineCount(self, section_name):
+        """ The number of lines in the body of a section. """
+        if section_name in ('header', 'Header'):
+            return self.i_header_end
+        return sum([len(section) for section in self.Find(section_name)])
+
+    def _Ranges(self, section_name, include_section_name=False):
+        if section_name in ('header', 'Header'):
+            return [(0, self.i_header_end, 0, self.offset_header_end)]
+        ranges = []
+        for section in self.Find(section_name):
+            if include_section_name:
+                ranges.append((section.i_header, section.i_extent,
+                               section.offset_header, section.offset_extent))
+            else:
+                ranges.append((section.i_begin, section.i_end,
+                               section.offset_begin, section.offset_end))
+        return ranges
+
+    def Lines(self, section_name, include_section_name=False):
+        """ Yield the lines of text belonging to a section (in order). """
+        for i_a, i_b, offset_a, offset_b in self._Ranges(section_name,
+                                                         include_section_name):
+            for offset, offset_next, line in self._IterLines(offset_a,
+                                                             offset_b):
+                yield line
+
+    def LineNums(self, section_name, include_section_name=False):
+        """ Yield the line numbers of the lines belonging to a section. """
+        for i_a, i_b, offset_a, offset_b in self._Ranges(section_name,
+                                                         include_section_name):
+            for i in range(i_a, i_b):
+                yield i
+
+    def AllLines(self):
+        """ Yield every line in the file (in order). """
+        for offset, offset_next, line in self._IterLines():
+            yield line
+
+
+
+if sys.version > '3':
+    _g_encoding = locale.getpreferredencoding(False)
+
+    def _Decode(b):
+        return b.decode(_g_encoding)
+else:
+    _g_encoding = None
+
+    def _Decode(b):
+        return b
+
+
+
 def main():
-    lines = sys.stdin.readlines()
     exclude_sections = False
     if sys.argv[1] == '-n':
         exclude_sections = True
         del sys.argv[1]
 
+    # (The file is scanned only once, regardless of the number of sections.)
+    index = DataFileIndex(sys.stdin, section_names=sys.argv[1:])
+
     if not exclude_sections:
         for section_name in sys.argv[1:]:
-            for line in ExtractDataSection(lines, section_name):
+            for line in index.Lines(section_name):
                 sys.stdout.write(line)
     else:
         line_nums_exclude = set([])
         for section_name in sys.argv[1:]:
-            for line_num in ExtractDataSection(lines,
-                                               section_name,
-                                               include_section_name=True,
-                                               return_line_nums=True):
+            for line_num in index.LineNums(section_name,
+                                           include_section_name=True):
                 line_nums_exclude.add(line_num)
-        for i in range(0, len(lines)):
+        i = 0
+        for line in index.AllLines():
             if i not in line_nums_exclude:
-                sys.stdout.write(lines[i])
+                sys.stdout.write(line)
+            i += 1
+    index.close()
 
     return
 
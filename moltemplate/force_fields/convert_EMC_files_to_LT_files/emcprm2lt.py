@@ -3,7 +3,7 @@
 import os, sys, getopt
 import datetime
 
-__version__ = 0.2
+__version__ = 0.3
 
 #################### UNITS ####################
 # Only used with --units flag
@@ -30,6 +30,10 @@ def helpme():
     print 'Other commands:'
     print '--name= provides basename for output file if desired\n'
     print '--units flag for manual units (no parameter needed)\n'
+    print '--atoms="QUOTED LIST" only convert parameters for this subset of atom types'
+    print '--atoms-from-data=FILE only convert parameters for the atom types in a'
+    print '  LAMMPS data file (listed in its "Atom Type Labels" section, or in the'
+    print '  comments of its "Masses" section)\n'
     print 'Usage example:'
     print 'emcprm2lt.py file1 file2 --bond-style=harmonic --angle-style=harmonic'
     print ''
@@ -60,6 +64,49 @@ def WriteInit():
         print 'Warning: special_bonds needed, add to "In Init" section\n'
     foutput.write('  } # end init\n')
 
+def ReadAtomTypesFromDataFile(filename):
+# Read the names of the atom types in a LAMMPS data file, either from the
+# "Atom Type Labels" section, or from the comments in the "Masses" section
+    if not os.path.isfile(filename):
+        print 'invalid filename:', filename
+        Abort()
+    type_labels = []; mass_comments = []
+    section = ''
+    fdata = open(filename, 'r')
+    for line in fdata.readlines()[1:]: # (the first line is a comment)
+        ic = line.find('#')
+        if ic != -1:
+            comment_tokens = line[ic+1:].split()
+            tokens = line[:ic].split()
+        else:
+            comment_tokens = []
+            tokens = line.split()
+        if len(tokens) == 0:
+            continue
+        if not tokens[0].isdigit():
+            section = ' '.join(tokens)
+        elif (section == 'Atom Type Labels') and (len(tokens) > 1):
+            type_labels.append(tokens[1])
+        elif (section == 'Masses') and (len(comment_tokens) > 0):
+            mass_comments.append(comment_tokens[0])
+    fdata.close()
+    if len(type_labels) > 0:
+        return type_labels
+    if len(mass_comments) == 0:
+        print 'Error: Unable to find the names of the atom types in', filename
+        Abort()
+    return mass_comments
+
+def InSubset(names, column):
+# Check whether each name is a wildcard, or is the equivalence (in this column
+# of the EQUIVALENCE section) of one of the atom types selected by the user
+    if len(type_subset) == 0:
+        return True
+    for n in names:
+        if (n != '*') and (n not in subset_equiv[column]):
+            return False
+    return True
+
 def Units(length_flag, energy_flag, density_flag):
 # Check flags for all units, determine what conversions are needed, hard-coded for LAMMPS 'real'
     print 'Attempting to auto-convert units... This should always be double-checked',\
@@ -158,10 +205,12 @@ if len(sys.argv) == 1:
 manual_units = False # Turned on via command line
 args = list(sys.argv[1:])
 myopts, args = getopt.gnu_getopt(args, 'fh', ['pair-style=', 'bond-style=', 'angle-style=',
-    'dihedral-style=', 'improper-style=', 'name=', 'units'])
+    'dihedral-style=', 'improper-style=', 'name=', 'units', 'atoms=',
+    'atoms-from-data='])
 filenames = list(args)
 pstyle = ''; bstyle = ''; astyle = ''; dstyle = ''; istyle = ''
 name = ''
+type_subset = set([])
 for opt, arg in myopts:
     if opt in ('-f'):
         filenames = arg
@@ -180,6 +229,10 @@ for opt, arg in myopts:
     elif opt in ('--units'):
         manual_units = True
         print 'Manual units enabled, modify python script accordingly'
+    elif opt in ('--atoms'):
+        type_subset.update(arg.strip('\"\'').split())
+    elif opt in ('--atoms-from-data'):
+        type_subset.update(ReadAtomTypesFromDataFile(arg))
     elif opt in ('-h', '--help'):
         helpme()
         sys.exit()
@@ -417,6 +470,14 @@ for i in range(len(equiv)):
         equiv[i][1] = None
         equiv[i][2] = 'invalid_format'
 
+### Equivalences used by the subset of atom types (if any) ###
+# (Parameters for bonded interactions between other atom types are skipped)
+subset_equiv = [set([]) for i in range(6)]
+for i in range(len(equiv)):
+    if (equiv[i][0] in type_subset) and (equiv[i][1] != None):
+        for j in range(6):
+            subset_equiv[j].add(equiv[i][j])
+
 ### Check Potential Styles and Set Units ###
 ChkPotential(manual_units, angle_flag, torsion_flag, improp_flag)
 
@@ -447,7 +508,7 @@ foutput.write('%s {\n' % ffname[0])
 ### Mass Info ###
 foutput.write('  write_once("Data Masses") {\n')
 for i in range(len(masses)):
-    if equiv[i][1] != None:
+    if (equiv[i][1] != None) and InSubset([masses[i][0]], 0):
         foutput.write('    @atom:%s %f # %s\n' %
                 (masses[i][0], float(masses[i][1]), masses[i][0]))
 foutput.write('  } # end of atom masses\n\n')
@@ -456,7 +517,7 @@ foutput.write('  } # end of atom masses\n\n')
 # Write Equivalence
 foutput.write('  # ----- EQUIVALENCE CATEGORIES for bonded interaction lookup -----\n')
 for i in range(len(equiv)):
-    if equiv[i][1] != None:
+    if (equiv[i][1] != None) and InSubset([equiv[i][0]], 0):
         foutput.write('  replace{ @atom:%s @atom:%s_b%s_a%s_d%s_i%s}\n' %
                 (equiv[i][0], equiv[i][0], equiv[i][2], equiv[i][3], equiv[i][4], equiv[i][5]))
 foutput.write('  # END EQUIVALENCE\n\n')
@@ -505,6 +566,8 @@ for i in range(len(equiv)):
             if line.split() != nonbond[-1]:
                 nonbond.append(line.split())
 for i in range(len(nonbond)):
+    if not InSubset(nonbond[i][0:2], 0):
+        continue
     atom1name = None
     atom2name = None
     stylename = pstyle
@@ -532,12 +595,16 @@ if bstyle == '':
 foutput.write('  write_once("In Settings") {\n')
 foutput.write('    # ----- Bonds -----\n')
 for i in range(len(bond)):
+    if not InSubset(bond[i][0:2], 2):
+        continue
     foutput.write('    bond_coeff @bond:%s-%s %s %f %f' %
             (bond[i][0], bond[i][1], bstyle, float(bond[i][2])*beconv, float(bond[i][3])*lconv))
     foutput.write(' # %s-%s\n' % (bond[i][0], bond[i][1]))
 foutput.write('  }\n\n')
 foutput.write('  write_once("Data Bonds By Type") {\n')
 for i in range(len(bond)):
+    if not InSubset(bond[i][0:2], 2):
+        continue
     foutput.write('    @bond:%s-%s @atom:*_b%s_a*_d*_i* @atom:*_b%s_a*_d*_i*\n' %
             (bond[i][0], bond[i][1], bond[i][0], bond[i][1]))
 foutput.write('  } # end of bonds\n\n')
@@ -550,6 +617,8 @@ if angle_flag:
     foutput.write('  write_once("In Settings") {\n')
     foutput.write('    # ----- Angles -----\n')
     for i in range(len(angle)):
+        if not InSubset(angle[i][0:3], 3):
+            continue
         if (len(angle[i]) > 5): # Check if extra data in angle array
             foutput.write('    angle_coeff @angle:%s-%s-%s %s %f %f' %
                     (angle[i][0], angle[i][1], angle[i][2], str(angle[i][5]), float(angle[i][3])*aeconv, float(angle[i][4])))
@@ -561,6 +630,8 @@ if angle_flag:
     foutput.write('  }\n\n')
     foutput.write('  write_once("Data Angles By Type") {\n')
     for i in range(len(angle)):
+        if not InSubset(angle[i][0:3], 3):
+            continue
         foutput.write('    @angle:%s-%s-%s @atom:*_b*_a%s_d*_i* @atom:*_b*_a%s_d*_i* @atom:*_b*_a%s_d*_i*\n' %
                 (angle[i][0], angle[i][1], angle[i][2], angle[i][0], angle[i][1], angle[i][2]))
     foutput.write('  } # end of angles\n\n')
@@ -574,11 +645,15 @@ if torsion_flag:
     foutput.write('  write_once("In Settings") {\n')
     foutput.write('    # ----- Dihedrals -----\n')
     for i in range(len(torsion)):
+        if not InSubset(torsion[i][0:4], 4):
+            continue
         foutput.write('    dihedral_coeff @dihedral:%s-%s-%s-%s %s %f %f %f %f\n' %
                 (torsion[i][0], torsion[i][1], torsion[i][2], torsion[i][3], dstyle, float(torsion[i][4])*deconv, float(torsion[i][5]), float(torsion[i][6])))
     foutput.write('  }\n\n')
     foutput.write('  write_once("Data Dihedrals By Type") {\n')
     for i in range(len(torsion)):
+        if not InSubset(torsion[i][0:4], 4):
+            continue
         foutput.write('    @dihedral:%s-%s-%s-%s @atom:*_b*_a*_d%s_i* @atom:*_b*_a*_d%s_i* @atom:*_b*_a*_d%s_i* @atom:*_b*_a*_d%s_i*' %
                 (torsion[i][0], torsion[i][1], torsion[i][2], torsion[i][3], torsion[i][0], torsion[i][1], torsion[i][2], torsion[i][3]))
     foutput.write('  } # end of dihedrals\n\n')
@@ -594,12 +669,16 @@ if improp_flag:
     foutput.write('    # ----- Impropers -----\n')
     # As discussed, a check for convention of impropers is probably needed here
     for i in range(len(improp)):
+        if not InSubset(improp[i][0:4], 5):
+            continue
         foutput.write('    improper_coeff @improper:%s-%s-%s-%s %s %f %f\n' %
                 (improp[i][0], improp[i][1], improp[i][2], improp[i][3], istyle,
                 float(improp[i][4]), float(improp[i][5])))
     foutput.write('  }\n\n')
     foutput.write('  write_once("Data Impropers By Type") {\n')
     for i in range(len(improp)):
+        if not InSubset(improp[i][0:4], 5):
+            continue
         foutput.write('    @improper:%s-%s-%s-%s @atom:*_b*_a*_d*_i%s @atom:*_b*_a*_d*_i%s @atom:*_b*_a*_d*_i%s @atom:*_b*_a*_d*_i%s' %
                 (improp[i][0], improp[i][1], improp[i][2], improp[i][3], improp[i][0], improp[i][1], improp[i][2], improp[i][3]))
     foutput.write('  } # end of impropers\n\n')
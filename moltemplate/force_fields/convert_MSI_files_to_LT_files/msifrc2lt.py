@@ -35,8 +35,8 @@ it is manually, for all of the carbon atoms in that kind of molecule.
 
 
 __author__ = 'Andrew Jewett'
-__version__ = '0.2.1'
-__date__ = '2017-10-15'
+__version__ = '0.2.2'
+__date__ = '2026-10-18'
 
 
 import sys
@@ -61,6 +61,7 @@ doc_msg = \
     "   -file FILE_NAME      # Read force field parameters from a file\n" + \
     "   -url URL             # Read force field parameters from a file on the web\n" + \
     "   -atoms \"QUOTED LIST\" # Restrict output to a subset of atom types\n" + \
+    "   -atoms-from-data FILE # Restrict output to the atom types in a LAMMPS data file\n" + \
     "  Sometimes an FRC file contains multiple versions.  In that case,\n"+\
     "  you can select between them using these optional arguments:\n"+\
     "   -pair-style \"PAIRSTYLE ARGS\" # LAMMPS pair style and cutoff arg(s)\n" + \
@@ -227,6 +228,68 @@ def SortByEnds(l_orig):
 
 
 
+def ReadAtomTypesFromDataFile(filename):
+    """
+    Return a list of the names of the atom types used in a LAMMPS data file.
+    These names are read from the "Atom Type Labels" section (if present).
+    Otherwise they are read from the comments in the "Masses" section.
+    (For example the line "3  12.0112  # c3" refers to atom type "c3".)
+    """
+    try:
+        f = open(filename, 'r')
+    except IOError:
+        raise InputError('Error: Unable to open file\n'
+                         '       \"' + filename + '\"\n'
+                         '       for reading.\n')
+    type_labels = []
+    mass_comments = []
+    section = ''
+    for line in f.readlines()[1:]:  # (the first line is a comment)
+        ic = line.find('#')
+        if ic != -1:
+            comment_tokens = line[ic+1:].split()
+            line = line[:ic]
+        else:
+            comment_tokens = []
+        tokens = line.split()
+        if len(tokens) == 0:
+            continue
+        if not tokens[0].isdigit():
+            section = ' '.join(tokens)
+        elif (section == 'Atom Type Labels') and (len(tokens) > 1):
+            type_labels.append(tokens[1])
+        elif (section == 'Masses') and (len(comment_tokens) > 0):
+            mass_comments.append(comment_tokens[0])
+    f.close()
+    if len(type_labels) > 0:
+        return type_labels
+    if len(mass_comments) == 0:
+        raise InputError('Error: Unable to find the names of the atom types in\n'
+                         '       \"' + filename + '\"\n'
+                         '       (This file must contain an \"Atom Type Labels\" section,\n'
+                         '        or a comment containing the name of each atom type\n'
+                         '        in the \"Masses\" section.)\n')
+    return mass_comments
+
+
+
+def InteractionInSubset(interaction_name, equiv_names, auto_equiv_names):
+    """
+    Check whether every atom in an interaction (whose name was generated
+    by EncodeInteractionName()) is either a wildcard ('X'), or one of the
+    equivalence names in equiv_names (or auto_equiv_names, if it is an
+    "auto" interaction).  This is used to discard interactions between
+    atom types which the user did not ask for (see the "-atoms" argument).
+    """
+    if IsAutoInteraction(interaction_name):
+        equiv_names = auto_equiv_names
+    for a in ExtractANames(interaction_name):
+        if (a != 'X') and (not a in equiv_names):
+            return False
+    return True
+
+
+
 #def Repl(tokens, a, b):
 #    return [(b if x==a else x) for x in tokens]
 
@@ -525,11 +588,91 @@ def AtomsMatchPattern(anames, pattern):
         return None
 
 
+
+def PatternPriority(pattern):
+    """
+    Return the priority number that AtomsMatchPattern() reports whenever
+    the atom names it was given match "pattern".  (This number depends only
+    on the pattern, not on the atom names, so it can be computed in advance.)
+    """
+    if pattern[-1][0] == '*':
+        return int(pattern[-1][1:])
+    return 0
+
+
+class AutoPatternIndex(object):
+    """
+    A lookup table for the (wildcard-containing) atom name patterns stored
+    in the "_auto" dictionaries (eg. bond2r0_auto, angle2theta0_auto_or).
+    Lookup(anames) returns the same value that the (slow) linear search:
+        for pattern, value in pattern2value.items():
+            try AtomsMatchPattern(anames, pattern) and
+                AtomsMatchPattern(reversed(anames), pattern)
+            and keep the first value with the lowest priority number
+    would have returned, (or None if there was no match).
+    For each position in the pattern, exact atom names are stored in a
+    dictionary, and wildcards are stored separately, so only the handful
+    of patterns which could possibly match are checked.
+    Results are remembered, so each list of atom names is only looked up once.
+    """
+
+    def __init__(self, pattern2value):
+        self.values = []
+        # For each pattern, sort_keys[i] = (priority, i).  The pattern which
+        # appeared first wins when two patterns have the same priority.
+        self.sort_keys = []
+        self.exact = None
+        self.wild = None
+        self.cache = {}
+        for pattern, value in pattern2value.items():
+            if self.exact is None:
+                self.exact = [defaultdict(list) for d in range(0, len(pattern))]
+                self.wild = [[] for d in range(0, len(pattern))]
+            i = len(self.values)
+            self.values.append(value)
+            self.sort_keys.append((PatternPriority(pattern), i))
+            for d in range(0, len(pattern)):
+                if pattern[d][0] == '*':
+                    self.wild[d].append(i)
+                else:
+                    self.exact[d][pattern[d]].append(i)
+
+    def _BestMatch(self, anames):
+        """ Find the highest priority pattern matching anames (in this order)
+            and return its sort key, or None if no patterns match. """
+        candidates = None
+        for d in range(0, len(anames)):
+            matches_d = set(self.exact[d].get(anames[d], []))
+            matches_d.update(self.wild[d])
+            if candidates is None:
+                candidates = matches_d
+            else:
+                candidates &= matches_d
+            if len(candidates) == 0:
+                return None
+        return min([self.sort_keys[i] for i in candidates])
+
+    def Lookup(self, anames):
+        anames = tuple(anames)
+        if anames in self.cache:
+            return self.cache[anames]
+        value = None
+        if self.exact is not None:
+            best = self._BestMatch(anames)
+            best_rev = self._BestMatch(anames[::-1])
+            if (best_rev is not None) and ((best is None) or (best_rev < best)):
+                best = best_rev
+            if best is not None:
+                value = self.values[best[1]]
+        self.cache[anames] = value
+        return value
+
+
 def LookupBondLength(a1, a2,
                      atom2equiv_bond,
                      bond2r0,
                      atom2auto_bond,
-                     bond2r0_auto):
+                     bond2r0_auto_index):
     """ 
     Try to find bond parameters between atoms whose original
     atom names (without equivalences) are a1 and a2.
@@ -558,20 +701,10 @@ def LookupBondLength(a1, a2,
         # (Note: The MSI file format uses low priority numbers
         #  to indicate high priority.  Somewhat confusing.
         #  For details, see "Forcefield based simulations" PDF, Cerius2, p 87)
-        HUGE_VAL = 2000000000
-        best_priority = HUGE_VAL
-        pattern = ['','']
-        for (pattern[0],pattern[1]), r0 in bond2r0_auto.items():
-            priority = AtomsMatchPattern(anames, pattern)
-            if (priority != None) and (priority < best_priority):
-                best_priority = priority
-                return_val = (r0, anames, True)
-            # try again with the atom type names in reverse order
-            priority = AtomsMatchPattern([anames[1],anames[0]], pattern)
-            if ((priority != None) and
-                (priority < best_priority)):  #(note: low priority numbers = high priority)
-                best_priority = priority
-                return_val = (r0, anames, True)
+        # (This search is done by the AutoPatternIndex object.)
+        r0 = bond2r0_auto_index.Lookup(anames)
+        if r0 is not None:
+            return_val = (r0, anames, True)
         #if return_val != None:
         #    sys.stderr.write('DEBUG: For atoms '+str((a1,a2))+' ... bond_length, batom_names = '+str(return_val)+'\n')
     return return_val
@@ -587,7 +720,7 @@ def LookupBondAngle(a1, a2, a3,
                     atom2equiv_angle,
                     angle2theta0_or,
                     atom2auto_angle,
-                    angle2theta0_auto_or):
+                    angle2theta0_auto_index):
     """ 
     Try to find angle parameters between atoms whose original atom
     names (without equivalences) are a1, a2, and a3.  Then return
@@ -624,20 +757,10 @@ def LookupBondAngle(a1, a2, a3,
         # most priority (ie. whose priority number is lowest).
         # (Note: The MSI file format uses low priority numbers
         #  to indicate high priority.  Somewhat confusing.)
-        HUGE_VAL = 2000000000
-        best_priority = HUGE_VAL  # (ie. low priority)
-        pattern = ['','','']
-        for (pattern[0],pattern[1],pattern[2]), theta0 in angle2theta0_auto_or.items():
-            priority = AtomsMatchPattern(anames, pattern)
-            if ((priority != None) and
-                (priority < best_priority)):  #(note: low priority numbers = high priority)
-                best_priority = priority
-                return_val = (theta0, anames, True)
-            # try again with the atom type names in reverse order
-            priority = AtomsMatchPattern([anames[2],anames[1],anames[0]], pattern)
-            if (priority != None) and (priority < best_priority):
-                best_priority = priority
-                return_val = (theta0, anames, True)
+        # (This search is done by the AutoPatternIndex object.)
+        theta0 = angle2theta0_auto_index.Lookup(anames)
+        if theta0 is not None:
+            return_val = (theta0, anames, True)
         #if return_val != None:
         #    sys.stderr.write('DEBUG: For atoms '+str((a1,a2,a3))+' ... rest_angle, anames = '+str(return_val)+'\n')
     return return_val
@@ -943,7 +1066,14 @@ def main():
                                      '       which contains a space-delimited list of of a subset of atom types\n'
                                      '       you want to use from the original force-field.\n'
                                      '       Make sure you enclose the entire list in quotes.\n')
-                type_subset = set(argv[i + 1].strip('\"\'').strip().split())
+                type_subset.update(argv[i + 1].strip('\"\'').strip().split())
+                del argv[i:i + 2]
+
+            elif argv[i] == '-atoms-from-data':
+                if i + 1 >= len(argv):
+                    raise InputError('Error: the \"' + argv[i] + '\" argument should be followed by the name\n'
+                                     '       of a LAMMPS data file containing the atom types you want to use.\n')
+                type_subset.update(ReadAtomTypesFromDataFile(argv[i + 1]))
                 del argv[i:i + 2]
     
             elif argv[i] == '-name':
@@ -1536,6 +1666,27 @@ def main():
                                                atom2auto_improperend,
                                                atom2auto_impropercenter)
 
+        if len(type_subset) > 0:
+            # Forget the equivalences of the atom types the user did not ask
+            # for, so that we only generate interactions between the others.
+            for atom2equiv in (atom2equiv_pair,
+                               atom2equiv_bond,
+                               atom2equiv_angle,
+                               atom2equiv_dihedral,
+                               atom2equiv_improper,
+                               atom2auto_pair,
+                               atom2auto_bondincr,
+                               atom2auto_bond,
+                               atom2auto_angleend,
+                               atom2auto_anglecenter,
+                               atom2auto_dihedralend,
+                               atom2auto_dihedralcenter,
+                               atom2auto_improperend,
+                               atom2auto_impropercenter):
+                for a in list(atom2equiv.keys()):
+                    if not a in atom2ffid:
+                        del atom2equiv[a]
+
         for a,e in atom2equiv_pair.items():
             equiv_pair2atom[e].add(a)
         for a,e in atom2equiv_bond.items():
@@ -2447,6 +2598,11 @@ def main():
         sys.stderr.write(' done.\n'
                          'building lookup tables...')
 
+        # The "_auto" tables are searched (using wildcards) many times
+        # while generating cross terms.  Index them to make this faster.
+        bond2r0_auto_index = AutoPatternIndex(bond2r0_auto)
+        angle2theta0_auto_index = AutoPatternIndex(angle2theta0_auto_or)
+
 
 
 
@@ -2530,6 +2686,12 @@ def main():
                     for a in auto_angle2atom[i][angle_atom_name]:
                         atom_combos[i].add(a)
 
+            # If the user selected a subset of atom types, skip interactions
+            # which can not be formed from those atom types.
+            if ((len(type_subset) > 0) and
+                (0 in [len(combo) for combo in atom_combos])):
+                continue
+
             found_at_least_one = False
             #for a1 in atom_combos[0]:
             for a1 in sorted(list(atom_combos[0])):
@@ -2540,7 +2702,7 @@ def main():
                                                   atom2equiv_bond,
                                                   bond2r0,
                                                   atom2auto_bond,
-                                                  bond2r0_auto)
+                                                  bond2r0_auto_index)
                     if bond_data1 == None: # Save time by continuing only if a
                         continue           # bond was defined between a1 and a2
 
@@ -2550,7 +2712,7 @@ def main():
                                                       atom2equiv_bond,
                                                       bond2r0,
                                                       atom2auto_bond,
-                                                      bond2r0_auto)
+                                                      bond2r0_auto_index)
                         if bond_data2 == None:
                             continue
 
@@ -2729,6 +2891,12 @@ def main():
                     for a in auto_dihedral2atom[i][dihedral_atom_name]:
                         atom_combos[i].add(a)
 
+            # If the user selected a subset of atom types, skip interactions
+            # which can not be formed from those atom types.
+            if ((len(type_subset) > 0) and
+                (0 in [len(combo) for combo in atom_combos])):
+                continue
+
             found_at_least_one = False
 
             #for a1 in atom_combos[0]:
@@ -2742,7 +2910,7 @@ def main():
                                                    atom2equiv_bond,
                                                    bond2r0,
                                                    atom2auto_bond,
-                                                   bond2r0_auto)
+                                                   bond2r0_auto_index)
                     if bond_data12 == None:
                         # Save time by only continuing if a bond was
                         # found between a1 and a2
@@ -2753,7 +2921,7 @@ def main():
                                                        atom2equiv_bond,
                                                        bond2r0,
                                                        atom2auto_bond,
-                                                       bond2r0_auto)
+                                                       bond2r0_auto_index)
                         if bond_data23 == None:
                             # Save time by only continuing if a bond was
                             # found between a2 and a3
@@ -2765,7 +2933,7 @@ def main():
                                                         [atom2auto_angleend,
                                                          atom2auto_anglecenter,
                                                          atom2auto_anglecenter],
-                                                        angle2theta0_auto_or)
+                                                        angle2theta0_auto_index)
                         if angle_data123 == None:
                             # Save time by only continuing if an angle was
                             # found between a1, a2, a3
@@ -2778,7 +2946,7 @@ def main():
                                                            atom2equiv_bond,
                                                            bond2r0,
                                                            atom2auto_bond,
-                                                           bond2r0_auto)
+                                                           bond2r0_auto_index)
                             if bond_data34 == None:
                                 # Save time by only continuing if a bond was
                                 # found between a3 and a4
@@ -2801,7 +2969,7 @@ def main():
                                                             [atom2auto_angleend,
                                                              atom2auto_anglecenter,
                                                              atom2auto_anglecenter],
-                                                            angle2theta0_auto_or)
+                                                            angle2theta0_auto_index)
                             if angle_data234 == None:
                                 # Save time by only continuing if an angle was
                                 # found between a2, a3, a4
@@ -3231,6 +3399,12 @@ def main():
                                          '       fix this limitation.)\n')
 
 
+            # If the user selected a subset of atom types, skip interactions
+            # which can not be formed from those atom types.
+            if ((len(type_subset) > 0) and
+                (0 in [len(combo) for combo in atom_combos])):
+                continue
+
             found_at_least_one = False
             for a1 in sorted(list(atom_combos[0])):
                 for a2 in sorted(list(atom_combos[1])):
@@ -3268,7 +3442,7 @@ def main():
                                                      [atom2auto_improperend,
                                                       atom2auto_impropercenter,
                                                       atom2auto_improperend],
-                                                     angle2theta0_auto_or)
+                                                     angle2theta0_auto_index)
                         if angle_data == None:
                             # Save time by only continuing if an angle was
                                 # found between a1, a2, a3
@@ -3290,7 +3464,7 @@ def main():
                                                          [atom2auto_improperend,
                                                           atom2auto_impropercenter,
                                                           atom2auto_improperend],
-                                                         angle2theta0_auto_or)
+                                                         angle2theta0_auto_index)
                             if angle_data == None:
                                 # Save time by only continuing if an angle was
                                 # found between a1, a2, a4
@@ -3308,7 +3482,7 @@ def main():
                                                          [atom2auto_improperend,
                                                           atom2auto_impropercenter,
                                                           atom2auto_improperend],
-                                                         angle2theta0_auto_or)
+                                                         angle2theta0_auto_index)
                             if angle_data == None:
                                 # Save time by only continuing if an angle was
                                 # found between a3, a2, a4
@@ -3486,6 +3660,10 @@ def main():
                         
         for atype in pair2params:
             assert(atype in pair2style)
+            if ((len(type_subset) > 0) and
+                (not atype in atom2equiv_pair) and
+                (not atype in atom2auto_pair)):
+                continue
             if IsAutoInteraction(bond_name):
                 assert(atype in atom2auto_pair)
                 if include_auto_equivalences:
@@ -3521,8 +3699,14 @@ def main():
                                             sorted([x for x in reversed(charge_pair_priority.items())],
                                                    key=itemgetter(1),
                                                    reverse=True)]
-
-        if len(charge_pair_priority) > 0:
+        if len(type_subset) > 0:
+            charge_pair_priority_high_to_low = \
+                [x for x in charge_pair_priority_high_to_low
+                 if InteractionInSubset(x,
+                                        set(atom2equiv_bond.values()),
+                                        set(atom2auto_bondincr.values()))]
+
+        if len(charge_pair_priority_high_to_low) > 0:
             sys.stdout.write("  # ---------- Charge By Bond (a.k.a. \"bond equivalences\") ----------\n")
             # Print rules for generating (2-body) "bond" interactions:
             sys.stdout.write('\n\n\n'
@@ -3563,8 +3747,14 @@ def main():
                                            sorted([x for x in reversed(bond2priority.items())],
                                                   key=itemgetter(1),
                                                   reverse=True)]
-
-        if len(bond2priority) > 0:
+        if len(type_subset) > 0:
+            bond_names_priority_high_to_low = \
+                [x for x in bond_names_priority_high_to_low
+                 if InteractionInSubset(x,
+                                        set(atom2equiv_bond.values()),
+                                        set(atom2auto_bond.values()))]
+
+        if len(bond_names_priority_high_to_low) > 0:
             sys.stdout.write("  # --------------- Bond Interactions: ---------------------\n")
             sys.stdout.write('\n'
                              '\n'
@@ -17,8 +17,8 @@ to my knowledge, have not yet been implemented in LAMMPS as of 2017-2-01.)
 
 __author__ = 'Jason Lambert and Andrew Jewett'
 # (some additional corrections by Miguel Gonzalez, Yue Chun Chiu and others)
-__version__ = '0.2.1'
-__date__ = '2017-17-18'
+__version__ = '0.2.2'
+__date__ = '2026-10-18'
 
 
 import sys
@@ -41,7 +41,8 @@ doc_msg = \
     "   -name FORCEFIELDNAME # Give the force-field a name\n" + \
     "   -file FILE_NAME      # Read force field parameters from a file\n" + \
     "   -url URL             # Read force field parameters from a file on the web\n" + \
-    "   -atoms \"QUOTED LIST\" # Restrict output to a subset of atom types\n"
+    "   -atoms \"QUOTED LIST\" # Restrict output to a subset of atom types\n" + \
+    "   -atoms-from-data FILE # Restrict output to the atom types in a LAMMPS data file\n"
 
 
 def SplitQuotedString(string,
@@ -107,6 +108,50 @@ def RemoveOuterQuotes(text, quotes='\"\''):
         return text
 
 
+def ReadAtomTypesFromDataFile(filename):
+    """
+    Return a list of the names of the atom types used in a LAMMPS data file.
+    These names are read from the "Atom Type Labels" section (if present).
+    Otherwise they are read from the comments in the "Masses" section.
+    (For example the line "3  12.011  # 80" refers to atom type "80".)
+    """
+    try:
+        f = open(filename, 'r')
+    except IOError:
+        raise Exception('Error: Unable to open file\n'
+                        '       \"' + filename + '\"\n'
+                        '       for reading.\n')
+    type_labels = []
+    mass_comments = []
+    section = ''
+    for line in f.readlines()[1:]:  # (the first line is a comment)
+        ic = line.find('#')
+        if ic != -1:
+            comment_tokens = line[ic + 1:].split()
+            tokens = line[:ic].split()
+        else:
+            comment_tokens = []
+            tokens = line.split()
+        if len(tokens) == 0:
+            continue
+        if not tokens[0].isdigit():
+            section = ' '.join(tokens)
+        elif (section == 'Atom Type Labels') and (len(tokens) > 1):
+            type_labels.append(tokens[1])
+        elif (section == 'Masses') and (len(comment_tokens) > 0):
+            mass_comments.append(comment_tokens[0])
+    f.close()
+    if len(type_labels) > 0:
+        return type_labels
+    if len(mass_comments) == 0:
+        raise Exception('Error: Unable to find the names of the atom types in\n'
+                        '       \"' + filename + '\"\n'
+                        '       (This file must contain an \"Atom Type Labels\" section,\n'
+                        '        or a comment containing the name of each atom type\n'
+                        '        in the \"Masses\" section.)\n')
+    return mass_comments
+
+
 
 def main():
     try:
@@ -162,7 +207,14 @@ def main():
                                     '       which contains a space-delimited list of of a subset of atom types\n'
                                     '       you want to use from the original force-field.\n'
                                     '       Make sure you enclose the entire list in quotes.\n')
-                type_subset = Set(argv[i + 1].strip('\"\'').strip().split())
+                type_subset.update(argv[i + 1].strip('\"\'').strip().split())
+                del argv[i:i + 2]
+    
+            elif argv[i] == '-atoms-from-data':
+                if i + 1 >= len(argv):
+                    raise Exception('Error: the \"' + argv[i] + '\" argument should be followed by the name\n'
+                                    '       of a LAMMPS data file containing the atom types you want to use.\n')
+                type_subset.update(ReadAtomTypesFromDataFile(argv[i + 1]))
                 del argv[i:i + 2]
     
             elif argv[i] == '-name':
@@ -357,6 +409,22 @@ def main():
     
     
     
+        if len(type_subset) > 0:
+            # Discard the bonded interactions which can not be formed from the
+            # atom types the user selected.  (The force-field-ID "0" is a
+            # wildcard which matches any atom type.)
+            ffids_used = Set(atom2ffid.values())
+            ffids_used.add('0')
+            for interactions_by_type in (bonds_by_type,
+                                         angles_by_type,
+                                         dihedrals_by_type,
+                                         impropers_by_type):
+                for ffids in list(interactions_by_type.keys()):
+                    for ffid in ffids:
+                        if not ffid in ffids_used:
+                            del interactions_by_type[ffids]
+                            break
+
         #sys.stderr.write(" done.\n")
         #sys.stderr.write("Converting to moltemplate format...\n")
         
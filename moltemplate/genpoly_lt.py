@@ -45,6 +45,8 @@ Usage:
       [-header "import \"monomer.lt\""] \\
       [-cuts cuts.txt] \\
       [-box paddingX,paddingY,paddingZ] \\
+      [-compact] \\
+      [-data [-atomstyle style]] \\
       < coords.raw > polymer.lt
 
 """
@@ -52,7 +54,63 @@ Usage:
 
 import sys
 import random
+import copy
+import re
+from collections import defaultdict
 from math import *
+try:
+    from cStringIO import StringIO  # (python 2)
+except ImportError:
+    from io import StringIO
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Lines of output are accumulated and written in chunks of this size.
+# (Calling write() once per line is slow for polymers with 10^6 monomers.)
+g_chunk_size = 10000
+
+# Sections of a LAMMPS data file which are copied (without modification)
+# from the files generated by moltemplate when the "-data" argument is used.
+# (They appear in the same order moltemplate.sh uses.)
+g_data_coeff_sections = [('Data Masses', 'Masses'),
+                         ('Data Pair Coeffs', 'Pair Coeffs'),
+                         ('Data PairIJ Coeffs', 'PairIJ Coeffs'),
+                         ('Data Bond Coeffs', 'Bond Coeffs'),
+                         ('Data Angle Coeffs', 'Angle Coeffs'),
+                         ('Data Dihedral Coeffs', 'Dihedral Coeffs'),
+                         ('Data Improper Coeffs', 'Improper Coeffs'),
+                         ('Data BondBond Coeffs', 'BondBond Coeffs'),
+                         ('Data BondAngle Coeffs', 'BondAngle Coeffs'),
+                         ('Data MiddleBondTorsion Coeffs',
+                          'MiddleBondTorsion Coeffs'),
+                         ('Data EndBondTorsion Coeffs',
+                          'EndBondTorsion Coeffs'),
+                         ('Data AngleTorsion Coeffs', 'AngleTorsion Coeffs'),
+                         ('Data AngleAngleTorsion Coeffs',
+                          'AngleAngleTorsion Coeffs'),
+                         ('Data BondBond13 Coeffs', 'BondBond13 Coeffs'),
+                         ('Data AngleAngle Coeffs', 'AngleAngle Coeffs')]
+
+# Sections which contain interactions between atoms.  These are copied once
+# per monomer.  (section file name, section name, type, number of atoms)
+g_data_interaction_sections = [('Data Bonds', 'Bonds', 'bond', 2),
+                               ('Data Angles', 'Angles', 'angle', 3),
+                               ('Data Dihedrals', 'Dihedrals', 'dihedral', 4),
+                               ('Data Impropers', 'Impropers', 'improper', 4)]
+
+# Variables belonging to monomer k have names like "$atom:mon[k]/c1"
+# (optionally preceeded by the name of the polymer, "$atom:polymer/mon[k]/c1")
+g_monomer_pattern = re.compile(r'^(.*[/:])mon\[(\d+)\]/')
+
+g_data_sample_err = (
+    'Error: The -data argument can not be used with this monomer.\n'
+    '       (The atoms and interactions belonging to every monomer must be the\n'
+    '        same, and they must be numbered in the order they were created.)\n'
+    '       Run genpoly_lt.py without -data, and then run moltemplate.sh on the\n'
+    '       resulting file instead.  The problem was detected here:\n'
+    '       ')
 
 
 class InputError(Exception):
@@ -72,6 +130,18 @@ class InputError(Exception):
         return str(self)
 
 
+def SplitComment(line):
+    """ Split a line of text into a list of words and a comment (if any).
+        (The comment is formatted the way moltemplate.sh formats comments
+         in the data files it creates.)
+
+    """
+    ic = line.find('#')
+    if ic != -1:
+        return line[:ic].split(), ' ' + line[ic:].rstrip('\n')
+    return line.split(), ''
+
+
 class GPSettings(object):
 
     def __init__(self):
@@ -87,6 +157,9 @@ class GPSettings(object):
         self.dir_index_offsets = (-1,1)
         self.cuts = []
         self.box_padding = None
+        self.compact = False
+        self.data_mode = False
+        self.atom_style = 'full'
         self.bonds_name = []
         self.bonds_type = []
         self.bonds_atoms = []
@@ -256,7 +329,7 @@ class GPSettings(object):
                 if i + 1 >= len(argv):
                     raise InputError('Error: ' + argv[i] + ' flag should be followed ' +
                                      'by 3 numbers separated by commas (no spaces)\n')
-                self.direction_orig = map(float, argv[i + 1].split(','))
+                self.direction_orig = list(map(float, argv[i + 1].split(',')))
                 del(argv[i:i + 2])
             elif argv[i].lower() == '-circular':
                 if i + 1 >= len(argv):
@@ -294,10 +367,24 @@ class GPSettings(object):
                 if i + 1 >= len(argv):
                     raise InputError('Error: ' + argv[i] + ' flag should be followed ' +
                                      'by 3 numbers separated by commas (no spaces)\n')
-                self.box_padding = map(float, argv[i + 1].split(','))
+                self.box_padding = list(map(float, argv[i + 1].split(',')))
                 if len(self.box_padding) == 1:
                     self.box_padding = self.box_padding * 3
                 del(argv[i:i + 2])
+            elif (argv[i].lower() == '-compact'):
+                self.compact = True
+                del(argv[i:i + 1])
+            elif (argv[i].lower() == '-data'):
+                self.data_mode = True
+                del(argv[i:i + 1])
+            elif ((argv[i].lower() == '-atomstyle') or
+                  (argv[i].lower() == '-atom-style') or
+                  (argv[i].lower() == '-atom_style')):
+                if i + 1 >= len(argv):
+                    raise InputError('Error: ' + argv[i] + ' flag should be followed by a LAMMPS\n'
+                                     '       atom_style name (or a quoted list of column names)\n')
+                self.atom_style = argv[i + 1]
+                del(argv[i:i + 2])
 
             # elif ((argv[i][0] == '-') and (__name__ == '__main__')):
             #
@@ -340,7 +427,7 @@ class WrapPeriodic(object):
 
     @classmethod
     def Wrap(obj, i, N):
-        if i / N != 0:
+        if i // N != 0:
             obj.bounds_err = True
         return i % N
 
@@ -351,6 +438,63 @@ class WrapPeriodic(object):
         return x - i * L
 
 
+def RotvvQuaternion(A, B):
+    """ Return the rotation generated by a "rotvv(A,B)" command (a rotation
+        around the axis A x B which rotates A into B) as a quaternion [w,x,y,z]
+        (See RotMatXYZXYZ() in ttree_matrix_stack.py)
+
+    """
+    axis = [A[1] * B[2] - A[2] * B[1],
+            A[2] * B[0] - A[0] * B[2],
+            A[0] * B[1] - A[1] * B[0]]
+    La = sqrt(A[0] * A[0] + A[1] * A[1] + A[2] * A[2])
+    Lb = sqrt(B[0] * B[0] + B[1] * B[1] + B[2] * B[2])
+    Lc = sqrt(axis[0] * axis[0] + axis[1] * axis[1] + axis[2] * axis[2])
+    if Lc == 0.0:
+        return [1.0, 0.0, 0.0, 0.0]
+    angle = atan2(Lc / (La * Lb),
+                  (A[0] * B[0] + A[1] * B[1] + A[2] * B[2]) / (La * Lb))
+    s = sin(0.5 * angle) / Lc
+    return [cos(0.5 * angle), axis[0] * s, axis[1] * s, axis[2] * s]
+
+
+def QuatMult(q1, q2):
+    """ Return the product of two quaternions, q1*q2
+        (the rotation q2, followed by the rotation q1)
+
+    """
+    return [q1[0] * q2[0] - q1[1] * q2[1] - q1[2] * q2[2] - q1[3] * q2[3],
+            q1[0] * q2[1] + q1[1] * q2[0] + q1[2] * q2[3] - q1[3] * q2[2],
+            q1[0] * q2[2] - q1[1] * q2[3] + q1[2] * q2[0] + q1[3] * q2[1],
+            q1[0] * q2[3] + q1[1] * q2[2] - q1[2] * q2[1] + q1[3] * q2[0]]
+
+
+def QuaternionToMatrix(q):
+    """ Convert a quaternion [w,x,y,z] into a 3x3 rotation matrix. """
+    w, x, y, z = q
+    return [[w * w + x * x - y * y - z * z,
+             2.0 * (x * y - w * z),
+             2.0 * (x * z + w * y)],
+            [2.0 * (x * y + w * z),
+             w * w - x * x + y * y - z * z,
+             2.0 * (y * z - w * x)],
+            [2.0 * (x * z - w * y),
+             2.0 * (y * z + w * x),
+             w * w - x * x - y * y + z * z]]
+
+
+def QuaternionToAngleAxis(q):
+    """ Convert a quaternion into an angle (in degrees) and an axis
+        (suitable for use with the "rot(angle,x,y,z)" command).
+
+    """
+    sin_half = sqrt(q[1] * q[1] + q[2] * q[2] + q[3] * q[3])
+    if sin_half == 0.0:
+        return 0.0, [1.0, 0.0, 0.0]
+    angle = 2.0 * atan2(sin_half, q[0]) * 180.0 / pi
+    return angle, [q[1] / sin_half, q[2] / sin_half, q[3] / sin_half]
+
+
 class GenPoly(object):
     """
         Read coordinates from a file, and generate a list of \"new\" commands
@@ -379,12 +523,16 @@ class GenPoly(object):
         self.settings.ParseArgs(argv)
 
     def ReadCoords(self, infile):
-        coords = []
-        lines = infile.readlines()
-        for i in range(0, len(lines)):
-            tokens = lines[i].strip().split()
+        rows = []
+        for line in infile:
+            tokens = line.split()
             if (len(tokens) == 3):
-                coords.append(map(float, tokens))
+                rows.append(tokens)
+        # Convert all of the coordinates to numbers at once
+        if (np is not None) and (len(rows) > 0):
+            coords = np.array(rows, dtype=float).tolist()
+        else:
+            coords = [[float(x) for x in tokens] for tokens in rows]
 
         self.N = len(coords)
         if self.N < 2:
@@ -408,7 +556,43 @@ class GenPoly(object):
         """
 
         self.N = len(coords)
-        self.direction_vects = [[0.0, 0.0, 0.0] for i in range(0, self.N + 1)]
+        if np is not None:
+            self.direction_vects = self._ChooseDirectionsNumpy(coords)
+        else:
+            self.direction_vects = self._ChooseDirectionsLoop(coords)
+
+        # Special case:  self.direction_vects[-1] is the direction that the original monomer
+        # in "monomer.lt" was pointing.  (By default, 1,0,0 <--> the "x"
+        # direction)
+
+        self.direction_vects.append(self.settings.direction_orig)
+
+    def _ChooseDirectionsNumpy(self, coords):
+        """ The same calculation as _ChooseDirectionsLoop(), using numpy. """
+        N = self.N
+        ia, ib = self.settings.dir_index_offsets
+        x = np.array(coords, dtype=float).reshape(N, 3)
+        d = np.zeros((N, 3))
+        if self.settings.is_circular:
+            i = np.arange(0, N)
+            d[:] = x[(i + ib) % N] - x[(i + ia) % N]
+        elif N > 0:
+            i = np.arange(1, N - 1)
+            # (Negative indices count backwards from the end, as in python.)
+            d[1:N - 1] = x[i + ib] - x[i + ia]
+            d[0] = x[1] - x[0]
+            d[N - 1] = x[N - 1] - x[N - 2]
+        # Normalize the direction vectors
+        lengths = np.sqrt(d[:, 0]**2 + d[:, 1]**2 + d[:, 2]**2)
+        if N > 0 and not np.all(lengths > 0.0):
+            raise InputError('Error: Monomer ' + str(int(np.argmin(lengths))) +
+                             ' has an undefined direction.\n'
+                             '       (Check for duplicate coordinates.)\n')
+        d /= lengths[:, np.newaxis]
+        return d.tolist()
+
+    def _ChooseDirectionsLoop(self, coords):
+        direction_vects = [[0.0, 0.0, 0.0] for i in range(0, self.N)]
 
         if self.settings.is_circular:
             for i in range(0, self.N):
@@ -421,18 +605,17 @@ class GenPoly(object):
                 ib = WrapPeriodic.Wrap(i + self.settings.dir_index_offsets[1],
                                        self.N)
                 for d in range(0, 3):
-                    self.direction_vects[i][d] = coords[
-                        ib][d] - coords[ia][d]
+                    direction_vects[i][d] = coords[ib][d] - coords[ia][d]
         else:
             for i in range(1, self.N - 1):
                 for d in range(0, 3):
-                    self.direction_vects[i][d] = coords[
+                    direction_vects[i][d] = coords[
                         i + self.settings.dir_index_offsets[1]][d] - coords[
                             i + self.settings.dir_index_offsets[0]][d]
 
             for d in range(0, 3):
-                self.direction_vects[0][d] = coords[1][d] - coords[0][d]
-                self.direction_vects[
+                direction_vects[0][d] = coords[1][d] - coords[0][d]
+                direction_vects[
                     self.N - 1][d] = coords[self.N - 1][d] - coords[self.N - 2][d]
 
         # Optional: normalize the direction vectors
@@ -440,16 +623,16 @@ class GenPoly(object):
         for i in range(0, self.N):
             direction_len = 0.0
             for d in range(0, 3):
-                direction_len += (self.direction_vects[i][d])**2
+                direction_len += (direction_vects[i][d])**2
             direction_len = sqrt(direction_len)
+            if direction_len == 0.0:
+                raise InputError('Error: Monomer ' + str(i) +
+                                 ' has an undefined direction.\n'
+                                 '       (Check for duplicate coordinates.)\n')
             for d in range(0, 3):
-                self.direction_vects[i][d] /= direction_len
+                direction_vects[i][d] /= direction_len
 
-        # Special case:  self.direction_vects[-1] is the direction that the original monomer
-        # in "monomer.lt" was pointing.  (By default, 1,0,0 <--> the "x"
-        # direction)
-
-        self.direction_vects[-1] = self.settings.direction_orig
+        return direction_vects
 
     def WriteLTFile(self, outfile):
         """ Write an moltemplate (.lt) file containing the definition of
@@ -510,6 +693,40 @@ class GenPoly(object):
                           '# The line above forces all monomer subunits to share the same molecule-ID\n'
                           '# (Note: Setting the molecule-ID number is optional and is usually ignored.)\n\n\n\n')
 
+        if self.settings.compact:
+            self.WriteMonomersCompact(outfile, coords)
+        else:
+            self.WriteMonomers(outfile, coords)
+
+        self.WriteInteractions(outfile, 'bond', 'Bonds',
+                               self.settings.bonds_name,
+                               self.settings.bonds_type,
+                               self.settings.bonds_atoms,
+                               self.settings.bonds_index_offsets)
+        self.WriteInteractions(outfile, 'angle', 'Angles',
+                               self.settings.angles_name,
+                               self.settings.angles_type,
+                               self.settings.angles_atoms,
+                               self.settings.angles_index_offsets)
+        self.WriteInteractions(outfile, 'dihedral', 'Dihedrals',
+                               self.settings.dihedrals_name,
+                               self.settings.dihedrals_type,
+                               self.settings.dihedrals_atoms,
+                               self.settings.dihedrals_index_offsets)
+        self.WriteInteractions(outfile, 'improper', 'Impropers',
+                               self.settings.impropers_name,
+                               self.settings.impropers_type,
+                               self.settings.impropers_atoms,
+                               self.settings.impropers_index_offsets)
+
+        if name_polymer != '':
+            outfile.write("}  # " + name_polymer + "\n\n\n\n")
+
+    def WriteMonomers(self, outfile, coords):
+        """ Write the commands which create and position each monomer
+            using push(), pop(), rotvv() and move().
+
+        """
         outfile.write("""
 # ------------ List of Monomers: ------------
 #
@@ -525,167 +742,222 @@ class GenPoly(object):
 
         outfile.write("push(move(0,0,0))\n")
 
+        # Recall that self.direction_vects[-1] =
+        # self.settings.direction_orig  (usually 1,0,0)
+        d = self.direction_vects
+        out = []
         for i in range(0, self.N):
-            #im1 = i-1
-            # if im1 < 0 or self.settings.connect_ends:
-            #    if im1 < 0:
-            #        im1 += self.N
-            outfile.write("pop()\n")
-            outfile.write("push(rotvv(" +
-                          str(self.direction_vects[i - 1][0]) + "," +
-                          str(self.direction_vects[i - 1][1]) + "," +
-                          str(self.direction_vects[i - 1][2]) + "," +
-                          str(self.direction_vects[i][0]) + "," +
-                          str(self.direction_vects[i][1]) + "," +
-                          str(self.direction_vects[i][2]) + "))\n")
-            # Recall that self.direction_vects[-1] =
-            # self.settings.direction_orig  (usually 1,0,0)
-            outfile.write("push(move(" +
-                          str(coords[i][0]) + "," +
-                          str(coords[i][1]) + "," +
-                          str(coords[i][2]) + "))\n")
-
-            outfile.write("mon[" + str(i) + "] = new " +
-                          self.settings.name_sequence[i] +
-                          ".rot(" + str(self.settings.delta_phi * i) + ",1,0,0)\n")
-
-        assert(len(self.settings.bonds_name) ==
-               len(self.settings.bonds_type) ==
-               len(self.settings.bonds_atoms) ==
-               len(self.settings.bonds_index_offsets))
-        if len(self.settings.bonds_type) > 0:
-            outfile.write("\n"
-                          "\n"
-                          "write(\"Data Bonds\") {\n")
-        WrapPeriodic.bounds_err = False
-        for i in range(0, self.N):
-            test = False
-            for b in range(0, len(self.settings.bonds_type)):
-                I = i + self.settings.bonds_index_offsets[b][0]
-                J = i + self.settings.bonds_index_offsets[b][1]
-                I = WrapPeriodic.Wrap(I, self.N)
-                J = WrapPeriodic.Wrap(J, self.N)
-                if WrapPeriodic.bounds_err:
-                    WrapPeriodic.bounds_err = False
-                    if not self.settings.connect_ends:
-                        continue
-                outfile.write(
-                    "  $bond:" + self.settings.bonds_name[b] + str(i + 1))
-                if len(self.settings.bonds_type) > 1:
-                    outfile.write("_" + str(b + 1))
-                outfile.write(" @bond:" + self.settings.bonds_type[b] + " $atom:mon[" + str(I) + "]/" + self.settings.bonds_atoms[
-                              b][0] + " $atom:mon[" + str(J) + "]/" + self.settings.bonds_atoms[b][1] + "\n")
-        if len(self.settings.bonds_type) > 0:
-            outfile.write("}  # write(\"Data Bonds\") {...\n\n\n")
-
-        assert(len(self.settings.angles_name) ==
-               len(self.settings.angles_type) ==
-               len(self.settings.angles_atoms) ==
-               len(self.settings.angles_index_offsets))
-        if len(self.settings.angles_type) > 0:
-            outfile.write("\n"
-                          "\n"
-                          "write(\"Data Angles\") {\n")
-        for i in range(0, self.N):
-            for b in range(0, len(self.settings.angles_type)):
-                I = i + self.settings.angles_index_offsets[b][0]
-                J = i + self.settings.angles_index_offsets[b][1]
-                K = i + self.settings.angles_index_offsets[b][2]
-                I = WrapPeriodic.Wrap(I, self.N)
-                J = WrapPeriodic.Wrap(J, self.N)
-                K = WrapPeriodic.Wrap(K, self.N)
-                if WrapPeriodic.bounds_err:
-                    WrapPeriodic.bounds_err = False
-                    if not self.settings.connect_ends:
-                        continue
-                outfile.write(
-                    "  $angle:" + self.settings.angles_name[b] + str(i + 1))
-                if len(self.settings.angles_type) > 1:
-                    outfile.write("_" + str(b + 1))
-                outfile.write(" @angle:" + self.settings.angles_type[b] +
-                              " $atom:mon[" + str(I) + "]/" + self.settings.angles_atoms[b][0] +
-                              " $atom:mon[" + str(J) + "]/" + self.settings.angles_atoms[b][1] +
-                              " $atom:mon[" + str(K) + "]/" + self.settings.angles_atoms[b][2] +
-                              "\n")
-        if len(self.settings.angles_type) > 0:
-            outfile.write("}  # write(\"Data Angles\") {...\n\n\n")
-
-        assert(len(self.settings.dihedrals_name) ==
-               len(self.settings.dihedrals_type) ==
-               len(self.settings.dihedrals_atoms) ==
-               len(self.settings.dihedrals_index_offsets))
-        if len(self.settings.dihedrals_type) > 0:
-            outfile.write("\n"
-                          "\n"
-                          "write(\"Data Dihedrals\") {\n")
+            out.append("pop()\n"
+                       "push(rotvv(%s,%s,%s,%s,%s,%s))\n"
+                       "push(move(%s,%s,%s))\n"
+                       "mon[%d] = new %s.rot(%s,1,0,0)\n" %
+                       (str(d[i - 1][0]), str(d[i - 1][1]), str(d[i - 1][2]),
+                        str(d[i][0]), str(d[i][1]), str(d[i][2]),
+                        str(coords[i][0]), str(coords[i][1]), str(coords[i][2]),
+                        i, self.settings.name_sequence[i],
+                        str(self.settings.delta_phi * i)))
+            if len(out) >= g_chunk_size:
+                outfile.write(''.join(out))
+                out = []
+        outfile.write(''.join(out))
+
+    def WriteMonomersCompact(self, outfile, coords):
+        """ Write one line per monomer containing its final orientation and
+            position.  The rotations which WriteMonomers() would have pushed
+            onto the stack (one rotvv() per monomer) are multiplied together
+            here and converted into a single rot() command.  If all of the
+            monomers have the same type, they are created using a single
+            array instantiation ("mon = new Monomer [N]"), and then moved.
+
+        """
+        outfile.write("""
+# ------------ List of Monomers: ------------
+#
+# (Note: The rot() and move() commands following each monomer control
+#  its orientation and position.  (See the moltemplate manual for an
+#  explanation of what they do.))
+
+
+
+"""
+                      )
+        name_sequence = self.settings.name_sequence[:self.N]
+        is_array = (name_sequence.count(name_sequence[0]) == self.N)
+        if is_array:
+            outfile.write("mon = new " + name_sequence[0] +
+                          " [" + str(self.N) + "]\n\n")
+        if np is not None:
+            angles, axes = self._CompactRotationsNumpy()
+        else:
+            angles, axes = self._CompactRotationsLoop()
+        out = []
         for i in range(0, self.N):
-            for b in range(0, len(self.settings.dihedrals_type)):
-                I = i + self.settings.dihedrals_index_offsets[b][0]
-                J = i + self.settings.dihedrals_index_offsets[b][1]
-                K = i + self.settings.dihedrals_index_offsets[b][2]
-                L = i + self.settings.dihedrals_index_offsets[b][3]
-                I = WrapPeriodic.Wrap(I, self.N)
-                J = WrapPeriodic.Wrap(J, self.N)
-                K = WrapPeriodic.Wrap(K, self.N)
-                L = WrapPeriodic.Wrap(L, self.N)
-                if WrapPeriodic.bounds_err:
-                    WrapPeriodic.bounds_err = False
-                    if not self.settings.connect_ends:
-                        continue
-                outfile.write("  $dihedral:" +
-                              self.settings.dihedrals_name[b] + str(i + 1))
-                if len(self.settings.dihedrals_type) > 1:
-                    outfile.write("_" + str(b + 1))
-                outfile.write(" @dihedral:" + self.settings.dihedrals_type[b] +
-                              " $atom:mon[" + str(I) + "]/" + self.settings.dihedrals_atoms[b][0] +
-                              " $atom:mon[" + str(J) + "]/" + self.settings.dihedrals_atoms[b][1] +
-                              " $atom:mon[" + str(K) + "]/" + self.settings.dihedrals_atoms[b][2] +
-                              " $atom:mon[" + str(L) + "]/" + self.settings.dihedrals_atoms[b][3] +
-                              "\n")
-        if len(self.settings.dihedrals_type) > 0:
-            outfile.write("}  # write(\"Data Dihedrals\") {...\n\n\n")
-
-        assert(len(self.settings.impropers_name) ==
-               len(self.settings.impropers_type) ==
-               len(self.settings.impropers_atoms) ==
-               len(self.settings.impropers_index_offsets))
-        if len(self.settings.impropers_type) > 0:
-            outfile.write("\n"
-                          "\n"
-                          "write(\"Data Impropers\") {\n")
+            angle = angles[i]
+            axis = axes[i]
+            if is_array:
+                line = "mon[%d]" % i
+            else:
+                line = "mon[%d] = new %s" % (i, name_sequence[i])
+            out.append("%s.rot(%s,1,0,0).rot(%s,%s,%s,%s).move(%s,%s,%s)\n" %
+                       (line, str(self.settings.delta_phi * i),
+                        str(angle), str(axis[0]), str(axis[1]), str(axis[2]),
+                        str(coords[i][0]), str(coords[i][1]), str(coords[i][2])))
+            if len(out) >= g_chunk_size:
+                outfile.write(''.join(out))
+                out = []
+        outfile.write(''.join(out))
+
+    def _CompactRotationsLoop(self):
+        """ Multiply together the rotvv() rotations which would have been
+            pushed onto the stack before each monomer was created, and return
+            the resulting rotations (in angle-axis format) for each monomer.
+
+        """
+        angles = []
+        axes = []
+        for q in self._RotationQuaternionsLoop():
+            angle, axis = QuaternionToAngleAxis(q)
+            angles.append(angle)
+            axes.append(axis)
+        return angles, axes
+
+    def _RotationQuaternionsLoop(self):
+        """ Return a list containing the product of the rotvv() rotations
+            which were applied to each monomer (as quaternions).
+
+        """
+        d = self.direction_vects
+        q = [1.0, 0.0, 0.0, 0.0]
+        quaternions = []
         for i in range(0, self.N):
-            for b in range(0, len(self.settings.impropers_type)):
-                I = i + self.settings.impropers_index_offsets[b][0]
-                J = i + self.settings.impropers_index_offsets[b][1]
-                K = i + self.settings.impropers_index_offsets[b][2]
-                L = i + self.settings.impropers_index_offsets[b][3]
-                I = WrapPeriodic.Wrap(I, self.N)
-                J = WrapPeriodic.Wrap(J, self.N)
-                K = WrapPeriodic.Wrap(K, self.N)
-                L = WrapPeriodic.Wrap(L, self.N)
-                if WrapPeriodic.bounds_err:
-                    WrapPeriodic.bounds_err = False
-                    if not self.settings.connect_ends:
-                        continue
-                outfile.write("  $improper:" +
-                              self.settings.impropers_name[b] + str(i + 1))
-                if len(self.settings.impropers_type) > 1:
-                    outfile.write("_" + str(b + 1))
-                outfile.write(" @improper:" + self.settings.impropers_type[b] +
-                              " $atom:mon[" + str(I) + "]/" + self.settings.impropers_atoms[b][0] +
-                              " $atom:mon[" + str(J) + "]/" + self.settings.impropers_atoms[b][1] +
-                              " $atom:mon[" + str(K) + "]/" + self.settings.impropers_atoms[b][2] +
-                              " $atom:mon[" + str(L) + "]/" + self.settings.impropers_atoms[b][3] +
-                              "\n")
-        if len(self.settings.impropers_type) > 0:
-            outfile.write("}  # write(\"Data Impropers\") {...\n\n\n")
+            q = QuatMult(RotvvQuaternion(d[i - 1], d[i]), q)
+            quaternions.append(q)
+        return quaternions
+
+    def _CompactRotationsNumpy(self):
+        """ The same calculation as _CompactRotationsLoop(), using numpy. """
+        q = self._RotationQuaternionsNumpy()
+        # Convert to angle-axis format (see QuaternionToAngleAxis())
+        sin_half = np.sqrt((q[:, 1:] * q[:, 1:]).sum(axis=1))
+        no_rotation = (sin_half == 0.0)
+        sin_half[no_rotation] = 1.0
+        angles = 2.0 * np.arctan2(sin_half, q[:, 0]) * 180.0 / pi
+        axes = q[:, 1:] / sin_half[:, np.newaxis]
+        angles[no_rotation] = 0.0
+        axes[no_rotation] = [1.0, 0.0, 0.0]
+        return angles.tolist(), axes.tolist()
+
+    def _RotationQuaternionsNumpy(self):
+        """ The same calculation as _RotationQuaternionsLoop(), using numpy.
+            (The running product of the rotations is calculated using
+             log2(N) vectorized quaternion multiplications.)
+            The result is an Nx4 array.
 
-        if name_polymer != '':
-            outfile.write("}  # " + name_polymer + "\n\n\n\n")
+        """
+        N = self.N
+        d = np.array(self.direction_vects, dtype=float)
+        A = d[np.arange(-1, N - 1)]  # (the direction of the previous monomer)
+        B = d[0:N]
+        # The rotations generated by "rotvv(A,B)" (see RotvvQuaternion())
+        axis = np.cross(A, B)
+        La = np.sqrt((A * A).sum(axis=1))
+        Lb = np.sqrt((B * B).sum(axis=1))
+        Lc = np.sqrt((axis * axis).sum(axis=1))
+        parallel = (Lc == 0.0)
+        Lc[parallel] = 1.0
+        angle = np.arctan2(Lc / (La * Lb), (A * B).sum(axis=1) / (La * Lb))
+        angle[parallel] = 0.0
+        q = np.empty((N, 4))
+        q[:, 0] = np.cos(0.5 * angle)
+        q[:, 1:] = axis * (np.sin(0.5 * angle) / Lc)[:, np.newaxis]
+        # Running product:  q[i] = r[i] * r[i-1] * ... * r[0]
+        k = 1
+        while k < N:
+            q1 = q[k:]
+            q2 = q[:N - k]
+            q[k:] = np.column_stack(
+                (q1[:, 0] * q2[:, 0] - q1[:, 1] * q2[:, 1] -
+                 q1[:, 2] * q2[:, 2] - q1[:, 3] * q2[:, 3],
+                 q1[:, 0] * q2[:, 1] + q1[:, 1] * q2[:, 0] +
+                 q1[:, 2] * q2[:, 3] - q1[:, 3] * q2[:, 2],
+                 q1[:, 0] * q2[:, 2] - q1[:, 1] * q2[:, 3] +
+                 q1[:, 2] * q2[:, 0] + q1[:, 3] * q2[:, 1],
+                 q1[:, 0] * q2[:, 3] + q1[:, 1] * q2[:, 2] -
+                 q1[:, 2] * q2[:, 1] + q1[:, 3] * q2[:, 0]))
+            k *= 2
+        return q
+
+    def WriteInteractions(self,
+                          outfile,
+                          kind,
+                          section_name,
+                          names,
+                          types,
+                          atoms,
+                          index_offsets):
+        """ Write the bonds (or angles, dihedrals, or impropers) connecting
+            successive monomers together.  ("kind" is one of "bond", "angle",
+            "dihedral", or "improper".  "section_name" is one of "Bonds",
+            "Angles", "Dihedrals", or "Impropers".)
+
+        """
+        assert(len(names) ==
+               len(types) ==
+               len(atoms) ==
+               len(index_offsets))
+        if len(types) == 0:
+            return
+        outfile.write("\n"
+                      "\n"
+                      "write(\"Data " + section_name + "\") {\n")
+        # Build a format string for each type of interaction, for example:
+        # "  $bond:genpoly%d @bond:Backbone $atom:mon[%d]/c2 $atom:mon[%d]/c1\n"
+        formats = []
+        for b in range(0, len(types)):
+            fmt = ("  $" + kind + ":" + names[b].replace('%', '%%') + "%d")
+            if len(types) > 1:
+                fmt += "_" + str(b + 1)
+            fmt += " @" + kind + ":" + types[b].replace('%', '%%')
+            for atom_name in atoms[b]:
+                fmt += " $atom:mon[%d]/" + atom_name.replace('%', '%%')
+            formats.append(fmt + "\n")
+        N = self.N
+        bounds = [self._InteractionRange(offsets, N, self.settings.connect_ends)
+                  for offsets in index_offsets]
+        out = []
+        for i in range(0, N):
+            for b in range(0, len(types)):
+                if (i < bounds[b][0]) or (i >= bounds[b][1]):
+                    continue
+                out.append(formats[b] %
+                           ((i + 1,) +
+                            tuple([(i + offset) % N
+                                   for offset in index_offsets[b]])))
+            if len(out) >= g_chunk_size:
+                outfile.write(''.join(out))
+                out = []
+        outfile.write(''.join(out))
+        outfile.write("}  # write(\"Data " + section_name + "\") {...\n\n\n")
+
+    def _InteractionRange(self, index_offsets, N, connect_ends):
+        """ Return the range of monomers (i_min <= i < i_max) for which an
+            interaction (with these index_offsets) is created.
+            Interactions which extend past the end of the polymer are
+            omitted unless the two ends are connected.
+
+        """
+        if connect_ends:
+            return 0, N
+        return -min(index_offsets), N - max(index_offsets)
 
     def CalcBoxBoundaries(self, coords):
         N = len(coords)
-        for i in range(0, N):
+        if N == 0:
+            return
+        if np is not None:
+            x = np.array(coords, dtype=float).reshape(N, 3)
+            coords = [x.min(axis=0).tolist(), x.max(axis=0).tolist()]
+        for i in range(0, len(coords)):
             for d in range(0, 3):
                 if not self.box_bounds_min:
                     assert(not self.box_bounds_max)
@@ -714,12 +986,783 @@ class GenPoly(object):
                       str(self.box_bounds_max[2]) + " zlo zhi\n"
                       "}\n\n\n")
 
+    def WriteDataFile(self, outfile):
+        """ Write a LAMMPS data file containing the polymer(s) (instead of
+        a moltemplate file).  Moltemplate (lttree) is only used to build
+        a short version of each polymer (a few monomers long).  The atoms,
+        bonds, angles, dihedrals and impropers belonging to each monomer are
+        then copied once per monomer (with their ID numbers offset and their
+        coordinates rotated and moved into position).  The result should be
+        identical to the data file that moltemplate.sh creates from the file
+        written by WriteLTFile() (except for round-off error in the last
+        digits of the atom coordinates).
+
+        """
+        try:
+            from . import nbody_Bonds, nbody_Angles, nbody_Dihedrals, nbody_Impropers
+        except (ImportError, SystemError, ValueError):
+            # not installed as a package
+            import nbody_Bonds, nbody_Angles, nbody_Dihedrals, nbody_Impropers
+        nbody_modules = {'bond': nbody_Bonds,
+                         'angle': nbody_Angles,
+                         'dihedral': nbody_Dihedrals,
+                         'improper': nbody_Impropers}
+
+        names = self.settings.name_sequence
+        if names.count(names[0]) != len(names):
+            raise InputError('Error: The -data argument can not be used to build heteropolymers.\n'
+                             '       (Every monomer in the -sequence file must be the same.)\n')
+        max_offset = 0
+        for offsets in (self.settings.bonds_index_offsets +
+                        self.settings.angles_index_offsets +
+                        self.settings.dihedrals_index_offsets +
+                        self.settings.impropers_index_offsets):
+            max_offset = max(max_offset, max(offsets))
+        sizes = [len(coords) for coords in self.coords_multi]
+        # The short polymers must be long enough to contain at least one copy
+        # of each interaction connecting successive monomers together.
+        sample_sizes = [min(N, max_offset + 2) for N in sizes]
+        sample_connect_ends = (self.settings.connect_ends and
+                               (sample_sizes == sizes))
+        templates, files, lt_settings, type_counts = \
+            self._RenderSample(sample_sizes, sample_connect_ends)
+
+        supported = set(['Data Header', 'Data Boundary', 'Data PBC', 'Data Atoms'] +
+                        [section for section, name in g_data_coeff_sections] +
+                        [section for section, name, kind, natoms
+                         in g_data_interaction_sections])
+        for section in files:
+            if ((section is not None) and (section.find('Data') == 0) and
+                    (section not in supported)):
+                raise InputError('Error: The -data argument does not support the \"' +
+                                 section + '\" section.\n'
+                                 '       (Run genpoly_lt.py without -data, and then run moltemplate.sh\n'
+                                 '        on the resulting file instead.)\n')
+        if type_counts['atom'] == 0:
+            raise InputError('Error: No atom types were defined.  (Check the -header argument.)\n')
+
+        atoms, mol_delta, mol_shifts, atom_loc = \
+            self._ParseSampleAtoms(templates.get('Data Atoms', ''),
+                                   files.get('Data Atoms', ''),
+                                   lt_settings,
+                                   sample_sizes)
+        # atom-ID offsets for each polymer
+        id_offsets = [0]
+        for p in range(0, len(sizes)):
+            id_offsets.append(id_offsets[-1] + sizes[p] * len(atoms[p]))
+        if id_offsets[-1] == 0:
+            raise InputError('Error: There are no atoms in your polymer.\n')
+
+        # Generate the bonds, angles, dihedrals and impropers
+        interactions = []
+        for section, name, kind, natoms in g_data_interaction_sections:
+            internal, genpoly_info, has_duplicates = \
+                self._ParseSampleInteractions(section,
+                                              natoms,
+                                              templates.get(section, ''),
+                                              files.get(section, ''),
+                                              atom_loc,
+                                              sample_sizes,
+                                              sample_connect_ends,
+                                              getattr(self.settings, kind + 's_type'),
+                                              getattr(self.settings, kind + 's_index_offsets'),
+                                              nbody_modules[kind])
+            blocks = []
+            for p in range(0, len(sizes)):
+                blocks.append(self._GenInteractions(sizes[p],
+                                                    len(atoms[p]),
+                                                    id_offsets[p],
+                                                    internal[p],
+                                                    genpoly_info,
+                                                    getattr(self.settings, kind + 's_index_offsets'),
+                                                    has_duplicates or self.settings.connect_ends,
+                                                    nbody_modules[kind]))
+            interactions.append(blocks)
+
+        # Now write the data file (in the format used by moltemplate.sh)
+        outfile.write('LAMMPS Description\n\n'
+                      '     ' + str(id_offsets[-1]) + '  atoms\n')
+        for i in range(0, len(g_data_interaction_sections)):
+            count = 0
+            for fmts, itemplate, ids in interactions[i]:
+                count += len(itemplate)
+            outfile.write('     ' + str(count) + '  ' +
+                          g_data_interaction_sections[i][1].lower() + '\n')
+        outfile.write('\n')
+        for kind in ('atom', 'bond', 'angle', 'dihedral', 'improper'):
+            if (kind == 'atom') or (type_counts[kind] > 0):
+                outfile.write('     ' + str(type_counts[kind]) + '  ' +
+                              kind + ' types\n')
+        outfile.write('\n')
+        if len(files.get('Data Header', '')) > 0:
+            outfile.write(files['Data Header'] + '\n')
+        self._WriteDataBoundary(outfile, files)
+
+        for section, name in g_data_coeff_sections:
+            text = files.get(section, '')
+            if section == 'Data Masses':
+                # (Later definitions of the same atom type's mass take priority.)
+                lines = [line for line in text.splitlines(True)
+                         if len(line.split('#')[0].split()) > 0]
+                atom_types = set([])
+                for i in range(len(lines) - 1, -1, -1):
+                    atom_type = lines[i].split('#')[0].split()[0]
+                    if atom_type in atom_types:
+                        del lines[i]
+                    else:
+                        atom_types.add(atom_type)
+                text = ''.join(lines)
+            if len(text) > 0:
+                outfile.write(name + '\n\n' + text + '\n')
+
+        outfile.write('Atoms # ' + self.settings.atom_style + '\n\n')
+        for p in range(0, len(sizes)):
+            self._WriteAtoms(outfile,
+                             self.coords_multi[p],
+                             atoms[p],
+                             id_offsets[p],
+                             mol_delta,
+                             mol_shifts[p],
+                             lt_settings)
+        outfile.write('\n')
+
+        for i in range(0, len(g_data_interaction_sections)):
+            if sum([len(itemplate) for fmts, itemplate, ids in interactions[i]]) == 0:
+                continue
+            outfile.write(g_data_interaction_sections[i][1] + '\n\n')
+            n_rows = 0
+            for fmts, itemplate, ids in interactions[i]:
+                for r0 in range(0, len(itemplate), g_chunk_size):
+                    r1 = min(len(itemplate), r0 + g_chunk_size)
+                    out = []
+                    if np is not None:
+                        chunk = zip(itemplate[r0:r1].tolist(), ids[r0:r1].tolist())
+                    else:
+                        chunk = zip(itemplate[r0:r1], ids[r0:r1])
+                    for t, atom_ids in chunk:
+                        n_rows += 1
+                        out.append(fmts[t] % tuple([n_rows] + list(atom_ids)))
+                    outfile.write(''.join(out))
+            outfile.write('\n')
+
+    def _RenderSample(self, sample_sizes, connect_ends):
+        """ Use lttree to build a short version of each polymer (the number of
+            monomers in each polymer is stored in sample_sizes).  The monomers
+            are not moved or rotated.  Returns the contents of the files that
+            moltemplate would create (before and after variables are replaced
+            by numbers), the lttree settings, and the number of atom types,
+            bond types, angle types, dihedral types, and improper types.
+
+        """
+        try:
+            from .ttree_lex import InputError as TtreeInputError, HasWildcard
+            from .ttree import StaticObj, InstanceObj, BasicUI
+            from .lttree import LttreeSettings, LttreeParseArgs, ExecCommands
+        except (ImportError, SystemError, ValueError):
+            # not installed as a package
+            from ttree_lex import InputError as TtreeInputError, HasWildcard
+            from ttree import StaticObj, InstanceObj, BasicUI
+            from lttree import LttreeSettings, LttreeParseArgs, ExecCommands
+
+        sample = GenPolySample()
+        sample.settings = copy.copy(self.settings)
+        sample.settings.connect_ends = connect_ends
+        sample.settings.delta_phi = 0.0
+        sample.settings.box_padding = None
+        sample.settings.compact = False
+        sample.coords_multi = [[[0.0, 0.0, 0.0] for i in range(0, N)]
+                               for N in sample_sizes]
+        lt_file = StringIO()
+        sample.WriteLTFile(lt_file)
+        if self.settings.name_polymer != '':
+            lt_file.write('polymer = new ' + self.settings.name_polymer + '\n')
+
+        try:
+            lt_settings = LttreeSettings()
+            LttreeParseArgs(['genpoly_lt.py', '-atomstyle', self.settings.atom_style],
+                            lt_settings, main=False, show_warnings=False)
+            lt_settings.lex.infile = 'genpoly_lt.py(-data)'
+            lt_settings.lex.instream = StringIO(lt_file.getvalue())
+            static_tree_root = StaticObj('', None)
+            instance_tree_root = InstanceObj('', None)
+            static_commands = []
+            instance_commands = []
+            BasicUI(lt_settings,
+                    static_tree_root,
+                    instance_tree_root,
+                    static_commands,
+                    instance_commands)
+            files = []
+            for substitute_vars in (False, True):
+                files_content = defaultdict(list)
+                ExecCommands(static_commands, files_content, lt_settings,
+                             substitute_vars)
+                ExecCommands(instance_commands, files_content, lt_settings,
+                             substitute_vars)
+                files.append(dict([(section, ''.join(text).replace('\r', ''))
+                                   for section, text in files_content.items()]))
+        except TtreeInputError as err:
+            raise InputError(str(err))
+
+        # Count the number of atom types, bond types, etc... (the same way
+        # moltemplate.sh counts them in the "ttree_assignments.txt" file)
+        type_counts = defaultdict(int)
+        nodes = [static_tree_root]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            nodes.extend(node.children.values())
+            if not hasattr(node, 'categories'):
+                continue
+            for cat_name in node.categories:
+                var_bindings = node.categories[cat_name].bindings
+                for nd, var_binding in var_bindings.items():
+                    if (nd.IsDeleted() or (len(var_binding.refs) == 0) or
+                            (not isinstance(nd, StaticObj)) or
+                            HasWildcard(var_binding.full_name)):
+                        continue
+                    for kind in ('atom', 'bond', 'angle', 'dihedral', 'improper'):
+                        if var_binding.full_name.find('@/' + kind + ':') == 0:
+                            type_counts[kind] += 1
+        return files[0], files[1], lt_settings, type_counts
+
+    def _SampleMonomer(self, var_name):
+        """ Return the polymer and monomer (indices) that a variable from the
+            short polymers (built by _RenderSample()) belongs to, or None.
+
+        """
+        m = g_monomer_pattern.match(var_name)
+        if m is None:
+            return None
+        p = 0
+        if len(self.coords_multi) > 1:
+            m_polymer = re.search(r'polymers\[(\d+)\]/$', m.group(1))
+            if m_polymer is None:
+                return None
+            p = int(m_polymer.group(1))
+        return (p, int(m.group(2)))
+
+    def _ParseSampleAtoms(self, text_template, text, lt_settings, sample_sizes):
+        """ Read the "Data Atoms" section of the short polymers, and check
+            that every monomer (in every polymer) has the same atoms.
+            Returns the atoms belonging to the first monomer in each polymer,
+            the change in the molecule-ID from one monomer to the next,
+            the molecule-ID offset for each polymer, and a dictionary
+            which looks up the (polymer, monomer, atom) indices of each atom.
+
+        """
+        ia = lt_settings.i_atomid
+        im = lt_settings.i_molid
+        mon_atoms = defaultdict(list)
+        atom_loc = {}
+        lines_template = text_template.split('\n')
+        lines = text.split('\n')
+        prev = (0, 0)
+        n_rows = 0
+        for line_template, line in zip(lines_template, lines):
+            tokens_template, comment_template = SplitComment(line_template)
+            tokens, comment = SplitComment(line)
+            if len(tokens) == 0:
+                continue
+            pk = self._SampleMonomer(tokens_template[ia])
+            if pk is None:
+                raise InputError('Error: The -data argument can only be used if every atom belongs to a monomer.\n'
+                                 '       (The atom \"' + tokens_template[ia] + '\" does not.)\n')
+            n_rows += 1
+            if (pk < prev) or (tokens[ia] != str(n_rows)):
+                raise InputError(g_data_sample_err + '(\"Data Atoms\")\n')
+            prev = pk
+            atom_loc[tokens[ia]] = (pk[0], pk[1], len(mon_atoms[pk]))
+            mon_atoms[pk].append((tokens, comment))
+
+        atoms = []
+        mol_deltas = set([])
+        for p in range(0, len(sample_sizes)):
+            atoms.append(mon_atoms[(p, 0)])
+            for k in range(1, sample_sizes[p]):
+                if len(mon_atoms[(p, k)]) != len(atoms[p]):
+                    raise InputError(g_data_sample_err + '(\"Data Atoms\")\n')
+                for j in range(0, len(atoms[p])):
+                    tokens0, comment0 = atoms[p][j]
+                    tokens, comment = mon_atoms[(p, k)][j]
+                    if (comment != comment0) or (len(tokens) != len(tokens0)):
+                        raise InputError(g_data_sample_err + '(\"Data Atoms\")\n')
+                    for c in range(0, len(tokens)):
+                        if c == im:
+                            dmol = int(tokens[c]) - int(tokens0[c])
+                            if dmol % k != 0:
+                                raise InputError(g_data_sample_err + '(molecule-ID numbers)\n')
+                            mol_deltas.add(dmol // k)
+                        elif (c != ia) and (tokens[c] != tokens0[c]):
+                            raise InputError(g_data_sample_err + '(\"Data Atoms\")\n')
+
+        # Either every polymer has one molecule-ID (mol_delta = 0), or
+        # each monomer has a different molecule-ID (mol_delta != 0)
+        if len(mol_deltas) > 1:
+            raise InputError(g_data_sample_err + '(molecule-ID numbers)\n')
+        mol_delta = 0
+        if len(mol_deltas) == 1:
+            mol_delta = mol_deltas.pop()
+        mol_shifts = []
+        n_before = 0
+        n_before_sample = 0
+        p0 = None
+        for p in range(0, len(sample_sizes)):
+            mol_shifts.append(mol_delta * (n_before - n_before_sample))
+            if (mol_delta != 0) and (len(atoms[p]) > 0):
+                if p0 is None:
+                    p0 = p
+                    n0_sample = n_before_sample
+                for j in range(0, len(atoms[p])):
+                    if (int(atoms[p][j][0][im]) - int(atoms[p0][j][0][im]) !=
+                            mol_delta * (n_before_sample - n0_sample)):
+                        raise InputError(g_data_sample_err + '(molecule-ID numbers)\n')
+            n_before += len(self.coords_multi[p])
+            n_before_sample += sample_sizes[p]
+        return atoms, mol_delta, mol_shifts, atom_loc
+
+    def _ParseSampleInteractions(self,
+                                 section,
+                                 natoms,
+                                 text_template,
+                                 text,
+                                 atom_loc,
+                                 sample_sizes,
+                                 connect_ends,
+                                 types,
+                                 index_offsets,
+                                 nbody_module):
+        """ Read the bonds (or angles, dihedrals, impropers) from the short
+            polymers and check that they are the same for every monomer.
+            Returns the interactions belonging to the first monomer of each
+            polymer (type, atom indices, comment), the type and atom indices
+            of each interaction connecting successive monomers together
+            (see "-bond", "-angle", ...), and whether or not any of these
+            interactions were duplicates.
+
+        """
+        nedges = nbody_module.bond_pattern.GetNumEdges()
+        internal = defaultdict(list)
+        genpoly = defaultdict(list)
+        atom_ids_in_use = set([])
+        has_duplicates = False
+        lines_template = text_template.split('\n')
+        lines = text.split('\n')
+        prev = (0, 0, 0)
+        n_rows = 0
+        for line_template, line in zip(lines_template, lines):
+            tokens_template, comment_template = SplitComment(line_template)
+            tokens, comment = SplitComment(line)
+            if len(tokens) == 0:
+                continue
+            n_rows += 1
+            if (len(tokens) != 2 + natoms) or (tokens[0] != str(n_rows)):
+                raise InputError(g_data_sample_err + '(\"' + section + '\")\n')
+            try:
+                locs = [atom_loc[atom_id] for atom_id in tokens[2:]]
+            except KeyError:
+                raise InputError('Error: This line from the \"' + section + '\" section refers to an\n'
+                                 '       atom that does not exist:\n' + line + '\n')
+            atom_ids = nbody_module.canonical_order(
+                (tuple([int(atom_id) for atom_id in tokens[2:]]),
+                 tuple([0 for i in range(0, nedges)])))[0]
+            if atom_ids in atom_ids_in_use:
+                has_duplicates = True
+            atom_ids_in_use.add(atom_ids)
+            pk = self._SampleMonomer(tokens_template[0])
+            if pk is not None:
+                key = (pk[0], 0, pk[1])
+                for loc in locs:
+                    if (loc[0], loc[1]) != pk:
+                        raise InputError(g_data_sample_err + '(\"' + section + '\")\n')
+                internal[pk].append((tokens[1], [loc[2] for loc in locs], comment))
+            else:
+                key = (locs[0][0], 1, 0)
+                for loc in locs:
+                    if loc[0] != key[0]:
+                        raise InputError(g_data_sample_err + '(\"' + section + '\")\n')
+                genpoly[key[0]].append((tokens[1], locs))
+            if key < prev:
+                raise InputError(g_data_sample_err + '(\"' + section + '\")\n')
+            prev = key
+
+        internal_templates = []
+        genpoly_info = [None for b in range(0, len(types))]
+        for p in range(0, len(sample_sizes)):
+            K = sample_sizes[p]
+            internal_templates.append(internal[(p, 0)])
+            for k in range(1, K):
+                if internal[(p, k)] != internal_templates[p]:
+                    raise InputError(g_data_sample_err + '(\"' + section + '\")\n')
+            # The interactions connecting monomers should appear in the
+            # same order that WriteInteractions() created them.
+            expected = []
+            for i in range(0, K):
+                for b in range(0, len(types)):
+                    i_min, i_max = self._InteractionRange(index_offsets[b], K,
+                                                          connect_ends)
+                    if (i_min <= i) and (i < i_max):
+                        expected.append((b, i))
+            if len(expected) != len(genpoly[p]):
+                raise InputError(g_data_sample_err + '(\"' + section + '\")\n')
+            for (b, i), (atom_type, locs) in zip(expected, genpoly[p]):
+                if ([loc[1] for loc in locs] !=
+                        [(i + offset) % K for offset in index_offsets[b]]):
+                    raise InputError(g_data_sample_err + '(\"' + section + '\")\n')
+                info = (atom_type, [loc[2] for loc in locs])
+                if genpoly_info[b] is None:
+                    genpoly_info[b] = info
+                elif genpoly_info[b] != info:
+                    raise InputError(g_data_sample_err + '(\"' + section + '\")\n')
+        return internal_templates, genpoly_info, has_duplicates
+
+    def _GenInteractions(self,
+                         N,
+                         n,
+                         id_offset,
+                         internal,
+                         genpoly_info,
+                         index_offsets,
+                         remove_duplicates,
+                         nbody_module):
+        """ Create the bonds (or angles, dihedrals, impropers) for a polymer
+            with N monomers (each containing n atoms), in the order that
+            moltemplate would have created them.  Then put the atoms in each
+            interaction in canonical order and remove duplicates (as
+            moltemplate.sh does).  Returns a list of format strings (one per
+            type of interaction), and for each interaction, the index of its
+            format string and its atom-IDs.
+
+        """
+        fmts = []
+        for atom_type, js, comment in internal:
+            fmts.append('%d ' + (atom_type + ' ').replace('%', '%%') +
+                        ' '.join(['%d' for j in js]) +
+                        comment.replace('%', '%%') + '\n')
+        for b in range(0, len(genpoly_info)):
+            if genpoly_info[b] is None:
+                fmts.append('')
+            else:
+                fmts.append('%d ' + genpoly_info[b][0].replace('%', '%%') + ' ' +
+                            ' '.join(['%d' for j in genpoly_info[b][1]]) + '\n')
+        # A list of interactions (one per monomer), with atom-IDs relative to
+        # that monomer's first atom, and the offsets of the monomers involved.
+        patterns = [(js, [0 for j in js]) for atom_type, js, comment in internal]
+        bounds = [(0, N) for t in internal]
+        for b in range(0, len(genpoly_info)):
+            bounds.append(self._InteractionRange(index_offsets[b], N,
+                                                 self.settings.connect_ends))
+            if genpoly_info[b] is None:
+                assert(bounds[-1][0] >= bounds[-1][1])
+                patterns.append(None)
+            else:
+                patterns.append((genpoly_info[b][1], index_offsets[b]))
+        # The atoms in each interaction can be put in canonical order by
+        # applying the same permutation to every copy of that interaction.
+        # (Unless the polymer wraps around, or the same atom appears twice.)
+        nedges = nbody_module.bond_pattern.GetNumEdges()
+        perms = []
+        for t in range(0, len(patterns)):
+            perm = None
+            if patterns[t] is not None:
+                js, offsets = patterns[t]
+                x = [offsets[r] * n + js[r] for r in range(0, len(js))]
+                y = nbody_module.canonical_order(
+                    (tuple(x), tuple([0 for i in range(0, nedges)])))[0]
+                if len(set(x)) == len(x):
+                    perm = [x.index(atom_id) for atom_id in y]
+            perms.append(perm)
+
+        def CanonicalOrder(atom_ids):
+            return list(nbody_module.canonical_order(
+                (tuple(atom_ids), tuple([0 for i in range(0, nedges)])))[0])
+
+        if np is not None:
+            itemplate, ids = self._GenInteractionsNumpy(N, n, id_offset,
+                                                        len(internal),
+                                                        patterns, bounds,
+                                                        perms, CanonicalOrder)
+            if remove_duplicates and (len(itemplate) > 0):
+                # Keep the last copy of each interaction
+                # (see "remove_duplicates_nbody.py")
+                reverse_ids = ids[::-1]
+                unused, i_unique = np.unique(reverse_ids, axis=0,
+                                             return_index=True)
+                keep = np.zeros(len(itemplate), dtype=bool)
+                keep[len(itemplate) - 1 - i_unique] = True
+                itemplate = itemplate[keep]
+                ids = ids[keep]
+        else:
+            itemplate, ids = self._GenInteractionsLoop(N, n, id_offset,
+                                                       len(internal),
+                                                       patterns, bounds,
+                                                       perms, CanonicalOrder)
+            if remove_duplicates:
+                atom_ids_in_use = set([])
+                keep = []
+                for r in range(len(ids) - 1, -1, -1):
+                    if tuple(ids[r]) not in atom_ids_in_use:
+                        atom_ids_in_use.add(tuple(ids[r]))
+                        keep.append(r)
+                keep.reverse()
+                itemplate = [itemplate[r] for r in keep]
+                ids = [ids[r] for r in keep]
+        return fmts, itemplate, ids
+
+    def _GenInteractionsLoop(self, N, n, id_offset, n_internal, patterns,
+                             bounds, perms, CanonicalOrder):
+        """ Create the list of interactions requested by _GenInteractions().
+            Interactions within each monomer are created first (ordered by
+            monomer), followed by interactions between monomers.
+
+        """
+        itemplate = []
+        ids = []
+        for t_first, t_last in ((0, n_internal), (n_internal, len(patterns))):
+            for i in range(0, N):
+                for t in range(t_first, t_last):
+                    if ((patterns[t] is None) or
+                            (i < bounds[t][0]) or (i >= bounds[t][1])):
+                        continue
+                    js, offsets = patterns[t]
+                    atom_ids = [id_offset + 1 + ((i + offsets[r]) % N) * n + js[r]
+                                for r in range(0, len(js))]
+                    if (perms[t] is None) or (i + max(offsets) >= N):
+                        atom_ids = CanonicalOrder(atom_ids)
+                    else:
+                        atom_ids = [atom_ids[r] for r in perms[t]]
+                    itemplate.append(t)
+                    ids.append(atom_ids)
+        return itemplate, ids
+
+    def _GenInteractionsNumpy(self, N, n, id_offset, n_internal, patterns,
+                              bounds, perms, CanonicalOrder):
+        """ The same calculation as _GenInteractionsLoop(), using numpy. """
+        itemplate = []
+        ids = []
+        for t_first, t_last in ((0, n_internal), (n_internal, len(patterns))):
+            keys = []
+            block_itemplate = []
+            block_ids = []
+            for t in range(t_first, t_last):
+                if patterns[t] is None:
+                    continue
+                i_min = max(0, bounds[t][0])
+                i_max = min(N, bounds[t][1])
+                if i_min >= i_max:
+                    continue
+                js, offsets = patterns[t]
+                i = np.arange(i_min, i_max)
+                mon = i[:, np.newaxis] + np.array(offsets)[np.newaxis, :]
+                wrapped = (mon >= N).any(axis=1)
+                atom_ids = (id_offset + 1 + (mon % N) * n +
+                            np.array(js)[np.newaxis, :])
+                if perms[t] is not None:
+                    atom_ids[~wrapped] = atom_ids[~wrapped][:, perms[t]]
+                    redo = np.nonzero(wrapped)[0]
+                else:
+                    redo = np.arange(0, len(i))
+                for r in redo:
+                    atom_ids[r] = CanonicalOrder(atom_ids[r].tolist())
+                keys.append(i * len(patterns) + t)
+                block_itemplate.append(np.full(len(i), t, dtype=int))
+                block_ids.append(atom_ids)
+            if len(keys) > 0:
+                order = np.argsort(np.concatenate(keys), kind='mergesort')
+                itemplate.append(np.concatenate(block_itemplate)[order])
+                ids.append(np.concatenate(block_ids)[order])
+        if len(itemplate) == 0:
+            return np.zeros(0, dtype=int), np.zeros((0, 0), dtype=int)
+        return np.concatenate(itemplate), np.concatenate(ids)
+
+    def _WriteDataBoundary(self, outfile, files):
+        """ Write the box boundaries to a LAMMPS data file.  (Like
+            moltemplate.sh, if the box boundaries are listed more than once,
+            the most recent settings override the earlier settings.)
+
+        """
+        text = files.get('Data Boundary', '')
+        if self.settings.box_padding != None:
+            for i in range(0, len(self.coords_multi)):
+                self.CalcBoxBoundaries(self.coords_multi[i])
+            box_file = StringIO()
+            self.WriteBoxBoundaries(box_file)
+            text += box_file.getvalue()
+        if len(text) == 0:
+            text = files.get('Data PBC', '')
+        box = {}
+        for line in text.split('\n'):
+            tokens = line.split()
+            for i_name, i_value, name in ((2, 0, 'xlo'), (3, 1, 'xhi'),
+                                          (2, 0, 'ylo'), (3, 1, 'yhi'),
+                                          (2, 0, 'zlo'), (3, 1, 'zhi'),
+                                          (3, 0, 'xy'), (4, 1, 'xz'),
+                                          (5, 2, 'yz')):
+                if (len(tokens) > i_name) and (tokens[i_name] == name):
+                    box[name] = tokens[i_value]
+        if len(text) == 0:
+            box = {'xlo': '-100.0', 'xhi': '100.0',
+                   'ylo': '-100.0', 'yhi': '100.0',
+                   'zlo': '-100.0', 'zhi': '100.0'}
+        for d in ('x', 'y', 'z'):
+            if (d + 'lo' not in box) or (d + 'hi' not in box):
+                raise InputError('Error: Problem with box boundary format (\"' +
+                                 d + 'lo ' + d + 'hi\") in \"Data Boundary\"\n')
+        outfile.write('  ' + box['xlo'] + ' ' + box['xhi'] + ' xlo xhi\n'
+                      '  ' + box['ylo'] + ' ' + box['yhi'] + ' ylo yhi\n'
+                      '  ' + box['zlo'] + ' ' + box['zhi'] + ' zlo zhi\n')
+        triclinic = [name for name in ('xy', 'xz', 'yz') if name in box]
+        if len(triclinic) == 3:
+            outfile.write('  ' + box['xy'] + ' ' + box['xz'] + ' ' + box['yz'] +
+                          ' xy xz yz\n')
+        elif len(triclinic) > 0:
+            raise InputError('Error: Problem with triclinic format (\"xy xz yz\") in \"Data Boundary\"\n')
+        outfile.write('\n')
+
+    def _WriteAtoms(self,
+                    outfile,
+                    coords,
+                    atoms,
+                    id_offset,
+                    mol_delta,
+                    mol_shift,
+                    lt_settings):
+        """ Write the "Atoms" section of a LAMMPS data file for one polymer,
+            by making a copy of the atoms in the first monomer (stored in
+            "atoms") for every monomer, and moving them into position.
+
+        """
+        N = len(coords)
+        n = len(atoms)
+        if (N == 0) or (n == 0):
+            return
+        ia = lt_settings.i_atomid
+        im = lt_settings.i_molid
+        ii_coords = lt_settings.ii_coords
+        ii_vects = lt_settings.ii_vects
+        xyz_local = [[float(tokens[cxcycz[d]]) for d in range(0, 3)]
+                     for tokens, comment in atoms for cxcycz in ii_coords]
+        vects_local = [[float(tokens[cxcycz[d]]) for d in range(0, 3)]
+                       for tokens, comment in atoms for cxcycz in ii_vects]
+        mol0 = None
+        if im is not None:
+            mol0 = [int(tokens[im]) + mol_shift for tokens, comment in atoms]
+
+        self.ChooseDirections(coords)
+        if np is not None:
+            quaternions = self._RotationQuaternionsNumpy()
+        else:
+            quaternions = self._RotationQuaternionsLoop()
+        for m_begin in range(0, N, g_chunk_size):
+            m_end = min(N, m_begin + g_chunk_size)
+            if np is not None:
+                xyz, vects = self._MoveAtomsNumpy(quaternions, coords,
+                                                  xyz_local, vects_local,
+                                                  m_begin, m_end)
+            else:
+                xyz, vects = self._MoveAtomsLoop(quaternions, coords,
+                                                 xyz_local, vects_local,
+                                                 m_begin, m_end)
+            out = []
+            for m in range(m_begin, m_end):
+                xyz_m = xyz[m - m_begin]
+                vects_m = vects[m - m_begin]
+                for j in range(0, n):
+                    tokens = list(atoms[j][0])
+                    tokens[ia] = str(id_offset + m * n + j + 1)
+                    if im is not None:
+                        tokens[im] = str(mol0[j] + mol_delta * m)
+                    for c in range(0, len(ii_coords)):
+                        x = xyz_m[j * len(ii_coords) + c]
+                        for d in range(0, 3):
+                            tokens[ii_coords[c][d]] = str(x[d])
+                    for c in range(0, len(ii_vects)):
+                        v = vects_m[j * len(ii_vects) + c]
+                        for d in range(0, 3):
+                            tokens[ii_vects[c][d]] = str(v[d])
+                    out.append(' '.join(tokens) + atoms[j][1] + '\n')
+            outfile.write(''.join(out))
+
+    def _MoveAtomsLoop(self, quaternions, coords, xyz_local, vects_local,
+                       m_begin, m_end):
+        """ Rotate and move the coordinates of the atoms in the first monomer
+            (xyz_local) into the position of every monomer from m_begin to
+            m_end.  (Direction vectors (vects_local) are only rotated.)
+            The rotation applied to monomer m is the product of the helical
+            twist "rot(delta_phi*m,1,0,0)" followed by the rotvv() commands
+            (see WriteMonomers()).
+
+        """
+        xyz = []
+        vects = []
+        for m in range(m_begin, m_end):
+            half_phi = 0.5 * self.settings.delta_phi * m * pi / 180.0
+            R = QuaternionToMatrix(QuatMult(quaternions[m],
+                                            [cos(half_phi), sin(half_phi),
+                                             0.0, 0.0]))
+            xyz.append([[R[d][0] * x[0] + R[d][1] * x[1] + R[d][2] * x[2] +
+                         coords[m][d] for d in range(0, 3)]
+                        for x in xyz_local])
+            vects.append([[R[d][0] * v[0] + R[d][1] * v[1] + R[d][2] * v[2]
+                           for d in range(0, 3)]
+                          for v in vects_local])
+        return xyz, vects
+
+    def _MoveAtomsNumpy(self, quaternions, coords, xyz_local, vects_local,
+                        m_begin, m_end):
+        """ The same calculation as _MoveAtomsLoop(), using numpy. """
+        M = m_end - m_begin
+        q = quaternions[m_begin:m_end]
+        half_phi = (0.5 * self.settings.delta_phi * pi / 180.0 *
+                    np.arange(m_begin, m_end))
+        h0 = np.cos(half_phi)
+        h1 = np.sin(half_phi)
+        # q * [h0, h1, 0, 0]  (see QuatMult())
+        w = q[:, 0] * h0 - q[:, 1] * h1
+        x = q[:, 0] * h1 + q[:, 1] * h0
+        y = q[:, 2] * h0 + q[:, 3] * h1
+        z = q[:, 3] * h0 - q[:, 2] * h1
+        # (see QuaternionToMatrix())
+        R = np.empty((M, 3, 3))
+        R[:, 0, 0] = w * w + x * x - y * y - z * z
+        R[:, 0, 1] = 2.0 * (x * y - w * z)
+        R[:, 0, 2] = 2.0 * (x * z + w * y)
+        R[:, 1, 0] = 2.0 * (x * y + w * z)
+        R[:, 1, 1] = w * w - x * x + y * y - z * z
+        R[:, 1, 2] = 2.0 * (y * z - w * x)
+        R[:, 2, 0] = 2.0 * (x * z - w * y)
+        R[:, 2, 1] = 2.0 * (y * z + w * x)
+        R[:, 2, 2] = w * w - x * x - y * y + z * z
+        R = R[:, np.newaxis, :, :]
+        xyz = np.zeros((M, len(xyz_local), 3))
+        if len(xyz_local) > 0:
+            X = np.array(xyz_local, dtype=float)[np.newaxis, :, np.newaxis, :]
+            c = np.array(coords[m_begin:m_end], dtype=float).reshape(M, 3)
+            xyz = (R * X).sum(axis=3) + c[:, np.newaxis, :]
+        vects = np.zeros((M, len(vects_local), 3))
+        if len(vects_local) > 0:
+            V = np.array(vects_local, dtype=float)[np.newaxis, :, np.newaxis, :]
+            vects = (R * V).sum(axis=3)
+        return xyz.tolist(), vects.tolist()
+
+
+class GenPolySample(GenPoly):
+    """
+        A version of GenPoly whose monomers are not moved or rotated.
+        (WriteDataFile() uses it to create a short version of each polymer.)
+
+    """
+
+    def ChooseDirections(self, coords):
+        self.N = len(coords)
+        self.direction_vects = [self.settings.direction_orig
+                                for i in range(0, self.N + 1)]
+
 
 def main():
     try:
         g_program_name = __file__.split('/')[-1]
-        g_version_str = '0.0.5'
-        g_date_str = '2017-4-14'
+        g_version_str = '0.0.7'
+        g_date_str = '2026-10-18'
         sys.stderr.write(g_program_name + ' v' +
                          g_version_str + ' ' + g_date_str + '\n')
         argv = [arg for arg in sys.argv]
@@ -734,7 +1777,10 @@ def main():
                              '\"\n\n' +
                              g_usage_msg)
         genpoly.ReadCoords(infile)
-        genpoly.WriteLTFile(outfile)
+        if genpoly.settings.data_mode:
+            genpoly.WriteDataFile(outfile)
+        else:
+            genpoly.WriteLTFile(outfile)
 
     except (ValueError, InputError) as err:
         sys.stderr.write('\n' + str(err) + '\n')
@@ -24,9 +24,24 @@ and saves this data in a single ttree file ("mol.lt").
 This file can be used with moltemplate (ttree) to
 define large systems containing this molecule.
 
+Batch mode example:
+
+   ltemplify.py -batch-mol -batch-dir mols file.in file.data > system.lt
+
+This reads the data file once and creates a separate template (in the
+"mols" directory) for every distinct molecule in it.  Identical copies
+of a molecule share one template, and are created using "new Mol1 [N]"
+(in "system.lt").  (Use "-batch FILE" to supply a list of selections.)
+
 """
 
 import sys
+import os
+from bisect import bisect_right
+try:
+    from cStringIO import StringIO  # (python 2)
+except ImportError:
+    from io import StringIO
 try:
     from .ttree_lex import *
     from .lttree_styles import *
@@ -36,8 +51,8 @@ except (SystemError, ValueError):
     from lttree_styles import *
 
 g_program_name = __file__.split('/')[-1]  # = 'ltemplify.py'
-g_version_str = '0.54.0'
-g_date_str = '2017-10-03'
+g_version_str = '0.56.0'
+g_date_str = '2026-10-18'
 
 def Intify(s):
     if s.isdigit():
@@ -187,6 +202,58 @@ def MergeIntervals(interval_list):
             i += 1
 
 
+class IntervalSelection(list):
+    """
+    A selection (a list of (a,b) intervals, as returned by
+    LammpsSelectToIntervals()) which has also been compiled into a sorted
+    list of non-overlapping intervals.  This way BelongsToSel() can test
+    membership using a binary search instead of scanning every interval.
+    (This is still a list containing the original intervals, so it can be
+     used anywhere an ordinary selection list is expected.  If you modify
+     the list, invoke Compile() again afterwards.)
+
+    """
+
+    def __init__(self, interval_list=None):
+        list.__init__(self, interval_list or [])
+        self.Compile()
+
+    def Compile(self):
+        # Convert each (a,b) pair into a closed interval [lo, hi], using the
+        # same conventions as the linear search in BelongsToSel() (where
+        # "a" or "b" values of None or 0 are treated as -infinity/+infinity)
+        bounds = []
+        for (a, b) in self:
+            if a:
+                lo = a
+                if b == None:
+                    hi = float('inf')
+                else:
+                    hi = b
+            elif b:
+                lo = float('-inf')
+                hi = b
+            else:
+                lo = float('-inf')
+                hi = float('inf')
+            if lo <= hi:
+                bounds.append((lo, hi))
+        bounds.sort()
+        self.lo_bounds = []
+        self.hi_bounds = []
+        for (lo, hi) in bounds:
+            if (len(self.hi_bounds) > 0) and (lo <= self.hi_bounds[-1] + 1):
+                if hi > self.hi_bounds[-1]:
+                    self.hi_bounds[-1] = hi
+            else:
+                self.lo_bounds.append(lo)
+                self.hi_bounds.append(hi)
+
+    def Contains(self, i):
+        k = bisect_right(self.lo_bounds, i)
+        return (k > 0) and (i <= self.hi_bounds[k - 1])
+
+
 def BelongsToSel(i, sel):
     if (i == None) or (sel == None) or (len(sel) == 0):
         # If the user has not specified a selection for this category,
@@ -199,6 +266,9 @@ def BelongsToSel(i, sel):
         else:
             return True
 
+    if isinstance(sel, IntervalSelection):
+        return sel.Contains(i)
+
     belongs = False
     for interval in sel:
         assert(len(interval) == 2)
@@ -220,7 +290,440 @@ def BelongsToSel(i, sel):
     return belongs
 
 
-def main():
+# Names of the sections in a LAMMPS data file
+g_data_file_header_names = set(['LAMMPS Description',
+                                'Atoms', 'Masses', 'Velocities', 'Bonds',
+                                'Angles', 'Dihedrals', 'Impropers',
+                                'Pair Coeffs',
+                                'Bond Coeffs', 'Angle Coeffs',
+                                'Dihedral Coeffs', 'Improper Coeffs',
+                                # class2 force fields:
+                                'BondBond Coeffs', 'BondAngle Coeffs',
+                                'MiddleBondTorsion Coeffs', 'EndBondTorsion Coeffs',
+                                'AngleTorsion Coeffs', 'AngleAngleTorsion Coeffs',
+                                'BondBond13 Coeffs',
+                                'AngleAngle Coeffs',
+                                # non-point-like particles:
+                                'Ellipsoids', 'Triangles', 'Lines',
+                                # specifying bonded interactions by type:
+                                'Angles By Type', 'Dihedrals By Type', 'Impropers By Type'
+                                ])
+
+# Data file sections whose first column is an atom id:
+g_per_atom_sections = set(['Velocities', 'Ellipsoids', 'Lines', 'Triangles'])
+
+# Data file sections which refer to atoms in columns 3, 4, ...
+# (and the number of atoms involved in each interaction)
+g_bonded_sections = {'Bonds': 2,
+                     'Angles': 3,
+                     'Dihedrals': 4,
+                     'Impropers': 4}
+
+
+def StripDataLine(line):
+    """ Remove comments and surrounding whitespace from a line of text. """
+    ic = line.find('#')
+    if ic != -1:
+        line = line[:ic]
+    return line.strip()
+
+
+def ReadDataSections(data_lines):
+    """
+    Split the lines of a LAMMPS data file into sections.  This function
+    returns a list of (header_line, body_lines) pairs, in the order they
+    appear in the file.  (The lines preceding the first section header,
+    which include the simulation box boundaries, are stored with a
+    header_line of None.)
+
+    """
+    sections = [(None, [])]
+    for line in data_lines:
+        if StripDataLine(line) in g_data_file_header_names:
+            sections.append((line, []))
+        else:
+            sections[-1][1].append(line)
+    return sections
+
+
+def ReadBatchSelections(batch_fname):
+    """
+    Read a file containing a list of selections, one per line.  The first
+    word on each line is the name of a molecule type.  The remaining words
+    select the atoms in that molecule, using the same syntax as the
+    "-atomid", "-atomtype", and "-molid" arguments.  For example:
+
+       Water    -molid 1*1000
+       Protein  -molid 1001
+       Ions     -atomtype 7 8
+
+    This function returns a list of
+    (name, atomid_selection, atomtype_selection, molid_selection) tuples.
+
+    """
+    atomid_flags = set(['-id', '-atomid', '-atom-id'])
+    atomtype_flags = set(['-type', '-atomtype', '-atom-type'])
+    molid_flags = set(['-mol', '-molid', '-mol-id',
+                       '-moleculeid', '-molecule-id'])
+    try:
+        batch_file = open(batch_fname, 'r')
+    except IOError:
+        raise InputError('Error: unable to open file \"' + batch_fname + '\"\n'
+                         '       for reading.\n')
+    batch_selections = []
+    lineno = 0
+    for line in batch_file:
+        lineno += 1
+        tokens = StripDataLine(line).split()
+        if len(tokens) == 0:
+            continue
+        name = tokens[0]
+        selections = {}
+        flag = None
+        for token in tokens[1:]:
+            if token.lower() in atomid_flags:
+                flag = '-atomid'
+            elif token.lower() in atomtype_flags:
+                flag = '-atomtype'
+            elif token.lower() in molid_flags:
+                flag = '-molid'
+            elif flag == None:
+                raise InputError('Error: near ' + ErrorLeader(batch_fname, lineno) + '\n'
+                                 '       Expected \"-atomid\", \"-atomtype\", or \"-molid\"\n'
+                                 '       instead of \"' + token + '\"\n')
+            else:
+                selections[flag] = (selections.get(flag, []) +
+                                    LammpsSelectToIntervals(token))
+        batch_selections.append((name,
+                                 IntervalSelection(selections.get('-atomid')),
+                                 IntervalSelection(selections.get('-atomtype')),
+                                 IntervalSelection(selections.get('-molid'))))
+    batch_file.close()
+    return batch_selections
+
+
+def BatchLtemplify(file_names,
+                   l_options,
+                   batch_selections,
+                   batch_dir,
+                   name_prefix,
+                   column_names,
+                   atom_style_undefined,
+                   out_file):
+    """
+    Create several templates from one LAMMPS data file (in "batch" mode).
+    The data file is read only once, and its atoms are divided into groups:
+    either one group per selection in "batch_selections", or (if
+    batch_selections is None) one group per molecule-ID.
+    Groups which contain identical molecules (the same atom types, charges,
+    and bonded interactions, listed in the same order) share a "topology
+    signature".  Only one template is created for each distinct signature,
+    so repeated copies of a molecule are instantiated using "new X [N]".
+    Each template is created by invoking main() on a small data file
+    containing only the atoms (and bonds, angles, ...) from one group.
+    The templates are saved in "batch_dir", and an LT file which imports
+    them (and creates all of the copies) is written to "out_file".
+
+    """
+
+    if batch_dir == '.':
+        batch_dir = ''
+
+    # Find the data file (the file containing an "Atoms" section).
+    data_fname = None
+    data_lines = None
+    for fname in file_names:
+        try:
+            lammps_file = open(fname, 'r')
+        except IOError:
+            raise InputError('Error: unrecognized argument (\"' + fname + '\"),\n'
+                             '       OR unable to open file:\n'
+                             '\n'
+                             '       \"' + fname + '\"\n'
+                             '       for reading.\n')
+        lines = lammps_file.readlines()
+        lammps_file.close()
+        if 'Atoms' in set([StripDataLine(line) for line in lines]):
+            if data_fname != None:
+                raise InputError('Error: In batch mode, only one LAMMPS data file can be read.\n'
+                                 '       (Both \"' + data_fname + '\" and \"' + fname + '\"\n'
+                                 '        contain an \"Atoms\" section.)\n')
+            data_fname = fname
+            data_lines = lines
+        elif atom_style_undefined:
+            # Look for an "atom_style" command in this input script
+            for line in lines:
+                tokens = StripDataLine(line).split()
+                if (len(tokens) > 1) and (tokens[0] == 'atom_style'):
+                    column_names = AtomStyle2ColNames(' '.join(tokens[1:]))
+                    atom_style_undefined = False
+                    break
+    if data_fname == None:
+        raise InputError('Error: None of the files you supplied contain an \"Atoms\" section.\n'
+                         '       (Batch mode requires a LAMMPS data file.)\n')
+    sys.stderr.write('read data file \"' + data_fname + '\"\n')
+
+    i_atomid, i_atomtype, i_molid = ColNames2AidAtypeMolid(column_names)
+    ii_coords = ColNames2Coords(column_names)
+    assert(len(ii_coords) == 1)
+    i_x = ii_coords[0][0]
+    i_y = ii_coords[0][1]
+    i_z = ii_coords[0][2]
+    if (batch_selections == None) and (not i_molid):
+        raise InputError('Error: The \"-batch-mol\" argument requires an atom_style with molecule-IDs.\n')
+
+    sections = ReadDataSections(data_lines)
+
+    # The boundary box is needed to interpret image flags.
+    # (See the comments in main() where the "Atoms" section is read.)
+    boundary = {}
+    for line in sections[0][1]:
+        tokens = StripDataLine(line).split()
+        if ((len(tokens) == 4) and (tokens[2][1:] == 'lo') and
+                (tokens[3][1:] == 'hi') and
+                IsNumber(tokens[0]) and IsNumber(tokens[1])):
+            boundary[tokens[2]] = float(tokens[0])
+            boundary[tokens[3]] = float(tokens[1])
+        elif ((len(tokens) == 6) and (tokens[3:6] == ['xy', 'xz', 'yz']) and
+              IsNumber(tokens[0]) and IsNumber(tokens[1]) and
+              IsNumber(tokens[2])):
+            boundary['xy'] = float(tokens[0])
+            boundary['xz'] = float(tokens[1])
+            boundary['yz'] = float(tokens[2])
+    avec = bvec = cvec = None
+    if len(set(['xlo', 'xhi', 'ylo', 'yhi', 'zlo', 'zhi']) -
+           set(boundary)) == 0:
+        avec = (boundary['xhi'] - boundary['xlo'], 0.0, 0.0)
+        bvec = (0.0, boundary['yhi'] - boundary['ylo'], 0.0)
+        cvec = (0.0, 0.0, boundary['zhi'] - boundary['zlo'])
+        if boundary.get('xy') and boundary.get('yz') and boundary.get('xz'):
+            bvec = (boundary['xy'], bvec[1], 0.0)
+            cvec = (boundary['xz'], boundary['yz'], cvec[2])
+
+    # Divide the atoms into groups.
+    # group_atoms[g] is a list of the tokens of each atom in group g
+    # group_lines[g][section] is a list of lines in that section belonging
+    #     to group g (for sections other than "Atoms")
+    # atomid2groups[atomid] is a list of groups containing that atom
+    group_atoms = []
+    group_lines = []
+    atomid2groups = {}
+    molid2group = {}
+    if batch_selections != None:
+        for k in range(0, len(batch_selections)):
+            group_atoms.append([])
+            group_lines.append({})
+
+    for header_line, body_lines in sections:
+        if (header_line == None) or (StripDataLine(header_line) != 'Atoms'):
+            continue
+        for line in body_lines:
+            tokens = StripDataLine(line).split()
+            if len(tokens) == 0:
+                continue
+            if ((len(tokens) <= i_atomid) or
+                (len(tokens) <= i_atomtype) or
+                ((i_molid != None) and
+                 (len(tokens) <= i_molid))):
+                raise InputError('Error: The number of columns in the \"Atoms\" section does\n'
+                                 '       not match the atom_style (see column name list above).\n')
+            atomid = Intify(tokens[i_atomid])
+            atomtype = Intify(tokens[i_atomtype])
+            molid = None
+            if i_molid:
+                molid = Intify(tokens[i_molid])
+            if batch_selections == None:
+                # One group per molecule.  (Atoms whose molecule-ID is 0
+                # do not belong to a molecule, so each gets its own group.)
+                if molid:
+                    group = molid2group.get(molid)
+                else:
+                    group = None
+                if group == None:
+                    group = len(group_atoms)
+                    group_atoms.append([])
+                    group_lines.append({})
+                    if molid:
+                        molid2group[molid] = group
+                groups = [group]
+            else:
+                groups = [k for k in range(0, len(batch_selections))
+                          if (BelongsToSel(atomid, batch_selections[k][1]) and
+                              BelongsToSel(atomtype, batch_selections[k][2]) and
+                              BelongsToSel(molid, batch_selections[k][3]))]
+            atomid2groups[atomid] = groups
+            for group in groups:
+                group_atoms[group].append(tokens)
+
+    for header_line, body_lines in sections:
+        if header_line == None:
+            continue
+        section = StripDataLine(header_line)
+        if section in g_per_atom_sections:
+            for line in body_lines:
+                tokens = StripDataLine(line).split()
+                if len(tokens) == 0:
+                    continue
+                for group in atomid2groups.get(Intify(tokens[0]), []):
+                    group_lines[group].setdefault(section, []).append(line)
+        elif section in g_bonded_sections:
+            natoms = g_bonded_sections[section]
+            for line in body_lines:
+                tokens = StripDataLine(line).split()
+                if len(tokens) == 0:
+                    continue
+                if len(tokens) < 2 + natoms:
+                    raise InputError('Error: In \"' + data_fname + '\"\n'
+                                     '       Nonsensical line in ' + section + ' section:\n'
+                                     '       \"' + line.strip() + '\"\n')
+                atomids = [Intify(token) for token in tokens[2:2 + natoms]]
+                groups = set(atomid2groups.get(atomids[0], []))
+                some_groups = set(groups)
+                for atomid in atomids[1:]:
+                    groups.intersection_update(atomid2groups.get(atomid, []))
+                    some_groups.update(atomid2groups.get(atomid, []))
+                for group in groups:
+                    group_lines[group].setdefault(section, []).append(line)
+                if len(some_groups) > len(groups):
+                    sys.stderr.write('WARNING: SELECTION BREAKS ' + section.upper() + '\n'
+                                     '         (between atom ids: ' +
+                                     ' '.join([str(atomid) for atomid in atomids]) + ')\n'
+                                     '         The atoms you selected are bonded\n'
+                                     '         to other atoms you didn\'t select.\n'
+                                     '         Are you sure you selected the correct atoms?\n')
+
+    # Compute the topology signature of each group, and find the groups
+    # which contain identical molecules.  (The signature ignores atom-IDs,
+    # molecule-IDs, coordinates, and image flags.  Bonded interactions are
+    # described by their type and the position of each atom in the group.)
+    ignore_columns = set([i_atomid, i_x, i_y, i_z])
+    if i_molid:
+        ignore_columns.add(i_molid)
+    signature2template = {}
+    templates = []  # a list of [name, representative_group, copies]
+    for group in range(0, len(group_atoms)):
+        if len(group_atoms[group]) == 0:
+            sys.stderr.write('WARNING: The selection named \"' +
+                             batch_selections[group][0] +
+                             '\" does not contain any atoms.\n')
+            continue
+        atomid2index = {}
+        atom_signature = []
+        for tokens in group_atoms[group]:
+            atomid2index[Intify(tokens[i_atomid])] = len(atomid2index)
+            ncolumns = len(tokens)
+            if ncolumns == len(column_names) + 3:
+                ncolumns -= 3  # (ignore image flags)
+            atom_signature.append(tuple([tokens[i]
+                                         for i in range(0, ncolumns)
+                                         if i not in ignore_columns]))
+        signature = [tuple(atom_signature)]
+        for section in sorted(g_bonded_sections):
+            natoms = g_bonded_sections[section]
+            interactions = []
+            for line in group_lines[group].get(section, []):
+                tokens = StripDataLine(line).split()
+                interactions.append(tuple([tokens[1]] +
+                                          [atomid2index[Intify(token)]
+                                           for token in tokens[2:2 + natoms]]))
+            interactions.sort()
+            signature.append(tuple(interactions))
+        signature = tuple(signature)
+
+        if batch_selections == None:
+            name = name_prefix + str(len(templates) + 1)
+        else:
+            name = batch_selections[group][0]
+        if signature in signature2template:
+            template = signature2template[signature]
+            if (batch_selections != None) and (name != template[0]):
+                sys.stderr.write('  selection \"' + name +
+                                 '\" contains another copy of \"' +
+                                 template[0] + '\"\n')
+            template[2].append(group)
+        else:
+            for template in templates:
+                if template[0] == name:
+                    raise InputError('Error: There are two different molecules named \"' + name + '\".\n'
+                                     '       (Each selection in a batch file should have a unique name.)\n')
+            template = [name, group, [group]]
+            signature2template[signature] = template
+            templates.append(template)
+    signature2template = None
+
+    if len(templates) == 0:
+        raise InputError('Error(' + g_program_name + '): You have no atoms in you selection!\n')
+
+    # Now create a template for each distinct molecule.  To do that, invoke
+    # main() on a data file containing only the atoms from one group.
+    argv_template = [g_program_name] + l_options
+    for name, group, copies in templates:
+        text = []
+        for header_line, body_lines in sections:
+            if header_line == None:
+                text += body_lines
+                continue
+            section = StripDataLine(header_line)
+            if section == 'Atoms':
+                text += [header_line, '\n']
+                text += [' '.join(tokens) + '\n' for tokens in group_atoms[group]]
+                text.append('\n')
+            elif ((section in g_per_atom_sections) or
+                  (section in g_bonded_sections)):
+                if section in group_lines[group]:
+                    text += [header_line, '\n']
+                    text += group_lines[group][section]
+                    text.append('\n')
+            else:
+                text.append(header_line)
+                text += body_lines
+        template_fname = os.path.join(batch_dir, name + '.lt')
+        sys.stderr.write('\n--- creating \"' + template_fname + '\" ---\n')
+        template_file = open(template_fname, 'w')
+        main(argv_template + ['-name', name] + file_names,
+             template_file,
+             {data_fname: StringIO(''.join(text))})
+        template_file.close()
+
+    # Finally, write the file which creates all of the molecules.
+    # Every copy of a molecule is created using the coordinates from its
+    # template.  The original coordinates of each atom (in the order that
+    # moltemplate will create them) are saved in a separate file.
+    coords_fname = os.path.join(batch_dir, 'coords.raw')
+    coords_file = open(coords_fname, 'w')
+    out_file.write('# This file was created by ' + g_program_name +
+                   ' from \"' + data_fname + '\"\n'
+                   '# (All copies of a molecule share the same coordinates.\n'
+                   '#  To restore the original coordinates of every atom, use:\n'
+                   '#      moltemplate.sh -raw ' + coords_fname + ' ...)\n\n')
+    for name, group, copies in templates:
+        out_file.write('import \"' + os.path.join(batch_dir, name + '.lt') + '\"\n')
+    out_file.write('\n')
+    for name, group, copies in templates:
+        if len(copies) == 1:
+            out_file.write(name + '_mol = new ' + name + '\n')
+        else:
+            out_file.write(name + '_mols = new ' + name +
+                           ' [' + str(len(copies)) + ']\n')
+        for group in copies:
+            for tokens in group_atoms[group]:
+                xyz = tokens[i_x:i_z + 1]
+                if len(tokens) == len(column_names) + 3:
+                    # Use the image flags to find the true atom location
+                    if avec == None:
+                        raise InputError('Error: Your data file lacks a boundary-box header.\n'
+                                         '       (The xlo xhi ylo yhi zlo zhi boundaries are\n'
+                                         '        needed to interpret the image flags.)\n')
+                    nx = int(tokens[-3])
+                    ny = int(tokens[-2])
+                    nz = int(tokens[-1])
+                    xyz = [float(xyz[j]) + nx * avec[j] + ny * bvec[j] + nz * cvec[j]
+                           for j in range(0, 3)]
+                coords_file.write(' '.join([str(x) for x in xyz]) + '\n')
+    coords_file.close()
+
+
+def main(argv=None, out_file=None, in_files=None):
     try:
         sys.stderr.write(g_program_name + ' v' +
                          g_version_str + ' ' + g_date_str + '\n')
@@ -326,6 +829,9 @@ def main():
         l_data_pair_coeffs = []
         l_data_pairij_coeffs = []
         l_data_atoms = []
+        # (the integer atom id and atom type of each line in l_data_atoms)
+        l_data_atomids = []
+        l_data_atomtypes = []
         l_data_velocities = []
         l_data_bonds = []
         l_data_angles = []
@@ -367,7 +873,15 @@ def main():
         infer_types_from_comments = False
         remove_coeffs_from_data_file = True
 
-        argv = [arg for arg in sys.argv]
+        if argv == None:
+            argv = sys.argv
+        if out_file == None:
+            out_file = sys.stdout
+        argv = [arg for arg in argv]
+        argv_orig = [arg for arg in argv]
+        batch_fname = None
+        batch_mol = False
+        batch_dir = '.'
 
         i = 1
 
@@ -397,6 +911,23 @@ def main():
                 column_names = argv[i + 1].strip('\"\'').strip().split()
                 del argv[i:i + 2]
 
+            elif (argv[i] == '-batch'):
+                if i + 1 >= len(argv):
+                    raise InputError('Error: ' + argv[i] + ' flag should be followed by the name of a file\n'
+                                     '       containing a list of molecule names and selections.\n')
+                batch_fname = argv[i + 1]
+                del argv[i:i + 2]
+
+            elif (argv[i] == '-batch-mol'):
+                batch_mol = True
+                del argv[i:i + 1]
+
+            elif (argv[i] == '-batch-dir'):
+                if i + 1 >= len(argv):
+                    raise InputError('Error: ' + argv[i] + ' flag should be followed by a directory name.\n')
+                batch_dir = argv[i + 1]
+                del argv[i:i + 2]
+
             elif (argv[i] == '-ignore-comments'):
                 infer_types_from_comments = False
                 del argv[i:i + 1]
@@ -514,6 +1045,11 @@ def main():
             else:
                 i += 1
 
+        # Compile the selections so that BelongsToSel() can use binary search
+        atomid_selection = IntervalSelection(atomid_selection)
+        atomtype_selection = IntervalSelection(atomtype_selection)
+        molid_selection = IntervalSelection(molid_selection)
+
         # We might need to parse the simulation boundary-box.
         # If so, use these variables.  (None means uninitialized.)
         boundary_xlo = None
@@ -544,6 +1080,49 @@ def main():
             i_y = ii_coords[0][1]
             i_z = ii_coords[0][2]
 
+        if (batch_fname != None) or batch_mol:
+            if ((len(atomid_selection) > 0) or
+                    (len(atomtype_selection) > 0) or
+                    (len(molid_selection) > 0)):
+                raise InputError('Error: The -atomid, -atomtype, and -molid arguments can not be used\n'
+                                 '       together with "-batch" or "-batch-mol".  (In batch mode,\n'
+                                 '       put these selections in the file following the "-batch" argument.)\n')
+            if batch_fname != None:
+                batch_selections = ReadBatchSelections(batch_fname)
+                name_prefix = None
+            else:
+                batch_selections = None
+                name_prefix = mol_name
+                if name_prefix == '':
+                    name_prefix = 'Mol'
+            # The remaining arguments in argv are file names.  Pass all of
+            # the other arguments (except the batch arguments) to main()
+            # when creating each template.
+            l_options = []
+            i = 1
+            i_arg = 1
+            while i < len(argv_orig):
+                if argv_orig[i] in ('-batch', '-batch-dir'):
+                    i += 2
+                elif argv_orig[i] == '-batch-mol':
+                    i += 1
+                elif ((i_arg < len(argv)) and
+                      (argv_orig[i] == argv[i_arg])):
+                    i += 1
+                    i_arg += 1
+                else:
+                    l_options.append(argv_orig[i])
+                    i += 1
+            BatchLtemplify(argv[1:],
+                           l_options,
+                           batch_selections,
+                           batch_dir,
+                           name_prefix,
+                           column_names,
+                           atom_style_undefined,
+                           out_file)
+            return
+
         #---------------------------------------------------------
         #-- The remaining arguments are files that the user wants
         #-- us to read and convert.  It is typical to have
@@ -558,7 +1137,10 @@ def main():
         for i_arg in range(1, len(argv)):
             fname = argv[i_arg]
             try:
-                lammps_file = open(fname, 'r')
+                if (in_files != None) and (fname in in_files):
+                    lammps_file = in_files[fname]
+                else:
+                    lammps_file = open(fname, 'r')
             except IOError:
                 raise InputError('Error: unrecognized argument (\"' + fname + '\"),\n'
                                  '       OR unable to open file:\n'
@@ -573,23 +1155,10 @@ def main():
 
             atomid2type = {}
             atomid2mol = {}
-            data_file_header_names = set(['LAMMPS Description',
-                                          'Atoms', 'Masses', 'Velocities', 'Bonds',
-                                          'Angles', 'Dihedrals', 'Impropers',
-                                          'Pair Coeffs',
-                                          'Bond Coeffs', 'Angle Coeffs',
-                                          'Dihedral Coeffs', 'Improper Coeffs',
-                                          # class2 force fields:
-                                          'BondBond Coeffs', 'BondAngle Coeffs',
-                                          'MiddleBondTorsion Coeffs', 'EndBondTorsion Coeffs',
-                                          'AngleTorsion Coeffs', 'AngleAngleTorsion Coeffs',
-                                          'BondBond13 Coeffs',
-                                          'AngleAngle Coeffs',
-                                          # non-point-like particles:
-                                          'Ellipsoids', 'Triangles', 'Lines',
-                                          # specifying bonded interactions by type:
-                                          'Angles By Type', 'Dihedrals By Type', 'Impropers By Type'
-                                          ])
+            # Remember which atoms belong to the selection (so that we don't
+            # have to test them again when reading Bonds, Angles, ...)
+            atomid2sel = {}
+            data_file_header_names = g_data_file_header_names
 
             lex = LineLex(lammps_file, fname)
             lex.source_triggers = set(['include', 'import'])
@@ -757,9 +1326,12 @@ def main():
                                 if i_molid:
                                     atomid2mol[atomid] = molid
 
-                                if (BelongsToSel(atomid, atomid_selection) and
-                                        BelongsToSel(atomtype, atomtype_selection) and
-                                        BelongsToSel(molid, molid_selection)):
+                                in_selection = (BelongsToSel(atomid, atomid_selection) and
+                                                BelongsToSel(atomtype, atomtype_selection) and
+                                                BelongsToSel(molid, molid_selection))
+                                atomid2sel[atomid] = in_selection
+
+                                if in_selection:
 
                                     tokens[i_atomid] = '$atom:id' + \
                                         tokens[i_atomid]
@@ -811,6 +1383,8 @@ def main():
                                             tokens[i_molid]
                                     l_data_atoms.append(
                                         (' ' * indent) + (' '.join(tokens) + '\n'))
+                                    l_data_atomids.append(atomid)
+                                    l_data_atomtypes.append(atomtype)
                                     needed_atomids.add(atomid)
 
                                     needed_atomtypes.add(atomtype)
@@ -1019,19 +1593,17 @@ def main():
                                 #tokens[0] = '$bond:id'+tokens[0]
                                 #tokens[1] = '@bond:type'+tokens[1]
                                 atomids = [None, None]
-                                atomtypes = [None, None]
-                                molids = [None, None]
                                 in_selections = True
                                 some_in_selection = False
                                 for n in range(0, 2):
                                     atomids[n] = Intify(tokens[2 + n])
-                                    if atomids[n] in atomid2type:
-                                        atomtypes[n] = atomid2type[atomids[n]]
-                                    if atomids[n] in atomid2mol:
-                                        molids[n] = atomid2mol[atomids[n]]
-                                    if (BelongsToSel(atomids[n], atomid_selection) and
-                                            BelongsToSel(atomtypes[n], atomtype_selection) and
-                                            BelongsToSel(molids[n], molid_selection)):
+                                    if atomids[n] in atomid2sel:
+                                        atom_in_selection = atomid2sel[atomids[n]]
+                                    else:
+                                        # (atom was not in the "Atoms" section)
+                                        atom_in_selection = BelongsToSel(atomids[n],
+                                                                         atomid_selection)
+                                    if atom_in_selection:
                                         #tokens[2+n] = '$atom:id'+tokens[2+n]
                                         #tokens[2+n] = '$atom:'+atomids_int2name[atomids[n]]
                                         some_in_selection = True
@@ -1072,19 +1644,17 @@ def main():
                                 #tokens[0] = '$angle:id'+tokens[0]
                                 #tokens[1] = '@angle:type'+tokens[1]
                                 atomids = [None, None, None]
-                                atomtypes = [None, None, None]
-                                molids = [None, None, None]
                                 in_selections = True
                                 some_in_selection = False
                                 for n in range(0, 3):
                                     atomids[n] = Intify(tokens[2 + n])
-                                    if atomids[n] in atomid2type:
-                                        atomtypes[n] = atomid2type[atomids[n]]
-                                    if atomids[n] in atomid2mol:
-                                        molids[n] = atomid2mol[atomids[n]]
-                                    if (BelongsToSel(atomids[n], atomid_selection) and
-                                            BelongsToSel(atomtypes[n], atomtype_selection) and
-                                            BelongsToSel(molids[n], molid_selection)):
+                                    if atomids[n] in atomid2sel:
+                                        atom_in_selection = atomid2sel[atomids[n]]
+                                    else:
+                                        # (atom was not in the "Atoms" section)
+                                        atom_in_selection = BelongsToSel(atomids[n],
+                                                                         atomid_selection)
+                                    if atom_in_selection:
                                         #tokens[2+n] = '$atom:id'+tokens[2+n]
                                         #tokens[2+n] = '$atom:'+atomids_int2name[atomids[n]]
                                         some_in_selection = True
@@ -1123,19 +1693,17 @@ def main():
                                 #tokens[0] = '$dihedral:id'+tokens[0]
                                 #tokens[1] = '@dihedral:type'+tokens[1]
                                 atomids = [None, None, None, None]
-                                atomtypes = [None, None, None, None]
-                                molids = [None, None, None, None]
                                 in_selections = True
                                 some_in_selection = False
                                 for n in range(0, 4):
                                     atomids[n] = Intify(tokens[2 + n])
-                                    if atomids[n] in atomid2type:
-                                        atomtypes[n] = atomid2type[atomids[n]]
-                                    if atomids[n] in atomid2mol:
-                                        molids[n] = atomid2mol[atomids[n]]
-                                    if (BelongsToSel(atomids[n], atomid_selection) and
-                                            BelongsToSel(atomtypes[n], atomtype_selection) and
-                                            BelongsToSel(molids[n], molid_selection)):
+                                    if atomids[n] in atomid2sel:
+                                        atom_in_selection = atomid2sel[atomids[n]]
+                                    else:
+                                        # (atom was not in the "Atoms" section)
+                                        atom_in_selection = BelongsToSel(atomids[n],
+                                                                         atomid_selection)
+                                    if atom_in_selection:
                                         #tokens[2+n] = '$atom:id'+tokens[2+n]
                                         #tokens[2+n] = '$atom:'+atomids_int2name[atomids[n]]
                                         some_in_selection = True
@@ -1174,19 +1742,17 @@ def main():
                                 #tokens[0] = '$improper:id'+tokens[0]
                                 #tokens[1] = '@improper:type'+tokens[1]
                                 atomids = [None, None, None, None]
-                                atomtypes = [None, None, None, None]
-                                molids = [None, None, None, None]
                                 in_selections = True
                                 some_in_selection = False
                                 for n in range(0, 4):
                                     atomids[n] = Intify(tokens[2 + n])
-                                    if atomids[n] in atomid2type:
-                                        atomtypes[n] = atomid2type[atomids[n]]
-                                    if atomids[n] in atomid2mol:
-                                        molids[n] = atomid2mol[atomids[n]]
-                                    if (BelongsToSel(atomids[n], atomid_selection) and
-                                            BelongsToSel(atomtypes[n], atomtype_selection) and
-                                            BelongsToSel(molids[n], molid_selection)):
+                                    if atomids[n] in atomid2sel:
+                                        atom_in_selection = atomid2sel[atomids[n]]
+                                    else:
+                                        # (atom was not in the "Atoms" section)
+                                        atom_in_selection = BelongsToSel(atomids[n],
+                                                                         atomid_selection)
+                                    if atom_in_selection:
                                         #tokens[2+n] = '$atom:id'+tokens[2+n]
                                         #tokens[2+n] = '$atom:'+atomids_int2name[atomids[n]]
                                         some_in_selection = True
@@ -1640,22 +2206,16 @@ def main():
         # During this pass, peplace the atomtype names and atomid names with
         # atom type names which were inferred from comments read earlier.
 
+        # (The integer atom ids and atom types were stored in l_data_atomids
+        #  and l_data_atomtypes when the "Atoms" section was read, so there
+        #  is no need to parse these lines again.)
+
         sys.stderr.write('pass1')
         for i in range(0, len(l_data_atoms)):
-            tokens = l_data_atoms[i].split()
-            atomid = tokens[i_atomid]
-            if atomid.find('$atom:') == 0:
-                atomid = atomid[6:]
-                # convert to an integer
-                atomid = Intify(atomid)
+            atomid = l_data_atomids[i]
 
             if infer_types_from_comments:
-                atomtype = tokens[i_atomtype]
-                # remove the "@atom:" prefix (we will put it back later)
-                if atomtype.find('@atom:') == 0:
-                    atomtype = atomtype[6:]
-                # convert to an integer
-                atomtype = Intify(atomtype)
+                atomtype = l_data_atomtypes[i]
                 atomtype_name = atomtypes_int2name[atomtype]
                 if atomtype in atomids_by_type:
                     l_atomids = atomids_by_type[atomtype]
@@ -1676,20 +2236,11 @@ def main():
 
         sys.stderr.write(', pass2')
         # Pass 2: If any atom types only appear once, simplify their atomid names.
-        for i in range(0, len(l_data_atoms)):
-            tokens = l_data_atoms[i].split()
-
-            # remove the "@atom:" prefix (we will put it back later)
-            atomtype = tokens[i_atomtype]
-            if atomtype.find('@atom:') == 0:
-                atomtype = atomtype[6:]
-            atomtype = Intify(atomtype)
-            if infer_types_from_comments:
+        if infer_types_from_comments:
+            for i in range(0, len(l_data_atoms)):
+                atomtype = l_data_atomtypes[i]
                 if len(atomids_by_type[atomtype]) == 1:
-                    atomid = tokens[i_atomid]
-                    if atomid.find('$atom:') == 0:
-                        atomid = atomid[6:]
-                    atomid = Intify(atomid)
+                    atomid = l_data_atomids[i]
                     atomtype_name = atomtypes_int2name[atomtype]
                     atomids_int2name[atomid] = atomtype_name
 
@@ -1697,18 +2248,8 @@ def main():
         # Pass 3: substitute the atomid names and atom type names into l_data_atoms
         for i in range(0, len(l_data_atoms)):
             tokens = l_data_atoms[i].split()
-            atomid = tokens[i_atomid]
-            if atomid.find('$atom:') == 0:
-                atomid = atomid[6:]
-                # convert to an integer
-                atomid = Intify(atomid)
-            atomtype = tokens[i_atomtype]
-            if atomtype.find('@atom:') == 0:
-                atomtype = atomtype[6:]
-            atomtype = Intify(atomtype)
-            tokens = l_data_atoms[i].split()
-            tokens[i_atomid] = '$atom:' + atomids_int2name[atomid]
-            tokens[i_atomtype] = '@atom:' + atomtypes_int2name[atomtype]
+            tokens[i_atomid] = '$atom:' + atomids_int2name[l_data_atomids[i]]
+            tokens[i_atomtype] = '@atom:' + atomtypes_int2name[l_data_atomtypes[i]]
             l_data_atoms[i] = (' ' * indent) + (' '.join(tokens) + '\n')
         sys.stderr.write(')\n')
 
@@ -1833,11 +2374,15 @@ def main():
             i_b_final = None
 
             for i in range(i_a, i_b + 1):
-                if ((i in needed_atomtypes) or (min_sel_atomtype <= i)):
+                if ((i in needed_atomtypes) or
+                        (min_sel_atomtype == None) or
+                        (min_sel_atomtype <= i)):
                     i_a_final = i
                     break
             for i in reversed(range(i_a, i_b + 1)):
-                if ((i in needed_atomtypes) or (max_sel_atomtype >= i)):
+                if ((i in needed_atomtypes) or
+                        ((max_sel_atomtype != None) and
+                         (max_sel_atomtype >= i))):
                     i_b_final = i
                     break
 
@@ -1875,11 +2420,15 @@ def main():
             j_a_final = None
             j_b_final = None
             for j in range(j_a, j_b + 1):
-                if ((j in needed_atomtypes) or (min_sel_atomtype <= j)):
+                if ((j in needed_atomtypes) or
+                        (min_sel_atomtype == None) or
+                        (min_sel_atomtype <= j)):
                     j_a_final = j
                     break
             for j in reversed(range(j_a, j_b + 1)):
-                if ((j in needed_atomtypes) or (max_sel_atomtype >= j)):
+                if ((j in needed_atomtypes) or
+                        ((max_sel_atomtype != None) and
+                         (max_sel_atomtype >= j))):
                     j_b_final = j
                     break
 
@@ -1962,11 +2511,15 @@ def main():
             i_a_final = None
             i_b_final = None
             for i in range(i_a, i_b + 1):
-                if ((i in needed_atomtypes) or (min_sel_atomtype <= i)):
+                if ((i in needed_atomtypes) or
+                        (min_sel_atomtype == None) or
+                        (min_sel_atomtype <= i)):
                     i_a_final = i
                     break
             for i in reversed(range(i_a, i_b + 1)):
-                if ((i in needed_atomtypes) or (max_sel_atomtype >= i)):
+                if ((i in needed_atomtypes) or
+                        ((max_sel_atomtype != None) and
+                         (max_sel_atomtype >= i))):
                     i_b_final = i
                     break
             # if i_a_final and i_b_final:
@@ -2061,6 +2614,11 @@ def main():
             tokens = line.strip().split()
             bondtype_str = tokens[1]
 
+            if min_needed_bondtype == None:
+                # None of the selected atoms belong to any bonds.
+                del l_in_bond_coeffs[i_line]
+                continue
+
             if ('*' in bondtype_str):
                 bondtype_tokens = bondtype_str.split('*')
 
@@ -2212,6 +2770,11 @@ def main():
             tokens = line.strip().split()
             angletype_str = tokens[1]
 
+            if min_needed_angletype == None:
+                # None of the selected atoms belong to any angles.
+                del l_in_angle_coeffs[i_line]
+                continue
+
             if ('*' in angletype_str):
                 angletype_tokens = angletype_str.split('*')
 
@@ -2413,6 +2976,11 @@ def main():
             tokens = line.strip().split()
             dihedraltype_str = tokens[1]
 
+            if min_needed_dihedraltype == None:
+                # None of the selected atoms belong to any dihedrals.
+                del l_in_dihedral_coeffs[i_line]
+                continue
+
             if ('*' in dihedraltype_str):
                 dihedraltype_tokens = dihedraltype_str.split('*')
 
@@ -2558,6 +3126,11 @@ def main():
             tokens = line.strip().split()
             impropertype_str = tokens[1]
 
+            if min_needed_impropertype == None:
+                # None of the selected atoms belong to any impropers.
+                del l_in_improper_coeffs[i_line]
+                continue
+
             if ('*' in impropertype_str):
                 impropertype_tokens = impropertype_str.split('*')
 
@@ -3118,31 +3691,31 @@ def main():
         #                 '        ----------------------\n')
 
         if mol_name != '':
-            sys.stdout.write(mol_name + ' {\n')
+            out_file.write(mol_name + ' {\n')
 
         if len(l_in_init) > 0:
-            sys.stdout.write('\n  ### LAMMPS commands for initialization\n'
+            out_file.write('\n  ### LAMMPS commands for initialization\n'
                              '  ### (These can be overridden later.)\n\n')
             l_in_init.insert(0, (' ' * cindent) +
                              'write_once(\"' + in_init + '\") {\n')
             l_in_init.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_init))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_init))
         if len(l_in_settings) > 0:
-            sys.stdout.write('\n  ### LAMMPS commands for settings\n'
+            out_file.write('\n  ### LAMMPS commands for settings\n'
                              '  ### (These can be overridden later.)\n\n')
             l_in_settings.insert(0, (' ' * cindent) +
                                  'write_once(\"' + in_settings + '\") {\n')
             l_in_settings.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_settings))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_settings))
             non_empty_output = True
         if len(l_in_masses) > 0:
             l_in_masses.insert(0, (' ' * cindent) +
                                'write_once(\"' + in_settings + '\") {\n')
             l_in_masses.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_masses))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_masses))
             non_empty_output = True
 
         if remove_coeffs_from_data_file:
@@ -3162,8 +3735,8 @@ def main():
             l_in_pair_coeffs.insert(0, (' ' * cindent) +
                                     'write_once(\"' + in_settings + '\") {\n')
             l_in_pair_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_pair_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_pair_coeffs))
             non_empty_output = True
 
         if (remove_coeffs_from_data_file and (len(l_data_bond_coeffs) > 0)):
@@ -3175,8 +3748,8 @@ def main():
             l_in_bond_coeffs.insert(0, (' ' * cindent) +
                                     'write_once(\"' + in_settings + '\") {\n')
             l_in_bond_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_bond_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_bond_coeffs))
             non_empty_output = True
 
         if (remove_coeffs_from_data_file and (len(l_data_angle_coeffs) > 0)):
@@ -3198,8 +3771,8 @@ def main():
             l_in_angle_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + in_settings + '\") {\n')
             l_in_angle_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_angle_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_angle_coeffs))
             non_empty_output = True
 
         if (remove_coeffs_from_data_file and (len(l_data_dihedral_coeffs) > 0)):
@@ -3242,8 +3815,8 @@ def main():
             l_in_dihedral_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + in_settings + '\") {\n')
             l_in_dihedral_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_dihedral_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_dihedral_coeffs))
             non_empty_output = True
 
         if (remove_coeffs_from_data_file and (len(l_data_improper_coeffs) > 0)):
@@ -3262,61 +3835,61 @@ def main():
             l_in_improper_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + in_settings + '\") {\n')
             l_in_improper_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_improper_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_improper_coeffs))
             non_empty_output = True
 
         if non_empty_output:
-            sys.stdout.write('\n\n  ### DATA sections\n\n')
+            out_file.write('\n\n  ### DATA sections\n\n')
 
         if len(l_data_masses) > 0:
             l_data_masses.insert(0, (' ' * cindent) +
                                  'write_once(\"' + data_masses + '\") {\n')
             l_data_masses.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_masses))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_masses))
             non_empty_output = True
         if len(l_data_bond_coeffs) > 0:
             l_data_bond_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_bond_coeffs + '\") {\n')
             l_data_bond_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_bond_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_bond_coeffs))
             non_empty_output = True
         if len(l_data_angle_coeffs) > 0:
             l_data_angle_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_angle_coeffs + '\") {\n')
             l_data_angle_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_angle_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_angle_coeffs))
             non_empty_output = True
         if len(l_data_dihedral_coeffs) > 0:
             l_data_dihedral_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_dihedral_coeffs + '\") {\n')
             l_data_dihedral_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_dihedral_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_dihedral_coeffs))
             non_empty_output = True
         if len(l_data_improper_coeffs) > 0:
             l_data_improper_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_improper_coeffs + '\") {\n')
             l_data_improper_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_improper_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_improper_coeffs))
             non_empty_output = True
         if len(l_data_pair_coeffs) > 0:
             l_data_pair_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_pair_coeffs + '\") {\n')
             l_data_pair_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_pair_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_pair_coeffs))
             non_empty_output = True
         if len(l_data_pairij_coeffs) > 0:
             l_data_pairij_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_pairij_coeffs + '\") {\n')
             l_data_pairij_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_pairij_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_pairij_coeffs))
             non_empty_output = True
 
         # class2 force fields:
@@ -3324,57 +3897,57 @@ def main():
             l_data_bondbond_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_bondbond_coeffs + '\") {\n')
             l_data_bondbond_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_bondbond_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_bondbond_coeffs))
             non_empty_output = True
         if len(l_data_bondangle_coeffs) > 0:
             l_data_bondangle_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_bondangle_coeffs + '\") {\n')
             l_data_bondangle_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_bondangle_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_bondangle_coeffs))
             non_empty_output = True
         if len(l_data_middlebondtorsion_coeffs) > 0:
             l_data_middlebondtorsion_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_middlebondtorsion_coeffs + '\") {\n')
             l_data_middlebondtorsion_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_middlebondtorsion_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_middlebondtorsion_coeffs))
             non_empty_output = True
         if len(l_data_endbondtorsion_coeffs) > 0:
             l_data_endbondtorsion_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_endbondtorsion_coeffs + '\") {\n')
             l_data_endbondtorsion_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_endbondtorsion_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_endbondtorsion_coeffs))
             non_empty_output = True
         if len(l_data_angletorsion_coeffs) > 0:
             l_data_angletorsion_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_angletorsion_coeffs + '\") {\n')
             l_data_angletorsion_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_angletorsion_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_angletorsion_coeffs))
             non_empty_output = True
         if len(l_data_angleangletorsion_coeffs) > 0:
             l_data_angleangletorsion_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_angleangletorsion_coeffs + '\") {\n')
             l_data_angleangletorsion_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_angleangletorsion_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_angleangletorsion_coeffs))
             non_empty_output = True
         if len(l_data_bondbond13_coeffs) > 0:
             l_data_bondbond13_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_bondbond13_coeffs + '\") {\n')
             l_data_bondbond13_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_bondbond13_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_bondbond13_coeffs))
             non_empty_output = True
         if len(l_data_angleangle_coeffs) > 0:
             l_data_angleangle_coeffs.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_angleangle_coeffs + '\") {\n')
             l_data_angleangle_coeffs.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_angleangle_coeffs))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_angleangle_coeffs))
             non_empty_output = True
 
         # automatic generation of bonded interactions by type:
@@ -3382,30 +3955,30 @@ def main():
             l_data_angles_by_type.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_angles_by_type + '\") {\n')
             l_data_angles_by_type.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_angles_by_type))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_angles_by_type))
             non_empty_output = True
         if len(l_data_dihedrals_by_type) > 0:
             l_data_dihedrals_by_type.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_dihedrals_by_type + '\") {\n')
             l_data_dihedrals_by_type.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_dihedrals_by_type))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_dihedrals_by_type))
             non_empty_output = True
         if len(l_data_impropers_by_type) > 0:
             l_data_impropers_by_type.insert(
                 0, (' ' * cindent) + 'write_once(\"' + data_impropers_by_type + '\") {\n')
             l_data_impropers_by_type.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_impropers_by_type))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_impropers_by_type))
             non_empty_output = True
 
         if len(l_data_atoms) > 0:
             l_data_atoms.insert(0, (' ' * cindent) +
                                 'write(\"' + data_atoms + '\") {\n')
             l_data_atoms.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_atoms))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_atoms))
             non_empty_output = True
         else:
             sys.stderr.write('Warning: missing \"Atoms\" section.\n'
@@ -3417,20 +3990,20 @@ def main():
             l_data_ellipsoids.insert(
                 0, (' ' * cindent) + 'write(\"' + data_ellipsoids + '\") {\n')
             l_data_ellipsoids.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_ellipsoids))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_ellipsoids))
         if len(l_data_lines) > 0:
             l_data_lines.insert(0, (' ' * cindent) +
                                 'write(\"' + data_lines + '\") {\n')
             l_data_lines.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_lines))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_lines))
         if len(l_data_triangles) > 0:
             l_data_triangles.insert(0, (' ' * cindent) +
                                     'write(\"' + data_triangles + '\") {\n')
             l_data_triangles.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_triangles))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_triangles))
 
         # DO NOT WRITE OUT VELOCITY DATA
         # (Why: because it makes it difficult to combine this molecular template
@@ -3441,35 +4014,35 @@ def main():
         # if len(l_data_velocities) > 0:
         #    l_data_velocities.insert(0, (' '*cindent)+'write(\"'+data_velocities+'\") {\n')
         #    l_data_velocities.append((' '*cindent)+'}\n')
-        #    sys.stdout.write('\n')
-        #    sys.stdout.write(''.join(l_data_velocities))
+        #    out_file.write('\n')
+        #    out_file.write(''.join(l_data_velocities))
         if len(l_data_bonds) > 0:
             l_data_bonds.insert(0, (' ' * cindent) +
                                 'write(\"' + data_bonds + '\") {\n')
             l_data_bonds.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_bonds))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_bonds))
             non_empty_output = True
         if len(l_data_angles) > 0:
             l_data_angles.insert(0, (' ' * cindent) +
                                  'write(\"' + data_angles + '\") {\n')
             l_data_angles.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_angles))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_angles))
             non_empty_output = True
         if len(l_data_dihedrals) > 0:
             l_data_dihedrals.insert(0, (' ' * cindent) +
                                     'write(\"' + data_dihedrals + '\") {\n')
             l_data_dihedrals.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_dihedrals))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_dihedrals))
             non_empty_output = True
         if len(l_data_impropers) > 0:
             l_data_impropers.insert(0, (' ' * cindent) +
                                     'write(\"' + data_impropers + '\") {\n')
             l_data_impropers.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_data_impropers))
+            out_file.write('\n')
+            out_file.write(''.join(l_data_impropers))
             non_empty_output = True
 
         if len(l_in_group) > 0:
@@ -3477,8 +4050,8 @@ def main():
             l_in_group.insert(0, (' ' * cindent) +
                               'write(\"' + in_settings + '\") {\n')
             l_in_group.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_group))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_group))
             # sys.stderr.write('######################################################\n'
             #                 'WARNING: One or more \"group\" commands appear to refer to relevant atoms.\n'
             #                 '         Please check to make sure that the group(s) generated by\n'
@@ -3490,25 +4063,25 @@ def main():
             l_in_set.insert(0, ((' ' * cindent) +
                                 'write(\"' + in_settings + '\") {'))
             l_in_set.append((' ' * cindent) + '} # end of list of \"set\" commands\n')
-            sys.stdout.write('\n')
-            sys.stdout.write((' ' * cindent) + '# list of \"set\" commands:\n')
-            sys.stdout.write('\n'.join(l_in_set))
+            out_file.write('\n')
+            out_file.write((' ' * cindent) + '# list of \"set\" commands:\n')
+            out_file.write('\n'.join(l_in_set))
 
         if len(l_in_set_static) > 0:
             l_in_set_static.insert(0, ((' ' * cindent) +
                                        'write_once(\"' + in_settings + '\") {'))
             l_in_set_static.append((' ' * cindent) + '} # end of list of (static) \"set\" commands\n')
-            sys.stdout.write('\n')
-            sys.stdout.write((' ' * cindent) + '# list of (static) \"set\" commands:\n')
-            sys.stdout.write('\n'.join(l_in_set_static))
+            out_file.write('\n')
+            out_file.write((' ' * cindent) + '# list of (static) \"set\" commands:\n')
+            out_file.write('\n'.join(l_in_set_static))
 
         if len(l_in_fix_rigid) > 0:
             no_warnings = False
             l_in_fix_rigid.insert(0, (' ' * cindent) +
                                   'write(\"' + in_settings + '\") {\n')
             l_in_fix_rigid.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_fix_rigid))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_fix_rigid))
             sys.stderr.write('WARNING: \"fix rigid\" style command(s) applied to selected atoms.\n'
                              '         Please make sure that the fix group(s) are defined correctly.\n'
                              '######################################################\n')
@@ -3519,8 +4092,8 @@ def main():
             l_in_fix_shake.insert(0, (' ' * cindent) +
                                   'write(\"' + in_settings + '\") {\n')
             l_in_fix_shake.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_fix_shake))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_fix_shake))
             sys.stderr.write('WARNING: \"fix shake\" style command(s) applied to selected atoms.\n'
                              '         Please check to make sure that the fix group(s) are defined correctly,\n'
 
@@ -3533,8 +4106,8 @@ def main():
             l_in_fix_poems.insert(0, (' ' * cindent) +
                                   'write(\"' + in_settings + '\") {\n')
             l_in_fix_poems.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_fix_poems))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_fix_poems))
             sys.stderr.write('WARNING: \"fix poems\" style command(s) applied to selected atoms.\n'
                              '         Please make sure that the fix group(s) are defined correctly.\n'
                              '######################################################\n')
@@ -3545,8 +4118,8 @@ def main():
             l_in_fix_qeq.insert(0, (' ' * cindent) +
                                 'write(\"' + in_settings + '\") {\n')
             l_in_fix_qeq.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_fix_qeq))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_fix_qeq))
             sys.stderr.write('WARNING: \"fix qeq\" style command(s) applied to selected atoms.\n'
                              '         Please make sure that the fix group(s) are defined correctly.\n'
                              '######################################################\n')
@@ -3557,15 +4130,15 @@ def main():
             l_in_fix_qmmm.insert(0, (' ' * cindent) +
                                  'write(\"' + in_settings + '\") {\n')
             l_in_fix_qmmm.append((' ' * cindent) + '}\n')
-            sys.stdout.write('\n')
-            sys.stdout.write(''.join(l_in_fix_qmmm))
+            out_file.write('\n')
+            out_file.write(''.join(l_in_fix_qmmm))
             sys.stderr.write('WARNING: \"fix qmmm\" style command(s) applied to selected atoms.\n'
                              '         Please make sure that the fix group(s) are defined correctly.\n'
                              '######################################################\n')
             assert(non_empty_output)
 
         if mol_name != '':
-            sys.stdout.write('\n} # end of \"' + mol_name + '\" type definition\n')
+            out_file.write('\n} # end of \"' + mol_name + '\" type definition\n')
 
         # if non_empty_output and no_warnings:
         if non_empty_output:
@@ -0,0 +1,569 @@
+#!/usr/bin/env python
+
+# Author: Andrew Jewett (jewett.aij at g mail)
+# License: 3-clause BSD License  (See LICENSE.TXT)
+# Copyright (c) 2026, Regents of the University of California
+# All rights reserved.
+
+"""
+   ltffdb.py compiles a force-field file (such as "oplsaa.lt") into an
+   indexed database (an SQLite file), and uses it to write a smaller version
+   of the force-field file which contains only the atom types (and the
+   bond, angle, dihedral, and improper types, and "By Type" rules) which
+   are actually needed by the molecules in your system.
+
+   Large force-field files (like "oplsaa.lt" or "gaff2.lt") define thousands
+   of atom types and many thousands of "By Type" rules, but a typical system
+   uses only a handful of them.  Moltemplate must read, and assign numbers to,
+   all of them anyway.  Importing the smaller file instead is much faster.
+   The simulation files are the same, except that the unused types are absent.
+
+   Every line which appears inside a write() or write_once() block in the
+   force-field file is stored in the database, together with a table of the
+   @atom, @bond, @angle, @dihedral, and @improper variables it refers to.
+   Text outside of these blocks (class definitions, comments, braces) is
+   always kept, so the new file has the same structure as the original.
+   A line is kept if all of the variables it refers to are used.
+   A "By Type" rule is kept if all of its atom (and bond) patterns
+   match at least one of the types in use.  (In that case the bond, angle,
+   dihedral, or improper type it generates is also counted as used.)
+   "replace{}" commands are kept for atom types which are in use.
+
+"""
+
+g_usage_msg = """
+Usage:
+
+   ltffdb.py -build forcefield.lt forcefield.ffdb
+
+   ltffdb.py forcefield.ffdb \\
+      [-atoms "type1 type2 ..."] \\
+      [file1.lt file2.lt ...] \\
+      > forcefield_subset.lt
+
+   The files following the database are scanned for @atom, @bond, @angle,
+   @dihedral, and @improper variables (files they import are also scanned).
+   (A force-field .lt file can be used in place of the database.  In that
+    case the database is built in memory.)
+
+"""
+
+import sys
+import os
+import re
+import sqlite3
+try:
+    from .ttree_lex import InputError, HasWildcard, MatchesPattern
+except (ImportError, SystemError, ValueError):
+    # not installed as a package
+    from ttree_lex import InputError, HasWildcard, MatchesPattern
+
+
+g_program_name = __file__.split('/')[-1]
+g_version_str = '0.1.0'
+g_date_str = '2026-10-18'
+
+# The categories of (static) variables which are tracked in the database:
+g_categories = ('atom', 'bond', 'angle', 'dihedral', 'improper')
+
+# "By Type" rules are processed in this order, so that (for example)
+# bond types generated by bond rules can be matched by angle rules.
+g_by_type_sections = (('bond', 'Data Bonds By Type'),
+                      ('angle', 'Data Angles By Type'),
+                      ('dihedral', 'Data Dihedrals By Type'),
+                      ('improper', 'Data Impropers By Type'))
+
+# Kinds of chunks of text stored in the "chunks" table:
+CHUNK_TEXT = 0     # text outside of write() blocks (always kept)
+CHUNK_LINE = 1     # a line inside a write() or write_once() block
+CHUNK_RULE = 2     # a line inside a "By Type" section
+CHUNK_REPLACE = 3  # a "replace{}" command
+
+# Kinds of variable references stored in the "refs" table:
+REF_EXACT = 0
+REF_WILDCARD = 1
+REF_REGEX = 2
+
+g_db_header = b'SQLite format 3\x00'
+
+g_schema = """
+CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE chunks (id INTEGER PRIMARY KEY,
+                     kind INTEGER,
+                     section TEXT,
+                     text TEXT);
+CREATE TABLE refs (chunk INTEGER,
+                   pos INTEGER,
+                   category TEXT,
+                   name TEXT,
+                   wild INTEGER);
+"""
+
+g_indices = """
+CREATE INDEX refs_chunk ON refs (chunk, pos);
+CREATE INDEX refs_name ON refs (category, name);
+CREATE INDEX chunks_kind ON chunks (kind);
+"""
+
+g_re_write = re.compile(r'\bwrite(_once)?\s*\(\s*("([^"]*)"|[^)]*)\s*\)\s*\{')
+g_re_replace = re.compile(r'^\s*replace\s*\{')
+g_re_var = re.compile(r'@\{([^}]*)\}|@([^\s@${}\\]+)')
+g_re_import = re.compile(r'^\s*(import|include)\s+"?([^"\s]+)"?')
+
+
+
+def StripComment(line):
+    """
+    Return the portion of a line preceeding the first (unescaped) '#'.
+    (Variables which appear in comments are ignored by moltemplate.)
+
+    """
+    i = 0
+    while i < len(line):
+        c = line[i]
+        if c == '\\':
+            i += 1
+        elif c == '#':
+            return line[:i]
+        i += 1
+    return line
+
+
+
+def ParseVarDescr(descr):
+    """
+    Split a variable descriptor (eg. "atom:80", or "atom:OPLSAA/80")
+    into a (category, name, wild) tuple.  Returns None if the variable does
+    not belong to one of the categories stored in the database.
+
+    """
+    ic = descr.find(':')
+    if ic == -1:
+        return None
+    category = descr[:ic].split('/')[-1]
+    if category not in g_categories:
+        return None
+    name = descr[ic + 1:]
+    if (len(name) > 1) and (name[0] == '/') and (name[-1] == '/'):
+        return category, name[1:-1], REF_REGEX
+    name = name.split('/')[-1]
+    if HasWildcard(name):
+        return category, name, REF_WILDCARD
+    return category, name, REF_EXACT
+
+
+
+def FindVars(line):
+    """
+    Return a list of (category, name, wild) tuples, one for each
+    @atom, @bond, @angle, @dihedral, or @improper variable in "line"
+    (in the order they appear).
+
+    """
+    refs = []
+    for m in g_re_var.finditer(StripComment(line)):
+        descr = m.group(1)
+        if descr is None:
+            descr = m.group(2)
+        ref = ParseVarDescr(descr)
+        if ref is not None:
+            refs.append(ref)
+    return refs
+
+
+
+def FindBlockEnd(text, pos):
+    """
+    Return the location of the '}' character which terminates the
+    write() block beginning at text[pos], or -1 if it was not found.
+    (Follows the rules used by ttree_lex.ReadTemplate(): '}' characters
+     which are escaped, or which enclose a variable name, as in "@{atom:C}",
+     do not terminate the block.)
+
+    """
+    i = pos
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c == '\\':
+            i += 2
+            continue
+        if ((c == '@') or (c == '$')) and (i + 1 < n) and (text[i + 1] == '{'):
+            depth = 1
+            i += 2
+            while (i < n) and (depth > 0):
+                if text[i] == '{':
+                    depth += 1
+                elif text[i] == '}':
+                    depth -= 1
+                i += 1
+            continue
+        if c == '}':
+            return i
+        i += 1
+    return -1
+
+
+
+def SplitForceField(text):
+    """
+    Divide the contents of a force-field file into a list of
+    (kind, section, text) tuples, one for each chunk of text.
+    Concatenating these chunks together reproduces the original file.
+
+    """
+    chunks = []
+    pos = 0
+    n = len(text)
+    while pos < n:
+        iend = text.find('\n', pos)
+        if iend == -1:
+            iend = n
+        else:
+            iend += 1
+        line = text[pos:iend]
+        m = g_re_write.search(StripComment(line))
+        if m is None:
+            if g_re_replace.match(line):
+                chunks.append((CHUNK_REPLACE, None, line))
+            else:
+                chunks.append((CHUNK_TEXT, None, line))
+            pos = iend
+            continue
+        # The beginning of a write() or write_once() block
+        section = m.group(3)
+        if section is None:
+            section = m.group(2).strip()
+        chunks.append((CHUNK_TEXT, None, line[:m.end()]))
+        body_begin = pos + m.end()
+        body_end = FindBlockEnd(text, body_begin)
+        if body_end == -1:
+            raise InputError('Error(' + g_program_name + '): Missing \"}\"'
+                             ' at the end of the write block \"' +
+                             section + '\"\n')
+        kind = CHUNK_LINE
+        for category, by_type_section in g_by_type_sections:
+            if section.find(by_type_section) == 0:
+                kind = CHUNK_RULE
+        body = text[body_begin:body_end]
+        for body_line in body.splitlines(True):
+            chunks.append((kind, section, body_line))
+        pos = body_end
+    return chunks
+
+
+
+def BuildDatabase(ff_filename, db_filename=':memory:'):
+    """
+    Read a force-field file and store its contents in a new database.
+    Returns the database connection.
+
+    """
+    if (db_filename != ':memory:') and os.path.exists(db_filename):
+        os.remove(db_filename)
+    conn = sqlite3.connect(db_filename)
+    conn.text_factory = str
+    conn.executescript(g_schema)
+    f = open(ff_filename, 'r')
+    text = f.read()
+    f.close()
+    chunks = SplitForceField(text)
+    refs = []
+    for i in range(0, len(chunks)):
+        kind, section, line = chunks[i]
+        if kind == CHUNK_TEXT:
+            continue
+        for pos, ref in enumerate(FindVars(line)):
+            refs.append((i, pos, ref[0], ref[1], ref[2]))
+    conn.executemany('INSERT INTO chunks VALUES (?,?,?,?)',
+                     [(i, chunks[i][0], chunks[i][1], chunks[i][2])
+                      for i in range(0, len(chunks))])
+    conn.executemany('INSERT INTO refs VALUES (?,?,?,?,?)', refs)
+    conn.executescript(g_indices)
+    conn.executemany('INSERT INTO info VALUES (?,?)',
+                     [('source', os.path.basename(ff_filename)),
+                      ('version', g_version_str)])
+    conn.commit()
+    return conn
+
+
+
+def OpenDatabase(filename):
+    """
+    Open a database created by BuildDatabase().  If "filename" is a
+    force-field (.lt) file instead, then build the database in memory.
+
+    """
+    if not os.path.exists(filename):
+        raise InputError('Error(' + g_program_name + '): File \"' +
+                         filename + '\" not found.\n')
+    f = open(filename, 'rb')
+    header = f.read(len(g_db_header))
+    f.close()
+    if header != g_db_header:
+        return BuildDatabase(filename)
+    conn = sqlite3.connect(filename)
+    conn.text_factory = str
+    return conn
+
+
+
+def FindFile(filename, search_dirs):
+    if os.path.isabs(filename):
+        if os.path.exists(filename):
+            return filename
+        return None
+    for d in search_dirs:
+        path = os.path.join(d, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+
+def ScanFiles(filenames, used, skip_basenames=None):
+    """
+    Add the names of all of the @atom, @bond, @angle, @dihedral,
+    and @improper variables which appear in these files (or in the files
+    they import) to "used" (a dictionary of sets, indexed by category).
+    Files whose names appear in "skip_basenames" are not read.
+
+    """
+    if skip_basenames is None:
+        skip_basenames = set([])
+    search_dirs = [os.getcwd()]
+    if 'MOLTEMPLATE_PATH' in os.environ:
+        search_dirs += os.environ['MOLTEMPLATE_PATH'].split(':')
+    search_dirs.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    'force_fields'))
+    visited = set([])
+    pending = list(filenames)
+    while len(pending) > 0:
+        filename = pending.pop(0)
+        path = os.path.abspath(filename)
+        if ((path in visited) or
+            (os.path.basename(path) in skip_basenames)):
+            continue
+        visited.add(path)
+        f = open(path, 'r')
+        for line in f:
+            for category, name, wild in FindVars(line):
+                if wild == REF_EXACT:
+                    used[category].add(name)
+            m = g_re_import.match(line)
+            if m:
+                import_name = m.group(2)
+                if os.path.basename(import_name) in skip_basenames:
+                    continue
+                found = FindFile(import_name,
+                                 [os.path.dirname(path)] + search_dirs)
+                if found is None:
+                    sys.stderr.write('WARNING(' + g_program_name + '): '
+                                     'unable to find imported file \"' +
+                                     import_name + '\"\n')
+                else:
+                    pending.append(found)
+        f.close()
+
+
+
+class PatternMatcher(object):
+    """
+    Decide whether a pattern from a "By Type" rule matches any of the
+    names in a (growing) set of names.  Results are cached, since the same
+    patterns appear in many rules.  (A name which was already matched stays
+    matched when more names are added, so only negative results need to be
+    re-checked, and only against the names added since then.)
+
+    """
+
+    def __init__(self, names):
+        self.names = []
+        self.name_set = set([])
+        self.cache = {}
+        self.AddNames(names)
+
+    def AddNames(self, names):
+        for name in names:
+            if name not in self.name_set:
+                self.name_set.add(name)
+                self.names.append(name)
+
+    def Matches(self, name, wild):
+        if wild == REF_EXACT:
+            return name in self.name_set
+        key = (name, wild)
+        found, num_checked = self.cache.get(key, (False, 0))
+        if found:
+            return True
+        if wild == REF_REGEX:
+            pattern = re.compile(name)
+        else:
+            pattern = name
+        for i in range(num_checked, len(self.names)):
+            if MatchesPattern(self.names[i], pattern):
+                found = True
+                break
+        self.cache[key] = (found, len(self.names))
+        return found
+
+
+
+def SelectChunks(conn, used):
+    """
+    Return the ids of the (non-TEXT) chunks which are needed by the
+    types in "used" (a dictionary of sets indexed by category).
+    "used" is updated to include types generated by "By Type" rules
+    and types related by "replace{}" commands.
+
+    """
+    keep = set([])
+    conn.execute('CREATE TEMP TABLE used (category TEXT, name TEXT, '
+                 'PRIMARY KEY (category, name))')
+
+    def AddUsed(category, names):
+        conn.executemany('INSERT OR IGNORE INTO used VALUES (?,?)',
+                         [(category, name) for name in names])
+        used[category].update(names)
+
+    for category in g_categories:
+        AddUsed(category, list(used[category]))
+
+    # "replace{}" commands (in either direction)
+    while True:
+        found = []
+        for ichunk, category, short_name, long_name in conn.execute(
+                'SELECT c.id, r1.category, r1.name, r2.name FROM chunks c '
+                'JOIN refs r1 ON r1.chunk = c.id AND r1.pos = 0 '
+                'JOIN refs r2 ON r2.chunk = c.id AND r2.pos = 1 '
+                'WHERE c.kind = ? AND (EXISTS '
+                '(SELECT 1 FROM used u WHERE u.category = r1.category '
+                'AND u.name = r1.name) OR EXISTS '
+                '(SELECT 1 FROM used u WHERE u.category = r2.category '
+                'AND u.name = r2.name))', (CHUNK_REPLACE,)):
+            if ichunk not in keep:
+                keep.add(ichunk)
+                found.append((category, short_name, long_name))
+        if len(found) == 0:
+            break
+        for category, short_name, long_name in found:
+            AddUsed(category, [short_name, long_name])
+
+    # "By Type" rules
+    matchers = dict([(category, PatternMatcher(used[category]))
+                     for category in g_categories])
+    rules = {}
+    for ichunk, section, pos, category, name, wild in conn.execute(
+            'SELECT c.id, c.section, r.pos, r.category, r.name, r.wild '
+            'FROM chunks c JOIN refs r ON r.chunk = c.id '
+            'WHERE c.kind = ? ORDER BY c.id, r.pos', (CHUNK_RULE,)):
+        if ichunk not in rules:
+            rules[ichunk] = (section, [])
+        rules[ichunk][1].append((category, name, wild))
+    for rule_category, by_type_section in g_by_type_sections:
+        generated = []
+        for ichunk in sorted(rules.keys()):
+            section, refs = rules[ichunk]
+            if ((section.find(by_type_section) != 0) or
+                (len(refs) == 0) or
+                (refs[0][0] != rule_category)):
+                continue
+            matches = True
+            for category, name, wild in refs[1:]:
+                if not matchers[category].Matches(name, wild):
+                    matches = False
+                    break
+            if matches:
+                keep.add(ichunk)
+                if refs[0][2] == REF_EXACT:
+                    generated.append(refs[0][1])
+        AddUsed(rule_category, generated)
+        matchers[rule_category].AddNames(generated)
+
+    # Ordinary lines: keep those whose (exact) references are all in use.
+    # (Lines which contain wildcards are checked afterwards.)
+    candidates = [row[0] for row in conn.execute(
+        'SELECT c.id FROM chunks c WHERE c.kind = ? AND NOT EXISTS '
+        '(SELECT 1 FROM refs r WHERE r.chunk = c.id AND r.wild = ? AND '
+        'NOT EXISTS (SELECT 1 FROM used u WHERE u.category = r.category '
+        'AND u.name = r.name))', (CHUNK_LINE, REF_EXACT))]
+    rejected = set([])
+    for ichunk, category, name, wild in conn.execute(
+            'SELECT r.chunk, r.category, r.name, r.wild FROM refs r '
+            'JOIN chunks c ON c.id = r.chunk '
+            'WHERE c.kind = ? AND r.wild != ?', (CHUNK_LINE, REF_EXACT)):
+        if not matchers[category].Matches(name, wild):
+            rejected.add(ichunk)
+    for ichunk in candidates:
+        if ichunk not in rejected:
+            keep.add(ichunk)
+    conn.execute('DROP TABLE used')
+    return keep
+
+
+
+def WriteSubset(conn, keep, out_file):
+    for ichunk, kind, text in conn.execute(
+            'SELECT id, kind, text FROM chunks ORDER BY id'):
+        if (kind == CHUNK_TEXT) or (ichunk in keep):
+            out_file.write(text)
+
+
+
+def main():
+    try:
+        sys.stderr.write(g_program_name + ' v' +
+                         g_version_str + ' ' + g_date_str + '\n')
+        argv = [arg for arg in sys.argv]
+        build = False
+        atom_names = []
+        filenames = []
+        i = 1
+        while i < len(argv):
+            if argv[i] == '-build':
+                build = True
+                del argv[i:i + 1]
+            elif argv[i] == '-atoms':
+                if i + 1 >= len(argv):
+                    raise InputError('Error(' + g_program_name + '): The ' +
+                                     argv[i] + ' flag should be followed by '
+                                     'a (quoted) list of atom type names.\n')
+                atom_names += argv[i + 1].split()
+                del argv[i:i + 2]
+            elif (argv[i][0] == '-') and (len(argv[i]) > 1):
+                raise InputError('Error(' + g_program_name + '):\n'
+                                 'Unrecogized command line argument \"' +
+                                 argv[i] + '\"\n\n' + g_usage_msg)
+            else:
+                filenames.append(argv[i])
+                i += 1
+
+        if build:
+            if len(filenames) != 2:
+                raise InputError('Error(' + g_program_name + '): The -build '
+                                 'flag expects 2 file names:\n' +
+                                 g_usage_msg)
+            BuildDatabase(filenames[0], filenames[1]).close()
+            return
+
+        if len(filenames) == 0:
+            raise InputError('Error(' + g_program_name + '): Missing '
+                             'database file name.\n' + g_usage_msg)
+        conn = OpenDatabase(filenames[0])
+        source = conn.execute('SELECT value FROM info '
+                              'WHERE key = \'source\'').fetchone()[0]
+        used = dict([(category, set([])) for category in g_categories])
+        used['atom'].update(atom_names)
+        ScanFiles(filenames[1:], used, set([source]))
+        keep = SelectChunks(conn, used)
+        WriteSubset(conn, keep, sys.stdout)
+        conn.close()
+
+    except (ValueError, InputError, sqlite3.Error) as err:
+        sys.stderr.write('\n' + str(err) + '\n')
+        sys.exit(-1)
+
+    return
+
+if __name__ == '__main__':
+    main()
@@ -93,8 +93,8 @@ if sys.version < '2.6':
 
 
 g_program_name = __file__.split('/')[-1]  # = 'lttree_check.py'
-g_version_str = '0.80.1'
-g_date_str = '2017-10-01'
+g_version_str = '0.80.2'
+g_date_str = '2026-10-18'
 
 
 # g_no_check_msg = \
@@ -2034,7 +2034,7 @@ def main():
         # has name '' (equivalent to '/')
         sys.stderr.write(g_program_name +
                          ':    parsing the class definitions...')
-        static_tree_root.Parse(settings.lex)
+        static_tree_root.Parse(settings.lex, lazy=settings.lazy_parse)
 
         sys.stderr.write(' done\n' + g_program_name +
                          ':    looking up classes...')
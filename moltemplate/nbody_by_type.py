@@ -138,8 +138,8 @@ Note: Optional "-prefix" and "-suffix" arguments can be included to decorate
 """
 
 g_program_name = __file__.split('/')[-1]  # = 'nbody_by_type.py'
-g_date_str = '2017-2-06'
-g_version_str = '0.20.0'
+g_date_str = '2026-10-18'
+g_version_str = '0.21.0'
 
 bond_pattern_module_name = ""
 
@@ -287,6 +287,18 @@ def GenInteractions_lines(lines_atoms,
     return lines_nbody_new
 
 
+def _ExtractSection(lines_data, section_name):
+    """
+    Return the lines of text in a section of a LAMMPS data file.
+    "lines_data" is either a list of lines, or a DataFileIndex object.
+    (Using a DataFileIndex avoids re-scanning the entire file each time.)
+
+    """
+    if isinstance(lines_data, DataFileIndex):
+        return [line for line in lines_data.Lines(section_name)]
+    return [line for line in ExtractDataSection(lines_data, section_name)]
+
+
 def GenInteractions_files(lines_data,
                           src_bond_pattern,
                           fname_atoms,
@@ -302,8 +314,7 @@ def GenInteractions_files(lines_data,
                           check_undefined=False):
 
     if fname_atoms == None:
-        lines_atoms = [
-            line for line in ExtractDataSection(lines_data, 'Atoms')]
+        lines_atoms = _ExtractSection(lines_data, 'Atoms')
     else:
         try:
             f = open(fname_atoms, 'r')
@@ -316,8 +327,7 @@ def GenInteractions_files(lines_data,
         f.close()
 
     if fname_bonds == None:
-        lines_bonds = [
-            line for line in ExtractDataSection(lines_data, 'Bonds')]
+        lines_bonds = _ExtractSection(lines_data, 'Bonds')
     else:
         try:
             f = open(fname_bonds, 'r')
@@ -330,8 +340,7 @@ def GenInteractions_files(lines_data,
         f.close()
 
     if fname_nbody == None:
-        lines_nbody = [line for line in ExtractDataSection(
-            lines_data, section_name)]
+        lines_nbody = _ExtractSection(lines_data, section_name)
     else:
         try:
             f = open(fname_nbody, 'r')
@@ -343,9 +352,7 @@ def GenInteractions_files(lines_data,
             lines_nbody = []
 
     if fname_nbodybytype == None:
-        lines_nbodybytype = [line for
-                             line in ExtractDataSection(lines_data,
-                                                        section_name_bytype)]
+        lines_nbodybytype = _ExtractSection(lines_data, section_name_bytype)
 
     else:
         try:
@@ -593,7 +600,11 @@ def main():
             lines_data = []
         else:
             output_full_DATA_file = True
-            lines_data = sys.stdin.readlines()
+            # Scan the data file only once.  (Afterwards, the "Atoms", "Bonds",
+            # and "By Type" sections can be read directly from the index.)
+            lines_data = DataFileIndex(sys.stdin,
+                                       section_names=[section_name,
+                                                      section_name_bytype])
 
         # Calculate the interactions and generate a list of lines of text
 
@@ -631,58 +642,64 @@ def main():
             # section, and adding the generated lines of text to the
             # corresponding
 
-            # If present, update the interaction counter at the beginning
-            # of the LAMMPS data file.  (For example, if if 100 new "Angles"
-            # interactions were generated, replace "2 Angles" with "102 Angles")
-            #
-            for i in range(0, len(lines_data)):
-                line = lines_data[i].strip()
-                tokens = SplitQuotedString(line)
-
-                # updating the interaction counter
-                if ((len(tokens) == 2) and (tokens[1] == (section_name).lower())):
-                    tokens[0] = str(int(tokens[0]) +
-                                    len(lines_new_interactions))
-                    lines_data[i] = ' '.join(tokens) + '\n'
-
-                # stop when you come to a section header
-                elif line in lammps_data_sections:
-                    #"lammps_data_sections" is defined in "extract_lammps_data.py"
-                    break
+            index = lines_data
 
             # locate the appropriate section of the data file
             # (storing the type of interactions we just created)
-            i_nbody_a, i_nbody_b = \
-                FindDataSection(lines_data, section_name)
-
-            if i_nbody_a == -1:
-                if len(lines_new_interactions) > 0:
-                    # If not found, create a new section at the end of the file,
-                    # containing a section name followed by the list of lines
-                    lines_data += ['\n', section_name + '\n', '\n'] + \
-                        lines_new_interactions + ['\n']
+            sections_nbody = index.Find(section_name)
+            if len(sections_nbody) > 0:
+                i_nbody_b = sections_nbody[0].i_end
             else:
-                # Insert the new lines into the existing section
-                lines_data[i_nbody_b:i_nbody_b] = lines_new_interactions
+                i_nbody_b = -1
 
             # Figure out where the "By Type" section is located
-            # (so we skip over it)
-            i_bytype_a, i_bytype_b = \
-                FindDataSection(lines_data, section_name_bytype)
-
-            in_bytype_section = False
-            for i in range(0, len(lines_data)):
-                line = lines_data[i].strip()
-                # Omit all lines of text in the 'By Type' section (including the
-                # header and commments or blank lines which immediately follow
-                # it.)
-                if line == section_name_bytype:
-                    in_bytype_section = True
-                elif i == i_bytype_b:
-                    in_bytype_section = False
-
+            # (so we skip over it).  Omit all lines of text in the 'By Type'
+            # section (including the header and commments or blank lines
+            # which immediately follow it.)
+            bytype_ranges = [(section.i_header, section.i_extent)
+                             for section in index.Find(section_name_bytype)]
+
+            i = 0
+            for line in index.AllLines():
+                if i < index.i_header_end:
+                    # If present, update the interaction counter at the
+                    # beginning of the LAMMPS data file.  (For example, if if
+                    # 100 new "Angles" interactions were generated, replace
+                    # "2 Angles" with "102 Angles")
+                    tokens = SplitQuotedString(line.strip())
+                    if ((len(tokens) == 2) and
+                            (tokens[1] == (section_name).lower())):
+                        tokens[0] = str(int(tokens[0]) +
+                                        len(lines_new_interactions))
+                        line = ' '.join(tokens) + '\n'
+
+                if i == i_nbody_b:
+                    # Insert the new lines into the existing section
+                    for line_new in lines_new_interactions:
+                        sys.stdout.write(line_new)
+
+                in_bytype_section = False
+                for i_a, i_b in bytype_ranges:
+                    if i_a <= i < i_b:
+                        in_bytype_section = True
                 if not in_bytype_section:
-                    sys.stdout.write(lines_data[i])
+                    sys.stdout.write(line)
+                i += 1
+
+            if i == i_nbody_b:
+                # (The section was located at the end of the file.)
+                for line_new in lines_new_interactions:
+                    sys.stdout.write(line_new)
+
+            elif ((i_nbody_b == -1) and (len(lines_new_interactions) > 0)):
+                # If not found, create a new section at the end of the file,
+                # containing a section name followed by the list of lines
+                sys.stdout.write('\n' + section_name + '\n\n')
+                for line_new in lines_new_interactions:
+                    sys.stdout.write(line_new)
+                sys.stdout.write('\n')
+
+            index.close()
 
     except (ValueError, InputError) as err:
         sys.stderr.write('\n' + str(err) + '\n')
@@ -40,6 +40,24 @@ awk 'BEGIN{found=0;passed=0} {if(substr($0,0,8)=="$/angle") found=1;
 I wrote this python script (instead of using awk) just to handle quoted stings
 (and strings with other fancy characters and escape sequences).
 
+
+   Updating several categories at once
+
+Several categories can be repaired in a single pass by supplying more than
+one pair of arguments:
+
+nbody_fix_ttree_assignments.py "/angle" gen_angles.template \
+                               "/dihedral" gen_dihedrals.template \
+                               "/improper" gen_impropers.template \
+  < ttree_assignments.txt > ttree_assigmnents_new.txt
+
+This is equivalent to (but much faster than) invoking this program once for
+each category.  The ttree_assignments.txt file is read only once, and it is
+never stored in memory.  Lines which do not belong to one of these categories
+are copied to the output verbatim (as raw bytes), without being tokenized.
+(Categories which are not present in ttree_assignments.txt are appended to
+ the end of the file, in the order they appear in the argument list.)
+
 """
 
 import sys
@@ -53,104 +71,179 @@ except (SystemError, ValueError):
 g_program_name = __file__.split('/')[-1]
 
 
+if sys.version > '3':
+    # Read and write raw bytes so that the lines we do not modify are copied
+    # verbatim.  (The few lines we do need to parse are decoded using latin-1
+    # which maps each byte to one character, so this does not alter them.)
+    def _BinaryStream(f):
+        return f.buffer
+
+    def _Decode(b):
+        return b.decode('latin-1')
+
+    def _Encode(s):
+        return s.encode('latin-1')
+else:
+    def _BinaryStream(f):
+        return f
+
+    def _Decode(b):
+        return b
+
+    def _Encode(s):
+        return s
+
+
+def _Tokenize(line):
+    """
+    Equivalent to SplitQuotedString(line.strip()), but faster for typical
+    lines (which lack quotes, escape sequences and comments).
+
+    """
+    line = line.strip()
+    if (('"' in line) or ('\'' in line) or ('\\' in line) or ('#' in line)):
+        return SplitQuotedString(line)  # strip comments, handle quotes
+    return line.split()
+
+
+def _WriteGenerated(out, fname_generated, new_counter):
+    """
+    Write the first column of every non-blank line in the file of generated
+    interactions (fname_generated), followed by a counter.
+    Returns the next (unused) value of the counter.
+
+    """
+    f = open(fname_generated, 'rb')
+    for line_orig in f:
+        tokens = _Tokenize(_Decode(line_orig))
+        if len(tokens) > 0:
+            out.write(_Encode(tokens[0] + '  ' + str(new_counter) + '\n'))
+            new_counter += 1
+    f.close()
+    return new_counter
+
+
+def _WritePreexisting(out, var_names, new_counter):
+    """
+    Write the names of the pre-existing variables of this category, and
+    assign them to higher numbers.  (Hopefully this helps to make sure that
+    these assignments will override any of the automatic/generated ones.)
+    Returns the next (unused) value of the counter.
+
+    """
+    for var_name in var_names:
+        out.write(_Encode(var_name + '  ' + str(new_counter) + '\n'))
+        new_counter += 1
+    return new_counter
+
+
+def FixTtreeAssignments(cat_names,
+                        fnames_generated,
+                        in_stream,
+                        out):
+    """
+    Read the contents of a ttree_assignments.txt file from "in_stream" (a file
+    opened in binary mode) and write a modified version to "out".
+    For each category, cat_names[c], the variables in that category are
+    replaced by the first column of the lines in the file fnames_generated[c]
+    (followed by the original variables, which are renumbered accordingly).
+    As with any ttree_assignment.txt file:
+      The first column has our generated variable names
+      The second column has the counter assigned to that variable
+
+    """
+    assert(len(cat_names) == len(fnames_generated))
+
+    # Which lines in the 'ttree_assignments.txt' file contain the variables
+    # of the type you are looking for?
+    cat_name2c = {}
+    for c in range(0, len(cat_names)):
+        cat_name = cat_names[c]
+        for prefix in ('$', '$/', '${', '${/'):
+            cat_name2c[prefix + cat_name] = c
+    # (Only lines beginning with '$' can contain these variables.
+    #  Any other line can be copied to the output without parsing it.)
+    dollar = _Encode('$')
+
+    new_counters = [None for c in range(0, len(cat_names))]
+    c_cur = None       # <-- the category of the section we are currently in
+    var_names_cur = []  # <-- the (pre-existing) variables in that section
+
+    for line_orig in in_stream:
+        if (c_cur is None) and (not line_orig.lstrip().startswith(dollar)):
+            out.write(line_orig)
+            continue
+
+        tokens = _Tokenize(_Decode(line_orig))
+        if len(tokens) != 2:
+            # Lines which do not contain 2 columns (such as blank lines, or
+            # lines with comments) do not begin or end a section.
+            # They are discarded if they appear within a section.
+            if c_cur is None:
+                out.write(line_orig)
+            continue
+
+        before_colon = tokens[0].split(':')[0]
+        c = cat_name2c.get(before_colon)
+        if c != c_cur:
+            if c_cur is not None:
+                # We have reached the end of the current section
+                new_counters[c_cur] = _WritePreexisting(out,
+                                                        var_names_cur,
+                                                        new_counters[c_cur])
+                var_names_cur = []
+            c_cur = c
+            if (c_cur is not None) and (new_counters[c_cur] is None):
+                sys.stderr.write('  (adding new lines for \"' +
+                                 cat_names[c_cur] + '\")\n')
+                new_counters[c_cur] = _WriteGenerated(out,
+                                                      fnames_generated[c_cur],
+                                                      1)
+                sys.stderr.write('  (adding pre-exisiting lines)\n')
+            # Note: If the variables from one category were scattered in
+            #       multiple places in the file, the variables in the later
+            #       sections are renumbered in place (using the same counter).
+
+        if c_cur is None:
+            out.write(line_orig)
+        else:
+            var_names_cur.append(tokens[0])
+
+    if c_cur is not None:
+        new_counters[c_cur] = _WritePreexisting(out,
+                                                var_names_cur,
+                                                new_counters[c_cur])
+
+    # Categories which did not appear in the file are added to the end.
+    for c in range(0, len(cat_names)):
+        if new_counters[c] is None:
+            sys.stderr.write('  (adding new lines for \"' +
+                             cat_names[c] + '\")\n')
+            new_counters[c] = _WriteGenerated(out, fnames_generated[c], 1)
+
+
 def main():
     try:
-        if (len(sys.argv) != 3):
+        if ((len(sys.argv) < 3) or (len(sys.argv) % 2 != 1)):
             raise InputError('Error running  \"' + g_program_name + '\"\n'
                              '   Wrong number of arguments.\n'
                              '   (This is likely a programmer error.\n'
                              '    This script was not intended to be run by end users.)\n')
 
-        cat_name = sys.argv[1]
-        f = open(sys.argv[2])
-        lines_generated = f.readlines()
-        f.close()
-
-        # Selections are simply lists of 2-tuples (pairs)
-        #f = open('ttree_assignments.txt','r')
-        #lines_bindings = f.readlines()
-        # f.close()
-        lines_bindings = sys.stdin.readlines()
-
-        # Figure out which lines in the 'ttree_assignments.txt' file
-        # contain the variables of the type you are looking for.
-        # Make note of the relevant line numbers
-        i_preexisting_begin = -1
-        i_preexisting_end = -1
-        in_section = False
-        possible_cat_names = set(
-            ['$' + cat_name, '$/' + cat_name, '${' + cat_name, '${/' + cat_name])
-
-        preexisting_interaction_list = []
-        for i in range(0, len(lines_bindings)):
-            line = lines_bindings[i].strip()
-            tokens = SplitQuotedString(line)  # strip comments, handle quotes
-            if len(tokens) == 2:
-                before_colon = tokens[0].split(':')[0]
-                if before_colon in possible_cat_names:
-                    if i_preexisting_begin == -1:
-                        i_preexisting_begin = i
-                        in_section = True
-                else:
-                    if in_section:
-                        i_preexisting_end = i
-                    in_section = False
-
-        if i_preexisting_end == -1:
-            i_preexisting_end = len(lines_bindings)
-
-        if i_preexisting_begin == -1:
-            for line in lines_bindings:
-                sys.stdout.write(line)
-        else:
-            # write out all the lines in the original file up until the point where
-            # the variables in the category we are looking for were encountered
-            for i in range(0, i_preexisting_begin):
-                sys.stdout.write(lines_bindings[i])
-
-        sys.stderr.write('  (adding new lines)\n')
-
-        # Now add some new lines (2-column format).
-        # As with any ttree_assignment.txt file:
-        #   The first column has our generated variable names
-        #   The second column has the counter assigned to that variable
-        new_counter = 1
-        for line_orig in lines_generated:
-            line = line_orig.strip()
-            if len(line) > 0:
-                tokens = SplitQuotedString(line)  # strip comments, handle quotes
-                sys.stdout.write(tokens[0] + '  ' + str(new_counter) + '\n')
-                new_counter += 1
-
-        sys.stderr.write('  (adding pre-exisiting lines)\n')
-        if i_preexisting_begin != -1:
-            # Append the original pre-existing interactions of that type, but assign
-            # them to higher numbers.  (Hopefully this helps to make sure that these
-            # assignments will override any of the automatic/generated assignments.)
-            # As with any ttree_assignment.txt file:
-            #   The first column has our generated variable names
-            #   The second column has the counter assigned to that variable
-
-            # sys.stderr.write('  i_preexisting_begin='+
-            #                 str(i_preexisting_begin)+
-            #                 ' i_preexisting_end='+str(i_preexisting_end)+'\n')
-
-            for i in range(i_preexisting_begin, i_preexisting_end):
-                line = lines_bindings[i].strip()
-                tokens = SplitQuotedString(line)  # strip comments, handle quotes
-                if len(tokens) == 2:
-                    sys.stdout.write(tokens[0] + '  ' + str(new_counter) + '\n')
-                    new_counter += 1
-
-            #sys.stderr.write('  (writing pre-exisiting lines)\n')
-
-            # write out all the lines in the original file after this point.
-            for i in range(i_preexisting_end, len(lines_bindings)):
-                sys.stdout.write(lines_bindings[i])
-
+        cat_names = sys.argv[1::2]
+        fnames_generated = sys.argv[2::2]
+        if len(set(cat_names)) != len(cat_names):
+            raise InputError('Error running  \"' + g_program_name + '\"\n'
+                             '   The same category appears more than once in the argument list.\n')
+
+        out = _BinaryStream(sys.stdout)
+        FixTtreeAssignments(cat_names,
+                            fnames_generated,
+                            _BinaryStream(sys.stdin),
+                            out)
+        out.flush()
         sys.exit(0)
 
-
     except (ValueError, InputError) as err:
         sys.stderr.write('\n' + str(err) + '\n')
         sys.exit(-1)
@@ -21,12 +21,33 @@
 
 import sys
 
-def main():
-    lines_orig = []
-    f = None
-    fname = None
-    num_lines_ignore = 0
 
+def LogicalLines(in_streams):
+    """
+    Read the lines from a sequence of files, one line at a time.
+    Lines ending in '&' are merged with the line which follows.
+    Generates tuples containing: (the merged text, the index of the file
+    containing the final line of text, the line number of that line).
+    Only one logical line is stored in memory at any given time.
+
+    """
+    pieces = []
+    i_stream = 0
+    lineno = 0
+    for i_stream in range(0, len(in_streams)):
+        lineno = 0
+        for line in in_streams[i_stream]:
+            lineno += 1
+            pieces.append(line)
+            if line[-2:] != '&\n':
+                yield ''.join(pieces), i_stream, lineno
+                pieces = []
+    if len(pieces) > 0:
+        yield ''.join(pieces), i_stream, lineno
+
+
+def main():
+    in_streams = []
 
     # Lines from files passed as arguments are read and processed silently.
     # (Why? Sometimes it's necessary to read the contents of previous input scripts
@@ -36,33 +57,25 @@ def main():
     #  I'm too lazy to read the "include" commands in input scripts correctly.)
     if len(sys.argv) > 1:
         for fname in sys.argv[1:]:
-            f = open(fname, 'r')
-            in_stream = f
-            lines_orig += in_stream.readlines()
-            num_lines_ignore += len(lines_orig)
-            f.close()
-
+            in_streams.append(open(fname, 'r'))
 
     # Lines read from the standard input are read, processed, and printed to stdout
-    in_stream = sys.stdin
-    lines_orig += in_stream.readlines()
+    in_streams.append(sys.stdin)
+    i_stdin = len(in_streams) - 1
 
     pair_style_list = []
     swap_occured = False
     warn_wildcard = False
 
-    i = 0
-    while i < len(lines_orig):
-        # Read the next logical line
-        # Any lines ending in '&' should be merged with the next line before
-        # breaking
-        line_orig = ''
-        while i < len(lines_orig):
-            line_counter = 1 + i - num_lines_ignore
-            line_orig += lines_orig[i]
-            if ((len(line_orig) < 2) or (line_orig[-2:] != '&\n')):
-                break
-            i += 1
+    for line_orig, i_stream, line_counter in LogicalLines(in_streams):
+        print_line = (i_stream == i_stdin)
+
+        # Only "pair_style" and "pair_coeff" commands are of interest here.
+        if 'pair_' not in line_orig:
+            if print_line:
+                sys.stdout.write(line_orig)
+            continue
+
         line = line_orig.replace('&\n', '\n').rstrip('\n')
 
         comment = ''
@@ -86,7 +99,7 @@ def main():
                 tokens[2] = tokens[1]
                 tokens[1] = tmp
 
-                if i >= num_lines_ignore:
+                if print_line:
 
                     # polite warning:
                     sys.stderr.write(
@@ -133,13 +146,14 @@ def main():
                     and
                     (not (('*' == tokens[1]) and ('*' == tokens[2])))):
                     warn_wildcard = True
-                if i >= num_lines_ignore:
+                if print_line:
                     sys.stdout.write(line_orig)
         else:
-            if i >= num_lines_ignore:
+            if print_line:
                 sys.stdout.write(line_orig)
 
-        i += 1
+    for in_stream in in_streams[:i_stdin]:
+        in_stream.close()
 
 
     if swap_occured:
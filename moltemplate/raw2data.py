@@ -12,8 +12,92 @@ except:
     from extract_lammps_data import lammps_data_sections
 
 g_program_name = 'raw2data.py'
-g_date_str = '2016-12-21'
-g_version_str = 'v0.44.0'
+g_date_str = '2026-10-18'
+g_version_str = 'v0.46.0'
+
+
+class RawFrameLines(object):
+    """
+    Iterate over the (non-blank) lines of one frame of a "raw" coordinate
+    file, beginning with "first_line".  Frames are separated by blank lines.
+    Afterwards, "line" stores the first line following the frame
+    (either a blank line, or '' at the end of the file).
+
+    """
+
+    def __init__(self, first_line, in_coord_file):
+        self.line = first_line
+        self.in_coord_file = in_coord_file
+
+    def __iter__(self):
+        readline = self.in_coord_file.readline
+        line = self.line
+        while line.strip() != '':
+            yield line
+            line = readline()
+        self.line = line
+
+
+def PasteRawFrameIntoData(out_file,
+                          data_settings,
+                          frame_lines,
+                          natoms):
+    """
+    Write a copy of the data file to out_file, replacing the coordinates
+    of the first "natoms" lines in the "Atoms" section with the coordinates
+    from "frame_lines" (in the same order, one atom per line).
+    The coordinates are read from frame_lines as they are needed, so
+    they are never stored in memory.  The lines of text which are written
+    are otherwise identical to those written by WriteFrameToData().
+
+    """
+    i_x = data_settings.i_coords[0]
+    i_y = data_settings.i_coords[1]
+    i_z = data_settings.i_coords[2]
+    i_max = max(i_x, i_y, i_z)
+    crd_lines = iter(frame_lines)
+    n_crds = 0
+    section = ''
+    for line in data_settings.contents:
+        ic = line.find('#')
+        if ic != -1:
+            line = line[:ic]
+        line = line.strip()
+        if line in g_data_section_names:
+            section = line
+        elif (section == 'Atoms') and (line != '') and (n_crds < natoms):
+            xyz = next(crd_lines, None)
+            if xyz is None:
+                raise InputError('Error(' + g_program_name + '): The coordinate file contains ' +
+                                 str(n_crds) + ' atoms, but the\n'
+                                 '       "Atoms" section of the data file contains ' +
+                                 str(natoms) + ' atoms.\n')
+            n_crds += 1
+            xyz = xyz.split()
+            if len(xyz) < 3:
+                raise InputError('Error(' + g_program_name + '): Each line of the coordinate file must contain\n'
+                                 '       (at least) 3 numbers.  Offending line:\n'
+                                 '       \"' + ' '.join(xyz) + '\"\n')
+            tokens = line.split()
+            if i_max >= len(tokens):
+                raise InputError('Error(dump2data): Atom style incompatible with data file.\n'
+                                 '       Specify the atom_style using -atomstyle style.\n')
+            tokens[i_x] = xyz[0]
+            tokens[i_y] = xyz[1]
+            tokens[i_z] = xyz[2]
+            line = ' '.join(tokens)
+        out_file.write(line + '\n')
+
+    if n_crds < natoms:
+        raise InputError('Error(' + g_program_name + '): The coordinate file contains ' +
+                         str(n_crds) + ' atoms, but the\n'
+                         '       "Atoms" section of the data file contains ' +
+                         str(natoms) + ' atoms.\n')
+    if next(crd_lines, None) is not None:
+        raise InputError('Error(' + g_program_name + '): The coordinate file contains more atoms\n'
+                         '       than the "Atoms" section of the data file (' +
+                         str(natoms) + ').\n')
+
 
     #######  Main Code Below: #######
 def main():
@@ -34,7 +118,7 @@ def main():
             if argv[i].lower() == '-ignore-atom-id':
                 sort_data_file_by_atom_id = True
                 del argv[i:i+1]
-            if argv[i].lower() == '-sort':
+            elif argv[i].lower() == '-sort':
                 sort_data_file_by_atom_id = False
                 del argv[i:i+1]
             else:
@@ -83,57 +167,25 @@ def main():
                     if num_blank_lines > 1:
                         in_atoms_section = False
 
-        frame_coords = defaultdict(list)
-        frame_coords_ixiyiz = defaultdict(list)
-        frame_vects = defaultdict(list)
-        frame_velocities = defaultdict(list)
-        frame_xlo_str = frame_xhi_str = None
-        frame_ylo_str = frame_yhi_str = None
-        frame_zlo_str = frame_zhi_str = None
-        frame_xy_str = frame_xz_str = frame_yz_str = None
-        frame_natoms = -1
-        frame_timestep_str = ''
-        i_atomid = i_atomtype = i_molid = -1
-        i_x = i_y = i_z = i_xu = i_yu = i_zu = -1
-        i_xs = i_ys = i_zs = i_xsu = i_ysu = i_zsu = -1
-
-        dump_column_names = []
-
-        #num_frames_in = -1
-        num_frames_out = 0
-        finished_reading_frame = False
-        read_last_frame = False
-
-        in_coord_file = sys.stdin
+        in_coord_file = OpenCoordFile()
         #in_coord_file = open('tmp_atom_coords.dat','r')
 
-        read_last_frame = False
-        while True:
+        if misc_settings.multi:
+            out_file = None
+        else:
+            out_file = sys.stdout
+        num_frames_out = 0
 
-            line = '\n'
+        line = '\n'
+        while True:
+            # Skip over any blank line(s) separating this frame from the
+            # previous frame (or at the beginning of the file).
             while (line != '') and (line.strip() == ''):
                 line = in_coord_file.readline()
 
             if line == '':  # if EOF
                 break
 
-            #frame_vects = defaultdict(list)
-            frame_coords = defaultdict(list)
-            while line.strip() != '':
-                n_crds = len(frame_coords)
-                #sys.stdout.write("n_crds="+str(n_crds)+": \""+line.strip()+"\"\n")
-                frame_coords[frame_atom_order[n_crds]] = line.split()
-                #frame_vects[frame_atom_order[n_crds]] = ['0.0','0.0','0.0']
-                line = in_coord_file.readline()
-
-            # Check to see if there are any blank lines at this location in the file
-            # If there are, it means we are at a new "frame" (in the trajectory).
-            # Skip over any blank line(s) separating this frame from the next frame
-            # so that the next time we enter the loop, we are at the beginning
-            # of a new frame.
-            while (line != '') and (line.strip() == ''):
-                line = in_coord_file.readline()
-
             # Parse the DATA file specified by the user
             # and replace appropriate lines or fields with
             # the corresponding text from the input file.
@@ -142,25 +194,52 @@ def main():
                     + str(num_frames_out)
                 sys.stderr.write('  (creating file \"' + out_file_name + '\")\n')
                 out_file = open(out_file_name, 'w')
+
+            frame_lines = RawFrameLines(line, in_coord_file)
+            if sort_data_file_by_atom_id:
+                # The coordinates are pasted into the "Atoms" section in
+                # the same order they appear in the coordinate file, so
+                # there is no need to store them (or the atom-IDs).
+                # Stream them directly into the new data file instead.
+                PasteRawFrameIntoData(out_file,
+                                      data_settings,
+                                      frame_lines,
+                                      len(frame_atom_order))
             else:
-                out_file = sys.stdout
-
-            WriteFrameToData(out_file,
-                             None,
-                             misc_settings,
-                             data_settings,
-                             None,
-                             frame_natoms,
-                             frame_coords,
-                             frame_coords_ixiyiz,
-                             frame_vects,
-                             frame_velocities,
-                             None,
-                             None,
-                             frame_xlo_str, frame_xhi_str,
-                             frame_ylo_str, frame_yhi_str,
-                             frame_zlo_str, frame_zhi_str,
-                             frame_xy_str, frame_xz_str, frame_yz_str)
+                frame_coords = {}
+                for line in frame_lines:
+                    if len(frame_coords) == len(frame_atom_order):
+                        raise InputError('Error(' + g_program_name + '): The coordinate file contains more atoms\n'
+                                         '       than the "Atoms" section of the data file (' +
+                                         str(len(frame_atom_order)) + ').\n')
+                    frame_coords[frame_atom_order[len(frame_coords)]] = \
+                        line.split()
+                if len(frame_coords) != len(frame_atom_order):
+                    raise InputError('Error(' + g_program_name + '): The coordinate file contains ' +
+                                     str(len(frame_coords)) + ' atoms, but the\n'
+                                     '       "Atoms" section of the data file contains ' +
+                                     str(len(frame_atom_order)) + ' atoms.\n')
+                WriteFrameToData(out_file,
+                                 None,
+                                 misc_settings,
+                                 data_settings,
+                                 None,
+                                 -1,
+                                 frame_coords,
+                                 defaultdict(list),
+                                 {},
+                                 {},
+                                 None,
+                                 None,
+                                 None, None,
+                                 None, None,
+                                 None, None,
+                                 None, None, None)
+            line = frame_lines.line  # (the line following this frame)
+
+            if misc_settings.multi:
+                out_file.close()
+            num_frames_out += 1
 
     except (ValueError, InputError) as err:
         sys.stderr.write('\n' + str(err) + '\n')
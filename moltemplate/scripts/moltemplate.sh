@@ -303,6 +303,12 @@ Optional arguments:
                commands to obey standard naming conventions.  The "-nocheck"
                argument bypasses these checks and eliminates these restrictions.
 
+-lazy-parse    Skip over the definitions of classes which are never used
+               (instantiated, inherited, or used as a namespace).  This is
+               faster when importing large files containing many classes.
+               (Note: write_once() commands and @variables which appear only
+                inside these unused classes are ignored.)
+
 -checkff       This cause moltemplate.sh to check to make sure that there
                are valid angle and dihedral interactions defined for every
                3 or 4 consecutively bonded atoms in the system
@@ -952,6 +958,8 @@ fi
 
 
 
+rm -f gen_angles_all.template.tmp gen_dihedrals_all.template.tmp gen_impropers_all.template.tmp
+
 FILE_angles_by_type1=""
 FILE_angles_by_type2=""
 #for FILE in "$data_angles_by_type"*.template; do
@@ -1021,35 +1029,14 @@ for FILE in `ls -v "$data_angles_by_type"*.template 2> /dev/null`; do
     fi
     mv -f new_angles.template.tmp "${data_angles}.template"
 
-    echo "(Repairing ttree_assignments.txt file after angles added.)" >&2
-
-    # ---- Repair the ttree_assignments.txt file ----
-    # The next 2 lines extract the variable names from data_new.template.tmp
-    # and instert them into the appropriate place in ttree_assignments.txt
-    # (renumbering the relevant variable-assignments to avoid clashes).
-    if ! $PYTHON_COMMAND "${PY_SCR_DIR}/nbody_fix_ttree_assignments.py" \
-          '/angle' gen_angles.template.tmp \
-          < ttree_assignments.txt \
-          > ttree_assignments.tmp; then
-        exit 5
-    fi
-
-    echo "(Rendering ttree_assignments.tmp file after angles added.)" >&2
-
-    # ---- Re-build (render) the "$data_angles" file ----
-    # Now substitute these variable values (assignments) into the variable
-    # names present in the .template file.  (We want to convert the file from
-    # a .template format into an ordinary (numeric) LAMMPS data-section format.)
-    if ! $PYTHON_COMMAND "${PY_SCR_DIR}/ttree_render.py" \
-           ttree_assignments.tmp \
-           < "${data_angles}.template" \
-           > "$data_angles"; then
-        exit 6
+    # Keep track of all of the newly generated interactions (newest first).
+    # (The "ttree_assignments.txt" file is repaired for all of these
+    #  interactions at once, after the impropers have been generated.)
+    if [ -e gen_angles_all.template.tmp ]; then
+        cat gen_angles_all.template.tmp >> gen_angles.template.tmp
     fi
-    echo "" >&2
-
-    mv -f ttree_assignments.tmp ttree_assignments.txt
-    rm -f gen_angles.template.tmp new_angles.template.tmp
+    mv -f gen_angles.template.tmp gen_angles_all.template.tmp
+    rm -f new_angles.template.tmp
 done
 IFS="$IFS_BACKUP"
 
@@ -1127,35 +1114,14 @@ for FILE in `ls -v "$data_dihedrals_by_type"*.template 2> /dev/null`; do
     fi
     mv -f new_dihedrals.template.tmp "${data_dihedrals}.template"
 
-    echo "(Repairing ttree_assignments.txt file after dihedrals added.)" >&2
-
-    # ---- Repair the ttree_assignments.txt file ----
-    # The next 2 lines extract the variable names from data_new.template.tmp
-    # and instert them into the appropriate place in ttree_assignments.txt
-    # (renumbering the relevant variable-assignments to avoid clashes).
-    if ! $PYTHON_COMMAND "${PY_SCR_DIR}/nbody_fix_ttree_assignments.py" \
-          '/dihedral' gen_dihedrals.template.tmp \
-          < ttree_assignments.txt \
-          > ttree_assignments.tmp; then
-        exit 5
-    fi
-
-    echo "(Rendering ttree_assignments.tmp file after dihedrals added.)" >&2
-
-    # ---- Re-build (render) the "$data_dihedrals" file ----
-    # Now substitute these variable values (assignments) into the variable
-    # names present in the .template file.  (We want to convert the file from
-    # a .template format into an ordinary (numeric) LAMMPS data-section format.)
-    if ! $PYTHON_COMMAND "${PY_SCR_DIR}/ttree_render.py" \
-           ttree_assignments.tmp \
-           < "${data_dihedrals}.template" \
-           > "$data_dihedrals"; then
-        exit 6
+    # Keep track of all of the newly generated interactions (newest first).
+    # (The "ttree_assignments.txt" file is repaired for all of these
+    #  interactions at once, after the impropers have been generated.)
+    if [ -e gen_dihedrals_all.template.tmp ]; then
+        cat gen_dihedrals_all.template.tmp >> gen_dihedrals.template.tmp
     fi
-    echo "" >&2
-
-    mv -f ttree_assignments.tmp ttree_assignments.txt
-    rm -f gen_dihedrals.template.tmp new_dihedrals.template.tmp
+    mv -f gen_dihedrals.template.tmp gen_dihedrals_all.template.tmp
+    rm -f new_dihedrals.template.tmp
 done
 IFS="$IFS_BACKUP"
 
@@ -1231,37 +1197,84 @@ for FILE in `ls -v "$data_impropers_by_type"*.template 2> /dev/null`; do
     fi
     mv -f new_impropers.template.tmp "${data_impropers}.template"
 
-    echo "(Repairing ttree_assignments.txt file after impropers added.)" >&2
+    # Keep track of all of the newly generated interactions (newest first).
+    # (The "ttree_assignments.txt" file is repaired for all of these
+    #  interactions at once, after the impropers have been generated.)
+    if [ -e gen_impropers_all.template.tmp ]; then
+        cat gen_impropers_all.template.tmp >> gen_impropers.template.tmp
+    fi
+    mv -f gen_impropers.template.tmp gen_impropers_all.template.tmp
+    rm -f new_impropers.template.tmp
+done
+IFS="$IFS_BACKUP"
+
+
+
+# ---- Repair the ttree_assignments.txt file ----
+# Extract the variable names from the newly generated angles, dihedrals and
+# impropers and insert them into the appropriate places in
+# ttree_assignments.txt (renumbering the relevant variable-assignments to
+# avoid clashes).  All of these categories are updated in a single pass.
+
+NBODY_FIX_ARGS=""
+if [ -e gen_angles_all.template.tmp ]; then
+    NBODY_FIX_ARGS="$NBODY_FIX_ARGS '/angle' gen_angles_all.template.tmp"
+fi
+if [ -e gen_dihedrals_all.template.tmp ]; then
+    NBODY_FIX_ARGS="$NBODY_FIX_ARGS '/dihedral' gen_dihedrals_all.template.tmp"
+fi
+if [ -e gen_impropers_all.template.tmp ]; then
+    NBODY_FIX_ARGS="$NBODY_FIX_ARGS '/improper' gen_impropers_all.template.tmp"
+fi
+
+if [ -n "$NBODY_FIX_ARGS" ]; then
+
+    echo "(Repairing ttree_assignments.txt file after interactions added.)" >&2
 
-    # ---- Repair the ttree_assignments.txt file ----
-    # The next 2 lines extract the variable names from data_new.template.tmp
-    # and instert them into the appropriate place in ttree_assignments.txt
-    # (renumbering the relevant variable-assignments to avoid clashes).
-    if ! $PYTHON_COMMAND "${PY_SCR_DIR}/nbody_fix_ttree_assignments.py" \
-          '/improper' gen_impropers.template.tmp \
+    if ! eval $PYTHON_COMMAND "\"${PY_SCR_DIR}/nbody_fix_ttree_assignments.py\"" \
+          $NBODY_FIX_ARGS \
           < ttree_assignments.txt \
           > ttree_assignments.tmp; then
         exit 5
     fi
 
-    echo "(Rendering ttree_assignments.tmp file after impropers added.)" >&2
-
-    # ---- Re-build (render) the "$data_impropers" file ----
+    # ---- Re-build (render) the "$data_angles" (and other) files ----
     # Now substitute these variable values (assignments) into the variable
     # names present in the .template file.  (We want to convert the file from
     # a .template format into an ordinary (numeric) LAMMPS data-section format.)
-    if ! $PYTHON_COMMAND "${PY_SCR_DIR}/ttree_render.py" \
-           ttree_assignments.tmp \
-           < "${data_impropers}.template" \
-           > "$data_impropers"; then
-        exit 6
+
+    if [ -e gen_angles_all.template.tmp ]; then
+        echo "(Rendering ttree_assignments.tmp file after angles added.)" >&2
+        if ! $PYTHON_COMMAND "${PY_SCR_DIR}/ttree_render.py" \
+               ttree_assignments.tmp \
+               < "${data_angles}.template" \
+               > "$data_angles"; then
+            exit 6
+        fi
+    fi
+    if [ -e gen_dihedrals_all.template.tmp ]; then
+        echo "(Rendering ttree_assignments.tmp file after dihedrals added.)" >&2
+        if ! $PYTHON_COMMAND "${PY_SCR_DIR}/ttree_render.py" \
+               ttree_assignments.tmp \
+               < "${data_dihedrals}.template" \
+               > "$data_dihedrals"; then
+            exit 6
+        fi
+    fi
+    if [ -e gen_impropers_all.template.tmp ]; then
+        echo "(Rendering ttree_assignments.tmp file after impropers added.)" >&2
+        if ! $PYTHON_COMMAND "${PY_SCR_DIR}/ttree_render.py" \
+               ttree_assignments.tmp \
+               < "${data_impropers}.template" \
+               > "$data_impropers"; then
+            exit 6
+        fi
     fi
     echo "" >&2
 
     mv -f ttree_assignments.tmp ttree_assignments.txt
-    rm -f gen_impropers.template.tmp new_impropers.template.tmp
-done
-IFS="$IFS_BACKUP"
+fi
+rm -f gen_angles_all.template.tmp gen_dihedrals_all.template.tmp gen_impropers_all.template.tmp
 
 
 
@@ -45,7 +45,6 @@ InstanceObj   Instance nodes are created when a user creates one (or many)
 
 import sys
 from collections import defaultdict
-import operator
 import random
 #import gc
 
@@ -102,8 +101,8 @@ g_filename = __file__.split('/')[-1]
 g_module_name = g_filename
 if g_filename.rfind('.py') != -1:
     g_module_name = g_filename[:g_filename.rfind('.py')]
-g_date_str = '2016-12-21'
-g_version_str = '0.85.0'
+g_date_str = '2026-10-19'
+g_version_str = '0.86.4'
 
 
 class ClassReference(object):
@@ -583,10 +582,13 @@ def StrToPtkns(path_string):
     return orig_text.split('/')
 
 
-def FindChild(name, node, dbg_loc):
+def FindChild(name, node, dbg_loc, expand_lazy=False):
     """ FindChild looks over the list of node.children to find a child
     which matches the name given in the first argument.
     If it is not found, it returns None.
+    If "expand_lazy" is True, then the bodies of any StaticObjs we search
+    through whose parsing was postponed (see StaticObj.Parse(lazy=True))
+    are parsed first.  (Otherwise their children will not be visible yet.)
        Note: I have not yet specified what kind of nodes FindChild() operates
     on.  Both StaticObjs and InstanceObjs have self.children and self.parent.
     However only StaticObjs have "self.class_parents".
@@ -610,6 +612,9 @@ def FindChild(name, node, dbg_loc):
     access child data.  We should loop over both of them.  We do that below:
     """
 
+    if expand_lazy and isinstance(node, StaticObj):
+        node.ParseLazyBodies()
+
     child = node.children.get(name)
 
     if child:
@@ -624,11 +629,11 @@ def FindChild(name, node, dbg_loc):
         # Search recursively over the "children" (ie attributes or members)
         # belonging to any OOP ancestors of this node.
         for class_parent in node.class_parents:
-            child = FindChild(name, class_parent, dbg_loc)
+            child = FindChild(name, class_parent, dbg_loc, expand_lazy)
             if child != None:
                 return child
         for namespace_node in node.namespaces:
-            child = FindChild(name, namespace_node, dbg_loc)
+            child = FindChild(name, namespace_node, dbg_loc, expand_lazy)
             if child != None:
                 return child
     else:
@@ -638,7 +643,7 @@ def FindChild(name, node, dbg_loc):
     return None
 
 
-def FollowPath(path_tokens, starting_node, dbg_loc):
+def FollowPath(path_tokens, starting_node, dbg_loc, expand_lazy=False):
     """ FollowPath() returns the "last_node", a node whose position in the
         tree is indicated by a list of path_tokens, describing the names
         of nodes connecting "starting_node" to "last_node".
@@ -657,11 +662,16 @@ def FollowPath(path_tokens, starting_node, dbg_loc):
         If the path can not be followed (because at some point, a child
         or parent does not exist), then this function returns a number
         smaller than len(path_tokens).
-        We let the caller handle undefined paths. """
+        We let the caller handle undefined paths.
+           If "expand_lazy" is True, then any StaticObjs along the path
+        (including the last_node) whose bodies have not been parsed yet
+        are parsed before they are used.  """
 
     #print('    FollowPath() invoked on: ', path_tokens)
 
     if len(path_tokens) == 0:
+        if expand_lazy and isinstance(starting_node, StaticObj):
+            starting_node.ParseLazyBodies()
         return 0, starting_node
 
     node = starting_node
@@ -705,7 +715,8 @@ def FollowPath(path_tokens, starting_node, dbg_loc):
             # (This is not an exhaustive tree search. Only the nodes which
             #  are immediate children of this node's parents are searched.)
             while node != None:
-                child = FindChild(search_target, node, dbg_loc)
+                child = FindChild(search_target, node, dbg_loc,
+                                  expand_lazy)
                 if child is None:
                     node = node.parent
                 else:
@@ -730,7 +741,7 @@ def FollowPath(path_tokens, starting_node, dbg_loc):
 
             # Now search over the "children" of this
             # node for one who's name matches path_tokens[i].
-            child = FindChild(path_tokens[i], node, dbg_loc)
+            child = FindChild(path_tokens[i], node, dbg_loc, expand_lazy)
 
             if child is None:
                 # In that case, return with the node_list incomplete.
@@ -748,14 +759,18 @@ def FollowPath(path_tokens, starting_node, dbg_loc):
                 #sys.stderr.write('(debug_msg: encountered deleted node: \"'+node.name+'\")\n')
                 break
 
+    if expand_lazy and isinstance(node, StaticObj):
+        node.ParseLazyBodies()
+
     return len(path_tokens), node
 
 
-def PtknsToNode(path_tokens, starting_node, dbg_loc):
+def PtknsToNode(path_tokens, starting_node, dbg_loc, expand_lazy=False):
     """ PtknsToNode() is identical to def FollowPath() except
     that it raises syntax-error exceptions if the path is undefined."""
 
-    i_last_ptkn, last_node = FollowPath(path_tokens, starting_node, dbg_loc)
+    i_last_ptkn, last_node = FollowPath(path_tokens, starting_node, dbg_loc,
+                                        expand_lazy)
 
     if i_last_ptkn < len(path_tokens):
         # assert(isinstance(last_node,StaticObj)) <--why did I assert this?
@@ -813,9 +828,9 @@ def PtknsToNode(path_tokens, starting_node, dbg_loc):
     return last_node
 
 
-def StrToNode(obj_name, starting_node, dbg_loc):
+def StrToNode(obj_name, starting_node, dbg_loc, expand_lazy=False):
     path_tokens = obj_name.split('/')
-    return PtknsToNode(path_tokens, starting_node, dbg_loc)
+    return PtknsToNode(path_tokens, starting_node, dbg_loc, expand_lazy)
 
 
 def NodeListToPtkns(node_list, dbg_loc=None):
@@ -950,6 +965,24 @@ def CatLeafNodesToTkns(cat_name, cat_node, leaf_node, dbg_loc):
     return cat_node_ptkns + leaf_node_ptkns
 
 
+def VarBindingFullName(var_binding):
+    """
+    Returns var_binding.full_name.  (The full names of most $instance
+    variables are not stored in their VarBindings.  In that case, the
+    name is generated from var_binding.nptr.  See ProcessCommand())
+
+    """
+    if var_binding.full_name is not None:
+        return var_binding.full_name
+    nptr = var_binding.nptr
+    prefix = '$'
+    if isinstance(nptr.leaf_node, StaticObj):
+        prefix = '@'
+    return prefix + CanonicalDescrStr(nptr.cat_name,
+                                      nptr.cat_node,
+                                      nptr.leaf_node)
+
+
 def CanonicalCatName(cat_name, cat_node, dbg_loc=None):
     # Determine the path of the cat node
     tkns = NodeToPtkns(cat_node)
@@ -1146,6 +1179,188 @@ def DescrToCatLeafPtkns(descr_str, dbg_loc):
     return cat_name, RemoveNullTokens(cat_ptkns), leaf_ptkns
 
 
+def CompilePath(path_tokens):
+    """
+    CompilePath() converts a list of path tokens (see FollowPath()) into a
+    list of (index, token) pairs containing only the tokens which move us
+    through the tree ('..' or the names of children).  The '' and '.' tokens
+    (which FollowPath() skips over) are discarded.  The index is the position
+    of each token in the original list.
+    Paths containing '...' can not be compiled because their meaning depends
+    on the contents of the tree.  In that case, None is returned.
+
+    """
+    if '...' in path_tokens:
+        return None
+    steps = []
+    for i in range(0, len(path_tokens)):
+        if path_tokens[i] not in ('', '.'):
+            steps.append((i, path_tokens[i]))
+    from_root = ((len(path_tokens) > 0) and (path_tokens[0] == ''))
+    return from_root, steps
+
+
+def FollowCompiledPath(compiled_path, num_tokens, starting_node, dbg_loc):
+    """
+    FollowCompiledPath() returns the same result as FollowPath(), for a
+    list of path tokens that was converted using CompilePath().
+    ("num_tokens" is the length of the original list of path tokens.)
+
+    """
+    from_root, steps = compiled_path
+    node = starting_node
+    if from_root:
+        while node.parent != None:
+            node = node.parent
+    for i, ptkn in steps:
+        if ptkn == '..':
+            if node.parent is None:
+                return i, node
+            node = node.parent
+        else:
+            child = node.children.get(ptkn)
+            if (child is None) and isinstance(node, StaticObj):
+                child = FindChild(ptkn, node, dbg_loc)
+            if child is None:
+                return i, node
+            node = child
+            if node.IsDeleted():
+                break
+    return num_tokens, node
+
+
+def ParseDescrStr(descr_str, dbg_loc):
+    """
+    ParseDescrStr() does the part of the work of DescrToCatLeafNodes() which
+    depends only on the descriptor string (and not on the tree).
+    It returns the same cat_name, cat_ptkns, leaf_ptkns as
+    DescrToCatLeafPtkns() (after applying the "ellipsis hack" below),
+    as well as the result of CompilePath(leaf_ptkns).
+    (If the leaf path must be interpreted by DescrToCatLeafNodes() in
+     some other way, then the last entry is None.)
+
+    """
+
+    cat_name, cat_ptkns, leaf_ptkns = DescrToCatLeafPtkns(descr_str, dbg_loc)
+
+    # ---- ellipsis hack ----
+    #
+    # Search for class:
+    # Most users expect ttree.py to behave like a
+    # standard programming language: If the class they are
+    # instantiating was not defined in this specific
+    # location, they expect ttree.py to search for
+    # it outwards, first in the parent's environment,
+    # and then in the parent's parent's environment,
+    # and so on, until the object is found.
+    # For example, most users expect this to work:
+    # class Res{
+    #   write("Atoms") {
+    #     $atom:CA @atom:CA 0.123 1.234 2.345
+    #     $atom:CB @atom:CB 1.234 2.345 3.456
+    #   }
+    # }
+    # class Protein{
+    #   write_once("AnglesByType") {
+    #     @angle:backbone @atom:Res/CA @atom:Res/CA @atom:Res/CA
+    # }
+    # Notice that in class Protein, we did not have to specify
+    # where "Res" was defined because it is defined in the parent
+    # environment (ie. immediately outside Proteins's environment).
+    #    The general way to do this in ttree.py, is to
+    # use ellipsis syntax "@atom:.../Res/CA" symbol.  The
+    # ellipsis ".../" tells ttree.py to search upwards
+    # for the object to the right of it ("Res")
+    #    In order to make ttree.py behave the way
+    # most users are expecting, we artificially insert a
+    # ".../" before the class name here.  (Later on, the
+    # code that processes the ".../" symbol will take
+    # care of finding A.  We don't have to worry about
+    # about doing that now.)
+    #
+    #   I think we only want to do this for variables with path information
+    # such as "@atom:Res/CA" (which means that leaf_ptkns = ['Res', 'CA']).
+    # For simple variables like "@atom:CA", we don't automatically look upwards
+    # unless the user eplicitly requests it.
+    #    (That's why we check to make sure that len(leaf_ptkns) > 1 below
+    #     before we insert '...' into the leaf_ptkns.)
+    # In other words, the two variables "@atom:CA" below are treated differently
+    #
+    # A {
+    #   write("Atoms") {
+    #     @atom:CA
+    #   }
+    #   class B {
+    #     write("Atoms") {
+    #       @atom:CA
+    #     }
+    #   }
+    # }
+    #
+    if ((descr_str.find(':') != -1) and
+            #(not ((len(leaf_ptkns) == 1) and
+            #      (leaf_ptkns[0] == context_node.name))) and
+            #(len(leaf_ptkns) > 0) and
+            (len(leaf_ptkns) > 1) and
+            (len(leaf_ptkns[0]) > 0) and
+            (leaf_ptkns[0][0] not in ('.', '*', '?'))):
+
+        leaf_ptkns.insert(0, '...')
+    # ---- Done with "ellipsis hack" -----
+
+    if (len(leaf_ptkns) > 0) and (leaf_ptkns[-1] == 'query()'):
+        compiled_leaf_path = None
+    else:
+        compiled_leaf_path = CompilePath(leaf_ptkns)
+
+    return cat_name, cat_ptkns, leaf_ptkns, compiled_leaf_path
+
+
+# DescrToCatLeafNodes() is invoked for every variable in every write()
+# command of every instance.  The same descriptors (such as "atom:O" or
+# "mol:.") appear over and over again, so we remember the result of
+# ParseDescrStr() for each descriptor string in g_descr_cache.
+# (No pointers to nodes are stored there.  The compiled leaf path is
+#  followed again each time it is used, so the cache is not affected when
+#  nodes in the tree are deleted, or replaced by other nodes.)
+g_descr_cache = {}
+
+
+def CachedParseDescrStr(descr_str, dbg_loc):
+    """ Same as ParseDescrStr(), but the result is stored in g_descr_cache.
+    (Note: The lists it returns are shared.  Don't modify them.)  """
+    cached = g_descr_cache.get(descr_str)
+    if cached is None:
+        cached = ParseDescrStr(descr_str, dbg_loc)
+        g_descr_cache[descr_str] = cached
+    return cached
+
+
+def DescrIsBeneathContext(descr_str, dbg_loc):
+    """
+    DescrIsBeneathContext() returns True if, regardless of the contents of
+    the tree, the variable described by descr_str will always be located at,
+    or beneath, the context_node in which it was used, and its category node
+    will always be one of the ancestors of the context_node (or the
+    context_node itself).  This is the case if the descriptor contains no
+    category path, and if its leaf path contains no '..', '...', wildcard
+    characters, and does not begin with '/'.  (Example: "atom:CA")
+
+    """
+    cat_name, cat_ptkns, leaf_ptkns, compiled_leaf_path = \
+        CachedParseDescrStr(descr_str, dbg_loc)
+    if ((len(cat_ptkns) > 0) or (compiled_leaf_path is None) or
+            HasWildcard(descr_str)):
+        return False
+    from_root, steps = compiled_leaf_path
+    if from_root:
+        return False
+    for i, ptkn in steps:
+        if ptkn == '..':
+            return False
+    return True
+
+
 def DescrToCatLeafNodes(descr_str,
                         context_node,
                         dbg_loc,
@@ -1273,72 +1488,8 @@ def DescrToCatLeafNodes(descr_str,
 
     """
 
-    cat_name, cat_ptkns, leaf_ptkns = DescrToCatLeafPtkns(descr_str, dbg_loc)
-
-    # ---- ellipsis hack ----
-    #
-    # Search for class:
-    # Most users expect ttree.py to behave like a
-    # standard programming language: If the class they are
-    # instantiating was not defined in this specific
-    # location, they expect ttree.py to search for
-    # it outwards, first in the parent's environment,
-    # and then in the parent's parent's environment,
-    # and so on, until the object is found.
-    # For example, most users expect this to work:
-    # class Res{
-    #   write("Atoms") {
-    #     $atom:CA @atom:CA 0.123 1.234 2.345
-    #     $atom:CB @atom:CB 1.234 2.345 3.456
-    #   }
-    # }
-    # class Protein{
-    #   write_once("AnglesByType") {
-    #     @angle:backbone @atom:Res/CA @atom:Res/CA @atom:Res/CA
-    # }
-    # Notice that in class Protein, we did not have to specify
-    # where "Res" was defined because it is defined in the parent
-    # environment (ie. immediately outside Proteins's environment).
-    #    The general way to do this in ttree.py, is to
-    # use ellipsis syntax "@atom:.../Res/CA" symbol.  The
-    # ellipsis ".../" tells ttree.py to search upwards
-    # for the object to the right of it ("Res")
-    #    In order to make ttree.py behave the way
-    # most users are expecting, we artificially insert a
-    # ".../" before the class name here.  (Later on, the
-    # code that processes the ".../" symbol will take
-    # care of finding A.  We don't have to worry about
-    # about doing that now.)
-    #
-    #   I think we only want to do this for variables with path information
-    # such as "@atom:Res/CA" (which means that leaf_ptkns = ['Res', 'CA']).
-    # For simple variables like "@atom:CA", we don't automatically look upwards
-    # unless the user eplicitly requests it.
-    #    (That's why we check to make sure that len(leaf_ptkns) > 1 below
-    #     before we insert '...' into the leaf_ptkns.)
-    # In other words, the two variables "@atom:CA" below are treated differently
-    #
-    # A {
-    #   write("Atoms") {
-    #     @atom:CA
-    #   }
-    #   class B {
-    #     write("Atoms") {
-    #       @atom:CA
-    #     }
-    #   }
-    # }
-    #
-    if ((descr_str.find(':') != -1) and
-            #(not ((len(leaf_ptkns) == 1) and
-            #      (leaf_ptkns[0] == context_node.name))) and
-            #(len(leaf_ptkns) > 0) and
-            (len(leaf_ptkns) > 1) and
-            (len(leaf_ptkns[0]) > 0) and
-            (leaf_ptkns[0][0] not in ('.', '*', '?'))):
-
-        leaf_ptkns.insert(0, '...')
-    # ---- Done with "ellipsis hack" -----
+    cat_name, cat_ptkns, leaf_ptkns, compiled_leaf_path = \
+        CachedParseDescrStr(descr_str, dbg_loc)
 
     # sys.stderr.write(' DescrToCatLeafNodes(): (cat_ptkns, cat_name, lptkns) = ('+
     # str(cat_ptkns)+', \"'+cat_name+'\", '+str(leaf_ptkns)+')\n')
@@ -1400,7 +1551,7 @@ def DescrToCatLeafNodes(descr_str,
         # give them unique names to avoid clashes (just in case
         # "query()" appears multiple times in the same context).
         #leaf_ptkns[-1] = '__query__'+dbg_loc.infile+'_'+str(dbg_loc.lineno)
-        leaf_ptkns[-1] = '__query__' + str(dbg_loc.order)
+        leaf_ptkns = leaf_ptkns[:-1] + ['__query__' + str(dbg_loc.order)]
 
     # Lookup the path for the leaf:
     #
@@ -1414,9 +1565,15 @@ def DescrToCatLeafNodes(descr_str,
     # before.  Think of "CA" as a variable placeholder.
     #
     # So we follow the path tokens as far as we can:
-    i_last_ptkn, last_node = FollowPath(leaf_ptkns,
-                                        leaf_start_node,
-                                        dbg_loc)
+    if compiled_leaf_path is not None:
+        i_last_ptkn, last_node = FollowCompiledPath(compiled_leaf_path,
+                                                    len(leaf_ptkns),
+                                                    leaf_start_node,
+                                                    dbg_loc)
+    else:
+        i_last_ptkn, last_node = FollowPath(leaf_ptkns,
+                                            leaf_start_node,
+                                            dbg_loc)
 
     # Did we find the node?
     if i_last_ptkn == len(leaf_ptkns):
@@ -1690,6 +1847,11 @@ class Category(object):
                  is invoked it should return a unique string (typically this is
                  simply a string representing an integer which is incremented).
 
+    reserved_values  An OrderedDict() whose keys are values (strings) which
+                 must not be assigned to variables automatically, because the
+                 user has assigned them to other variables (See
+                 AutoAssignVals()).
+
     """
 
     __slots__ = ["name", "bindings", "counter",
@@ -1725,6 +1887,11 @@ class Category(object):
             self.reserved_values = reserved_values
 
 
+# StaticObjs whose bodies were parsed (on demand) during LookupStaticRefs().
+# (See StaticObj.ParseLazyBodies().  Their references must be looked up too.)
+g_lazy_parsed = []
+
+
 class StaticObj(object):
     """  StaticObjs and InstanceObjs:
 
@@ -1851,7 +2018,8 @@ class StaticObj(object):
                  "instance_categories",
                  "instance_commands_push",
                  "instance_commands",
-                 "instance_commands_pop"]
+                 "instance_commands_pop",
+                 "lazy_bodies"]
 
     def __init__(self,
                  name='',
@@ -1903,6 +2071,12 @@ class StaticObj(object):
         self.instance_commands = []  # 2) then add this to InstanceObj.commands
         self.instance_commands_pop = []  # 3) finally add these commands
 
+        # If the user requested "lazy" parsing, the text of this class's
+        # definition(s) is stored here until somebody needs it.  This is a
+        # list of (lex, text, srcloc, class_parent_strs) tuples.
+        # (See Parse() and ParseLazyBodies().  None means nothing is pending.)
+        self.lazy_bodies = None
+
     def DeleteSelf(self):
         for child in self.children.values():
             child.DeleteSelf()
@@ -1917,10 +2091,16 @@ class StaticObj(object):
     # vb##    else:
     # vb##        self.var_bindings.append(var_binding)
 
-    def Parse(self, lex):
+    def Parse(self, lex, lazy=False):
         """ Parse() builds a static tree of StaticObjs by parsing text file.
         -The "lex" argument is a file or input stream which has been converted
          to a "TemplateLexer" object (similar to the python's built-in shlex lexer).
+        -If "lazy" is True, then the bodies of nested class definitions are
+         not parsed yet.  Their text is skipped over quickly and saved for
+         later.  They are parsed (by ParseLazyBodies()) only when the class is
+         needed, ie. when it is instantiated, inherited, or used as a namespace.
+         (Classes which are never used are never parsed, so any errors in them,
+          or any write_once() commands they contain, are ignored.)
         """
 
         # The next two variables store a stack of commands the user wants
@@ -2069,7 +2249,8 @@ class StaticObj(object):
 
                 stnode = StrToNode(namespace_str,
                                    self,
-                                   lex.GetSrcLoc())
+                                   lex.GetSrcLoc(),
+                                   expand_lazy=True)
 
                 self.namespaces.append(stnode)
 
@@ -2256,9 +2437,8 @@ class StaticObj(object):
                             syntax_err_inherits = True
                             break
                         else:
-                            class_parents.append(StrToNode(next_symbol,
-                                                           self,
-                                                           lex.GetSrcLoc()))
+                            class_parents.append((next_symbol,
+                                                  lex.GetSrcLoc()))
                     if len(class_parents) == 0:
                         syntax_err_inherits = True
 
@@ -2277,17 +2457,54 @@ class StaticObj(object):
                     # the old.  This way, class definitions can be augmented
                     # later.  (This is the way "namespaces" work in C++.)
                     child = self.children.get(child_name)
+
+                    # If "lazy", save the text in the curly-brackets for
+                    # later, and look up the class parents later as well.
+                    body = None
+                    if ((lazy and (child is None)) or
+                            ((child is not None) and
+                             (child.lazy_bodies is not None))):
+                        body_srcloc = lex.GetSrcLoc()
+                        body = lex.ReadRawBlock(('write',
+                                                 'write_once',
+                                                 'create_var',
+                                                 'replace'))
+                    if body is None:
+                        # Otherwise, we parse the body now.  (This also
+                        # happens if the body contains "import" commands,
+                        # which can not be postponed.)  To keep commands in
+                        # order, first parse any bodies we skipped earlier.
+                        if child is not None:
+                            child.ParseLazyBodies()
+                        class_parents = [StrToNode(parent_str,
+                                                   self,
+                                                   parent_srcloc,
+                                                   expand_lazy=True)
+                                         for (parent_str, parent_srcloc)
+                                         in class_parents]
+
                     # If found, we refer to it as "child".
                     # If not, then we create a new StaticObj named "child".
                     if child is None:
                         child = StaticObj(child_name, self)
                         self.children[child_name] = child
+                        if body is not None:
+                            child.lazy_bodies = []
                     assert(child.name == child_name)
 
-                    # Either way we invoke child.Parse(), to
-                    # add contents (class commands) to child.
-                    child.Parse(lex)
-                    child.class_parents += class_parents
+                    if body is not None:
+                        if child.srcloc_begin is None:
+                            child.srcloc_begin = body_srcloc
+                        child.lazy_bodies.append((lex,
+                                                  body,
+                                                  body_srcloc,
+                                                  class_parents))
+                        child.srcloc_end = lex.GetSrcLoc()
+                    else:
+                        # Either way we invoke child.Parse(), to
+                        # add contents (class commands) to child.
+                        child.Parse(lex, lazy)
+                        child.class_parents += class_parents
 
                 elif next_symbol == '=':
                     next_symbol = lex.get_token()
@@ -2725,7 +2942,8 @@ class StaticObj(object):
 
                         child.class_parents.append(StrToNode(parent_name,
                                                              self,
-                                                             lex.GetSrcLoc()))
+                                                             lex.GetSrcLoc(),
+                                                             expand_lazy=True))
 
                         if suffix != '':
                             # Assume the command is a StackableCommand. (This
@@ -2785,7 +3003,8 @@ class StaticObj(object):
                         path_tokens = obj_descr_str.split('/')
                         i_last_ptkn, staticobj = FollowPath(path_tokens,
                                                             self,
-                                                            lex.GetSrcLoc())
+                                                            lex.GetSrcLoc(),
+                                                            expand_lazy=True)
                         instobj_descr_str = './' + \
                             '/'.join(path_tokens[i_last_ptkn:])
 
@@ -2859,6 +3078,28 @@ class StaticObj(object):
                                           self.srcloc_end)
             self.instance_commands.append(pop_command)
 
+    def ParseLazyBodies(self):
+        """ If the parsing of this class's definition was postponed
+        (see Parse(lazy=True)), then parse the text we saved now.
+        (It is safe to invoke this function more than once.)
+
+        """
+        if self.lazy_bodies is None:
+            return
+        lazy_bodies = self.lazy_bodies
+        self.lazy_bodies = None
+        for lex, text, srcloc, class_parent_strs in lazy_bodies:
+            class_parents = [StrToNode(parent_str,
+                                       self.parent,
+                                       parent_srcloc,
+                                       expand_lazy=True)
+                             for (parent_str, parent_srcloc)
+                             in class_parent_strs]
+            self.Parse(lex.SubLexer(text, srcloc), lazy=True)
+            self.class_parents += class_parents
+        if len(lazy_bodies) > 0:
+            g_lazy_parsed.append(self)
+
     @staticmethod
     def CleanupReadTemplate(tmpl_contents, lex):
         # 1) Remove any newlines at the beginning of the first text block
@@ -2910,8 +3151,12 @@ class StaticObj(object):
         with pointers to actual StaticObjs which correspond to those classes.
         (This was deferred until all of the classes have been defined so
         that users can refer to classes that they will define later on.)
+           If some classes were parsed lazily, then the classes we find this
+        way are parsed now (if they have not been parsed already).
 
         """
+        if self.parent is None:
+            del g_lazy_parsed[:]
 
         # Now do the same for any children which
         # are created during instantiation:
@@ -2923,14 +3168,21 @@ class StaticObj(object):
                 assert(isinstance(command.class_ref.statobj_str, basestring))
                 command.class_ref.statobj = StrToNode(command.class_ref.statobj_str,
                                                       self,
-                                                      command.class_ref.srcloc)
+                                                      command.class_ref.srcloc,
+                                                      expand_lazy=True)
 
         # Now recursively resolve StaticObj pointers for the "children"
         # (in this case, "children" refers to classes whose definitions
         #  are nested within this one).
-        for child in self.children.values():
+        for child in list(self.children.values()):
             child.LookupStaticRefs()
 
+        # Classes which were parsed in the meantime (because they were
+        # needed) may refer to other classes.  Look those up too.
+        if self.parent is None:
+            while len(g_lazy_parsed) > 0:
+                g_lazy_parsed.pop(0).LookupStaticRefs()
+
     def _ExtractSuffix(self, class_name_str, lex):
         """
 
@@ -3240,6 +3492,12 @@ def RandomSelect(entries, weights):
     return entries[i]
 
 
+# The number of times a node in the instance tree was deleted.  IsDeleted()
+# uses this to decide whether the results it saved are still up to date.
+# (If nothing was ever deleted, then IsDeleted() can return False at once.)
+g_deletion_epoch = 0
+
+
 class InstanceObjBasic(object):
     """ A simplified version of InstanceObj.
         See the documentation/comments for InstanceObj for more details.
@@ -3284,6 +3542,8 @@ class InstanceObjBasic(object):
     #    self.deleted = True
 
     def DeleteSelf(self):
+        global g_deletion_epoch
+        g_deletion_epoch += 1
         # self.Dealloc()
         self.parent = self  # This condition (normally never true)
         # flags the node as "deleted".  (Nodes are never
@@ -3298,15 +3558,13 @@ class InstanceObjBasic(object):
     def IsDeleted(self):
         # Return true if self.deleted == True  or  self.parent == self
         # for this node (or for any ancestor node).
-        node = self
-        while node.parent != None:
-            if hasattr(node, 'deleted'):
-                if node.deleted:
-                    return True
-            elif node.parent == node:
-                return True
-            node = node.parent
-        return False
+        if g_deletion_epoch == 0:
+            return False  # (nothing has been deleted yet)
+        if self.parent is self:
+            return True
+        if self.parent is None:
+            return False
+        return self.parent.IsDeleted()
 
     # def Dealloc(self):
     #    pass
@@ -3339,7 +3597,9 @@ class InstanceObj(InstanceObjBasic):
                  "commands_pop",
                  "srcloc_begin",
                  "srcloc_end",
-                 "deleted"]
+                 "deleted",
+                 "is_deleted",
+                 "is_deleted_epoch"]
     #"LookupMultiDescrStr",
     # "Dealloc",
     # "DeleteSelf",
@@ -3387,6 +3647,10 @@ class InstanceObj(InstanceObjBasic):
         self.srcloc_begin = None     # Keep track of location in user files
         self.srcloc_end = None     # (useful for error message reporting)
         self.deleted = False
+        # The result of IsDeleted() is stored in "is_deleted".  It is
+        # up to date if "is_deleted_epoch" equals g_deletion_epoch.
+        self.is_deleted = False
+        self.is_deleted_epoch = -1
 
     def LookupMultiDescrStr(self,
                             multi_descr_str,
@@ -3646,8 +3910,35 @@ class InstanceObj(InstanceObjBasic):
         return out_str
 
     def DeleteSelf(self):
+        global g_deletion_epoch
+        g_deletion_epoch += 1
         self.deleted = True
 
+    def IsDeleted(self):
+        # Return true if self.deleted == True for this node, or if any
+        # ancestor node was deleted.  The result is stored in every node we
+        # visit, so we rarely need to climb all the way to the root.
+        # (The stored results are discarded after anything else is deleted.)
+        if g_deletion_epoch == 0:
+            return False  # (nothing has been deleted yet)
+        if self.is_deleted_epoch == g_deletion_epoch:
+            return self.is_deleted
+        path = []
+        node = self
+        while ((node.parent != None) and
+               (node.is_deleted_epoch != g_deletion_epoch)):
+            path.append(node)
+            node = node.parent
+        if node.parent is None:
+            deleted = False  # (the root node is never deleted)
+        else:
+            deleted = node.is_deleted
+        for node in reversed(path):
+            deleted = deleted or node.deleted
+            node.is_deleted = deleted
+            node.is_deleted_epoch = g_deletion_epoch
+        return deleted
+
     #  COMMENT1:       Don't get rid of pointers to yourself.  Knowing which
     #                 objects you instantiated and destroyed might be useful
     #                 in case you want to apply multiple delete [*] commands
@@ -3906,14 +4197,23 @@ class InstanceObj(InstanceObjBasic):
                         # nodes, and uniquely identifies this variable globally.
                         # Thus these strings correspond uniquely (ie. in a
                         # one-to-one fashion) with the nodes they represent.
-
-                        var_binding.full_name = var_ref.prefix[0] + \
-                            CanonicalDescrStr(var_ref.nptr.cat_name,
-                                              var_ref.nptr.cat_node,
-                                              var_ref.nptr.leaf_node,
-                                              var_ref.srcloc)
-                        # (These names can always be generated later when needed
-                        #  but it doesn't hurt to keep track of it here too.)
+                        #   There can be millions of $instance variables, and
+                        # their names are rarely needed, so we don't store them.
+                        # (They are generated later by VarBindingFullName().)
+                        # However if it's possible that the category and leaf
+                        # nodes are not compatible (or if they are the same
+                        # node), then generate the name now, because
+                        # CanonicalDescrStr() checks for these mistakes.
+
+                        if ((not DescrIsBeneathContext(var_ref.descr_str,
+                                                       var_ref.srcloc)) or
+                                (var_ref.nptr.leaf_node is
+                                 var_ref.nptr.cat_node)):
+                            var_binding.full_name = var_ref.prefix[0] + \
+                                CanonicalDescrStr(var_ref.nptr.cat_name,
+                                                  var_ref.nptr.cat_node,
+                                                  var_ref.nptr.leaf_node,
+                                                  var_ref.srcloc)
 
                         # Now add this binding to the other
                         # bindings in this category:
@@ -4222,12 +4522,25 @@ def AutoAssignVals(cat_node,
     sort_variables: Sorting the variables according to their "binding.order"
                     counters is optional.
 
+    reserved_values: An optional set of (category, value) pairs (see
+                    CustomizeBindings()).  These values will not be assigned
+                    to any variables.  (They are stored in the
+                    "reserved_values" member of each category.)
+
     """
 
     if (not hasattr(cat_node, 'categories')):
         # (sometimes leaf nodes lack a 'categories' member, to save memory)
         return
 
+    if reserved_values is not None:
+        # Checking for (category, value) pairs in this set is slow when
+        # there are millions of variables.  Instead, store the reserved
+        # values in the categories they belong to.  (We only need to do
+        # this once.  The recursive calls below are passed None.)
+        for cat, value in reserved_values:
+            cat.reserved_values[value] = True
+
     # Search the tree in a depth-first-search manner.
     # For each node, examine the "categories" associated with that node
     # (ie the list of variables whose counters lie within that node's scope).
@@ -4247,14 +4560,19 @@ def AutoAssignVals(cat_node,
             sys.stderr.write('  sorting variables in category: ' + prefix +
                              CanonicalCatName(cat_name, cat_node) + ':\n')
 
+            # (Note: Using the "order" attribute as the key gives the same
+            #  result as comparing the VarBindings with VarBinding.__lt__(),
+            #  but it is much faster.)
             var_bind_iter = iter(sorted(cat.bindings.items(),
-                                        key=operator.itemgetter(1)))
+                                        key=lambda item: item[1].order))
         else:
             # Just iterate through them in the order that they were added
             # to the category list.  (This happens to be the same order as
             # we found it earlier when searching the tree.)
             var_bind_iter = iter(cat.bindings.items())
 
+        reserved = cat.reserved_values
+
         for leaf_node, var_binding in var_bind_iter:
 
             if ((var_binding.value is None) or ignore_prior_values):
@@ -4266,12 +4584,15 @@ def AutoAssignVals(cat_node,
                     # category counter without incrementing it.
                     var_binding.value = str(cat.counter.query())
 
-                elif HasWildcard(var_binding.full_name):
+                elif ((var_binding.full_name is not None) and
+                      HasWildcard(var_binding.full_name)):
                     #   -- The wildcard hack ---
                     # Variables containing * or ? characters in their names
                     # are not allowed.  These are not variables, but patterns
                     # to match with other variables.  Represent them by the
                     # (full-path-expanded) string containing the * or ?.
+                    # (Names which were not stored never contain * or ?.
+                    #  See DescrIsBeneathContext().)
                     var_binding.value = var_binding.full_name
 
                 else:
@@ -4287,8 +4608,7 @@ def AutoAssignVals(cat_node,
                         while True:
                             cat.counter.incr()
                             value = str(cat.counter.query())
-                            if ((reserved_values is None) or
-                                    ((cat, value) not in reserved_values)):
+                            if value not in reserved:
                                 break
 
                         var_binding.value = value
@@ -4297,7 +4617,7 @@ def AutoAssignVals(cat_node,
     for child in cat_node.children.values():
         AutoAssignVals(child,
                        sort_variables,
-                       reserved_values,
+                       None,
                        ignore_prior_values)
 
 
@@ -4366,7 +4686,7 @@ def Render(tmpl_list, substitute_vars=True):
 
                 else:
                     out_str_list.append(var_ref.prefix +
-                                        SafelyEncodeString(var_bindings[var_ref.nptr.leaf_node].full_name[1:]) +
+                                        SafelyEncodeString(VarBindingFullName(var_bindings[var_ref.nptr.leaf_node])[1:]) +
                                         var_ref.suffix)
 
         else:
@@ -4624,6 +4944,10 @@ def WriteVarBindingsFile(node):
         # (sometimes leaf nodes lack a 'categories' member, to save memory)
         return
 
+    if isinstance(node, InstanceObj) and node.IsDeleted():
+        # Then every variable beneath this node was deleted too. Skip them.
+        return
+
     out = open('ttree_assignments.txt', 'a')
     for cat_name in node.categories:
         var_bindings = node.categories[cat_name].bindings
@@ -4641,14 +4965,15 @@ def WriteVarBindingsFile(node):
 
                 # Now omit variables whos names contain "*" or "?"
                 # (these are actually not variables, but wildcard patterns)
-                if not HasWildcard(var_binding.full_name):
+                full_name = VarBindingFullName(var_binding)
+                if not HasWildcard(full_name):
                     if len(var_binding.refs) > 0:
                         usage_example = '       #' +\
                             ErrorLeader(var_binding.refs[0].srcloc.infile,
                                         var_binding.refs[0].srcloc.lineno)
                     else:
                         usage_example = ''
-                    out.write(SafelyEncodeString(var_binding.full_name) + '   ' +
+                    out.write(SafelyEncodeString(full_name) + '   ' +
                               SafelyEncodeString(var_binding.value)
                               + usage_example + '\n')
     out.close()
@@ -4857,6 +5182,11 @@ class BasicUISettings(object):
     created by the ttree file matches the order they appear in other files
     created by other programs.)
 
+        lazy_parse
+    If True, the definitions of classes which are never used (instantiated,
+    inherited, or used as a namespace) are skipped over and never parsed.
+    (See StaticObj.Parse().)
+
     """
 
     def __init__(self,
@@ -4873,6 +5203,7 @@ class BasicUISettings(object):
         else:
             self.user_bindings = OrderedDict()
         self.order_method = order_method
+        self.lazy_parse = False
         if lex == None:
             self.lex = TemplateLexer()
         else:
@@ -4961,6 +5292,9 @@ def BasicUIParseArgs(argv, settings, main=False):
         elif ((argv[i] == '-order-tree') or (argv[i] == '-order-dfs')):
             settings.order_method = 'by_tree'
             del(argv[i:i + 1])
+        elif ((argv[i] == '-lazy-parse') or (argv[i] == '-lazy_parse')):
+            settings.lazy_parse = True
+            del(argv[i:i + 1])
         elif ((argv[i] == '-import-path') or
               (argv[i] == '-importpath') or
               (argv[i] == '-import_path')):
@@ -5046,7 +5380,7 @@ def BasicUI(settings,
     # Step 1: Read in the StaticObj (class) definitions, without checking
     # whether or not the instance_children refer to valid StaticObj types.
     sys.stderr.write('parsing the class definitions...')
-    static_tree_root.Parse(settings.lex)
+    static_tree_root.Parse(settings.lex, lazy=settings.lazy_parse)
     # gc.collect()
 
     #sys.stderr.write('static = ' + str(static_tree_root) + '\n')
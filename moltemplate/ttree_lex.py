@@ -20,6 +20,7 @@
 
 import os.path
 import sys
+import copy
 from collections import deque
 import re
 import fnmatch
@@ -245,6 +246,19 @@ class TtreeShlex(object):
             nextchar = self.instream.read(1)
         return nextchar
 
+    def read_line(self):
+        """Read the rest of the current line (including the newline).
+        (Characters in the pushback stack are read before the stream.)"""
+        if not self.pushback:
+            return self.instream.readline()
+        chars = []
+        while self.pushback:
+            nextchar = self.pushback.popleft()
+            chars.append(nextchar)
+            if nextchar == '\n':
+                return ''.join(chars)
+        return ''.join(chars) + self.instream.readline()
+
     def read_token(self):
         self.prev_space_terminator = ''
         quoted = False
@@ -275,7 +289,7 @@ class TtreeShlex(object):
                     else:
                         continue
                 elif nextchar in self.commenters:
-                    self.instream.readline()
+                    self.read_line()
                     self.lineno = self.lineno + 1
                 elif self.posix and nextchar in self.escape:
                     escapedstate = 'a'
@@ -348,7 +362,7 @@ class TtreeShlex(object):
                     else:
                         continue
                 elif nextchar in self.commenters:
-                    comment_contents = self.instream.readline()
+                    comment_contents = self.read_line()
                     self.lineno = self.lineno + 1
                     if self.posix:
                         self.state = ' '
@@ -1028,6 +1042,8 @@ class VarBinding(object):
     the category name (followed by a ':'),
     as well as the leaf node (including the path leading up to it from cat_node)
     This triplet identifies the variable uniquely.
+    (To save memory, this is None for most $instance variables.  In that case
+     the name can be generated from "self.nptr" using VarBindingFullName().)
 
     "self.value" is the data that the variable refers to (usually a string).
 
@@ -1039,7 +1055,7 @@ class VarBinding(object):
     __slots__ = ["full_name", "nptr", "value", "refs", "order", "category"]
 
     def __init__(self,
-                 full_name='',
+                 full_name=None,
                  nptr=None,
                  value=None,
                  refs=None,
@@ -1542,9 +1558,242 @@ class TemplateLexer(TtreeShlex):
         self.source_triggers = set(['include', 'import'])
         self.source_triggers_x = set(['import'])
 
+        # Regular expressions used by ReadRawBlock():
+        #   characters which have special meaning inside a template:
+        self._raw_tmpl_special = re.compile('[' + re.escape(self.escape +
+                                                            self.commenters +
+                                                            self.newline +
+                                                            self.var_delim +
+                                                            '}') + ']')
+        #   words (tokens which are not punctuation)
+        self._raw_word = re.compile('[^' + re.escape(self.wordterminators) +
+                                    '][^' + re.escape('(){|}' +
+                                                      self.whitespace +
+                                                      self.operators +
+                                                      self.escape +
+                                                      self.commenters) + ']*')
+
     def GetSrcLoc(self):
         return OSrcLoc(self.infile, self.lineno)
 
+    def SubLexer(self, text, srcloc):
+        """
+        Return a new lexer (with the same settings as this one) which reads
+        from a string of text.  "srcloc" is the location in the original
+        file where this text came from.  (Line numbers in error messages
+        are counted from there.)
+
+        """
+        lex = copy.copy(self)
+        lex.instream = StringIO(text)
+        lex.infile = srcloc.infile
+        lex.lineno = srcloc.lineno
+        lex.pushback = deque()
+        lex.filestack = deque()
+        lex.state = ' '
+        lex.token = ''
+        lex.end_encountered = False
+        return lex
+
+    def ReadRawBlock(self, template_keywords=()):
+        """
+        ReadRawBlock() quickly skips over a block of text enclosed in curly
+        brackets (the opening '{' has already been read), without dividing
+        it into tokens or templates.  It returns the text which was skipped,
+        (ending with the '}' character which closes the block).
+        Nested pairs of {} brackets are skipped over, as well as quoted text,
+        comments, and templates.  (A template is a block of text enclosed in
+        {} following one of the words in "template_keywords", optionally
+        followed by an argument in parenthesis, for example:
+        write_once("file.txt") {...}.  Templates are terminated by the
+        same '}' character that ReadTemplate() would stop at.)
+           If the end of the file is reached before the block is closed, or
+        if the block contains any "include" or "import" commands (which are
+        not safe to postpone), then all of the text is pushed back onto
+        the stream, and None is returned.  In that case, the caller must
+        read the block the ordinary way (using get_token()).
+
+        """
+        text_read = []
+        line = ''.join(self.pushback)
+        self.pushback.clear()
+        i = 0
+        brace_depth = 1      # number of unclosed {} pairs outside templates
+        tmpl_state = 0       # 1 after a template keyword, 2 inside its (),
+                             # 3 after the ')'
+        in_quote = None      # the quote character, if we are inside quotes
+        in_template = False
+        # These variables have the same meaning as in ReadTemplate():
+        reading_var = False
+        prev_char_delim = False
+        escaped_state = False
+        commented_state = False
+        var_paren_depth = 0
+        done = False
+
+        while not done:
+            if i >= len(line):
+                text_read.append(line)
+                line = self.instream.readline()
+                i = 0
+                if line == '':
+                    break
+            nextchar = line[i]
+
+            if in_template:
+                # Skip over ordinary text quickly
+                if (not escaped_state) and (not reading_var):
+                    if commented_state:
+                        j = line.find('\n', i)
+                    else:
+                        m = self._raw_tmpl_special.search(line, i)
+                        j = -1
+                        if m:
+                            j = m.start()
+                    if j == -1:
+                        i = len(line)
+                        continue
+                    if j > i:
+                        prev_char_delim = False
+                        i = j
+                        nextchar = line[i]
+
+                if nextchar in self.newline:
+                    commented_state = False
+                elif ((nextchar in self.comment_skip_var) and
+                      (not escaped_state)):
+                    commented_state = True
+
+                if reading_var:
+                    if nextchar == '}':
+                        if escaped_state:
+                            pass
+                        elif var_paren_depth > 0:
+                            var_paren_depth -= 1
+                            if var_paren_depth == 0:
+                                if prev_char_delim:
+                                    break   # "Null variable name"
+                                reading_var = False
+                        elif prev_char_delim:
+                            break   # "Null variable name" (let the caller
+                                    # report the error)
+                        else:
+                            in_template = False
+                    elif nextchar == '{':
+                        if not escaped_state:
+                            if prev_char_delim:
+                                var_paren_depth = 1
+                            elif var_paren_depth > 0:
+                                var_paren_depth += 1
+                    elif ((nextchar in self.whitespace) or
+                          (nextchar in self.newline) or
+                          (nextchar in self.var_delim)):
+                        if not (escaped_state or (var_paren_depth > 0)):
+                            if prev_char_delim:
+                                break   # "Null variable name"
+                            if nextchar not in self.var_delim:
+                                reading_var = False
+                    else:
+                        prev_char_delim = False
+                else:
+                    if nextchar == '}':
+                        if not (escaped_state or commented_state):
+                            in_template = False
+                    elif nextchar in self.var_delim:
+                        if not (escaped_state or commented_state):
+                            prev_char_delim = True
+                            reading_var = True
+                            var_paren_depth = 0
+                    else:
+                        prev_char_delim = False
+
+                if escaped_state:
+                    escaped_state = False
+                elif nextchar in self.escape:
+                    escaped_state = True
+                i += 1
+
+            elif in_quote:
+                j = line.find(in_quote, i)
+                if j == -1:
+                    i = len(line)
+                else:
+                    i = j + 1
+                    in_quote = None
+
+            elif nextchar in self.whitespace:
+                i += 1
+
+            elif nextchar in self.commenters:
+                i = len(line)
+
+            elif nextchar in self.quotes:
+                in_quote = nextchar
+                if tmpl_state != 2:
+                    tmpl_state = 0
+                i += 1
+
+            elif nextchar == '{':
+                if (tmpl_state == 1) or (tmpl_state == 3):
+                    in_template = True
+                    reading_var = False
+                    prev_char_delim = False
+                    escaped_state = False
+                    commented_state = False
+                else:
+                    brace_depth += 1
+                tmpl_state = 0
+                i += 1
+
+            elif nextchar == '}':
+                brace_depth -= 1
+                tmpl_state = 0
+                i += 1
+                if brace_depth == 0:
+                    done = True
+
+            elif nextchar == '(':
+                if tmpl_state == 1:
+                    tmpl_state = 2
+                elif tmpl_state != 2:
+                    tmpl_state = 0
+                i += 1
+
+            elif nextchar == ')':
+                if tmpl_state == 2:
+                    tmpl_state = 3
+                else:
+                    tmpl_state = 0
+                i += 1
+
+            else:
+                m = self._raw_word.match(line, i)
+                if m is None:
+                    # a single-character token (like '=' or '|')
+                    word = nextchar
+                    i += 1
+                else:
+                    word = m.group(0)
+                    i = m.end()
+                if word in self.source_triggers:
+                    break
+                if tmpl_state != 2:
+                    if word in template_keywords:
+                        tmpl_state = 1
+                    else:
+                        tmpl_state = 0
+
+        text_read.append(line[:i])
+        text = ''.join(text_read)
+        remainder = line[i:]
+        self.lineno += text.count('\n') + remainder.count('\n')
+        if done:
+            self.push_raw_text(remainder)
+            return text
+        else:
+            self.push_raw_text(text + remainder)
+            return None
+
     def ReadTemplate(self,
                      simplify_output=False,
                      terminators='}',
@@ -7,6 +7,10 @@
 import random, math
 from collections import deque
 from array import array
+try:
+    from collections import OrderedDict
+except ImportError:
+    from ordereddict import OrderedDict   # (python 2.6)
 
 #try:
 #    from StringIO import StringIO
@@ -113,6 +117,25 @@ def AffineCompose(dest, M2, M1):
     D = len(M1)
     #assert(len(M1[0]) == D+1)
     #assert(len(M2[0]) == D+1)
+    if D == 3:
+        # This is the usual case.  Unrolling the loops is much faster.
+        a0, a1, a2 = M2
+        b0, b1, b2 = M1
+        for i, a in ((0, a0), (1, a1), (2, a2)):
+            ai0 = a[0]
+            ai1 = a[1]
+            ai2 = a[2]
+            ai3 = a[3]
+            d0 = ai0 * b0[0] + ai1 * b1[0] + ai2 * b2[0]
+            d1 = ai0 * b0[1] + ai1 * b1[1] + ai2 * b2[1]
+            d2 = ai0 * b0[2] + ai1 * b1[2] + ai2 * b2[2]
+            d3 = ai0 * b0[3] + ai1 * b1[3] + ai2 * b2[3] + ai3
+            dest_i = dest[i]
+            dest_i[0] = d0
+            dest_i[1] = d1
+            dest_i[2] = d2
+            dest_i[3] = d3
+        return
     for i in range(0, D):
         dest[i][D] = 0.0
         for j in range(0, D + 1):
@@ -124,8 +147,7 @@ def AffineCompose(dest, M2, M1):
 
 def CopyMat(dest, source):
     for i in range(0, len(source)):
-        for j in range(0, len(source[i])):
-            dest[i][j] = source[i][j]
+        dest[i][:] = source[i]
 
 
 class AffineStack(object):
@@ -151,10 +173,12 @@ class AffineStack(object):
         self.stack = None
         self.M = None
         self._tmp = None
+        self._unused = None
         self.Clear()
 
     def Clear(self):
         self.stack = deque([])
+        self._unused = []  # matrices popped earlier (which can be re-used)
         self.M = [[1.0, 0.0, 0.0, 0.0],
                   [0.0, 1.0, 0.0, 0.0],
                   [0.0, 0.0, 1.0, 0.0]]  # (identity, initially)
@@ -172,8 +196,7 @@ class AffineStack(object):
         #   in the reverse order they were pushed.  This prevents the ability
         #   to push and pop matrices to either end of the stack in an arbitrary
         #   order (like append(), appendleft(), pop(), popleft()).)
-        self.stack.append([[self.M[i][j] for j in range(0, len(self.M[i]))]
-                           for i in range(0, len(self.M))])
+        self._PushCopyOfM()
         #  The "Right" and "Left" refer to whether the new matrix is multiplied
         #  on the right or left side of the culmulatie matrix product.
         # Afterwards, self._tmp = self.M * M
@@ -196,8 +219,7 @@ class AffineStack(object):
         #   in the reverse order they were pushed.  This prevents the ability
         #   to push and pop matrices to either end of the stack in an arbitrary
         #   order (like append(), appendleft(), pop(), popleft()).)
-        self.stack.append([[self.M[i][j] for j in range(0, len(self.M[i]))]
-                           for i in range(0, len(self.M))])
+        self._PushCopyOfM()
         #  The "Right" and "Left" refer to whether the new matrix is multiplied
         #  on the right or left side of the culmulatie matrix product.
         # Afterwards, self._tmp = M * self.M
@@ -210,8 +232,20 @@ class AffineStack(object):
 
         CopyMat(self.M, self._tmp)          # Copy self.tmp into self.M
 
+    def _PushCopyOfM(self):
+        # Push a copy of self.M onto the stack.  To avoid allocating new
+        # lists every time, re-use the storage of a previously popped matrix.
+        if len(self._unused) > 0:
+            M_copy = self._unused.pop()
+            CopyMat(M_copy, self.M)
+        else:
+            M_copy = [row[:] for row in self.M]
+        self.stack.append(M_copy)
+
     def Pop(self):
-        CopyMat(self.M, self.stack.pop())
+        M_prev = self.stack.pop()
+        CopyMat(self.M, M_prev)
+        self._unused.append(M_prev)
         #  (No need to return a matrix,"self.M",after popping.
         #   The caller can directly access self.M later.)
         # return self.M
@@ -249,10 +283,37 @@ class AffineStack(object):
     def __len__(self):
         return 1 + len(self.stack)
 
+    # The same transformation strings (eg. "move(3.1,0,0)") are typically
+    # converted into matrices many times (once for every instance of a class
+    # in an array).  CommandsToMatrix() remembers the most recently used ones.
+    # (Keys are strings.  Values are 3x4 matrices stored as tuples.)
+    matrix_cache = OrderedDict()
+    matrix_cache_size = 4096
+
     @staticmethod
     def CommandsToMatrix(text,  # text containing affine transformation commands
                          src_loc=OSrcLoc(),   # for debugging
                          xcm=None):  # position of center of object
+        # Commands which depend on the center of mass (xcm), or which
+        # use random numbers (and reset the random seed), are not cached.
+        cache = AffineStack.matrix_cache
+        if (xcm is None) and (text.find('_rand(') == -1):
+            M = cache.pop(text, None)
+            if M is None:
+                Mdest = AffineStack._CommandsToMatrix(text, src_loc, xcm)
+                M = tuple([tuple(row) for row in Mdest])
+                if len(cache) >= AffineStack.matrix_cache_size:
+                    cache.popitem(last=False)  # discard the oldest entry
+            else:
+                Mdest = [list(row) for row in M]
+            cache[text] = M  # (The most recently used entries are last.)
+            return Mdest
+        return AffineStack._CommandsToMatrix(text, src_loc, xcm)
+
+    @staticmethod
+    def _CommandsToMatrix(text,  # text containing affine transformation commands
+                          src_loc=OSrcLoc(),   # for debugging
+                          xcm=None):  # position of center of object
         Mdest = [[1.0, 0.0, 0.0, 0.0], [
             0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0]]
         M = [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0]]
@@ -692,6 +753,7 @@ class MultiAffineStack(object):
     def __init__(self, which_stack=None):
         self.tot_stack = None
         self.stack_lookup = None
+        self.stack_levels = None
         self.stack_keys = None
         self.stacks = None
         self.M = None
@@ -702,23 +764,32 @@ class MultiAffineStack(object):
     def Clear(self):
         self.tot_stack = AffineStack()
         self.stack_lookup = {}
+        self.stack_levels = {}  # the position of each stack in self.stacks
         self.stack_keys = deque([])
         self.stacks = deque([])
         self.M = self.tot_stack.M
         self.error_if_substack_empty = False
         self.coord_files = {}
 
-    def _Update(self):
-        self.tot_stack.Clear()
-        self.M = self.tot_stack.M
+    def _Update(self, level=0):
+        """ Recompute self.M (the product of the matrices from every stack in
+        self.stacks), after the matrices in self.stacks[level:] were modified.
+        self.tot_stack.stack[i] contains the product of the first i matrices.
+        These partial products are still valid for i <= level, so only the
+        products for the remaining stacks need to be recomputed.
+
+        """
         assert(len(self.stacks) > 0)
-        for stack in self.stacks:
-            self.tot_stack.PushRight(stack.M)
+        while len(self.tot_stack.stack) > level:
+            self.tot_stack.PopRight()
+        for i in range(level, len(self.stacks)):
+            self.tot_stack.PushRight(self.stacks[i].M)
 
     def PushStack(self, which_stack):
         stack = AffineStack()
         self.stack_keys.append(which_stack)
         self.stack_lookup[which_stack] = stack
+        self.stack_levels[which_stack] = len(self.stacks)
         self.stacks.append(stack)
         self.tot_stack.PushRight(stack.M)
 
@@ -727,6 +798,7 @@ class MultiAffineStack(object):
         self.tot_stack.PopRight()
         which_stack = self.stack_keys.pop()
         del self.stack_lookup[which_stack]
+        del self.stack_levels[which_stack]
         self.stacks.pop()
 
     def Push(self, M, which_stack=None, right_not_left=True):
@@ -734,25 +806,19 @@ class MultiAffineStack(object):
             self.PushStack(which_stack)
         if which_stack == None:
             stack = self.stacks[-1]
-            if right_not_left:
-                # This should copy the matrix M into stack.M
-                stack.PushRight(M)
-            else:
-                stack.PushLeft(M)
+            level = len(self.stacks) - 1
         else:
             stack = self.stack_lookup[which_stack]
-            if right_not_left:
-                stack.PushRight(M)
-            else:
-                stack.PushLeft(M)
-        if stack == self.stacks[-1]:
-            self.tot_stack.PopRight()  # Replace the last matrix on self.tot_stack
-            # Note: Always use tot_stack.PopRight (even if
-            # right_not_left=False)
-            self.tot_stack.PushRight(stack.M)  # with the the updated version.
-            # Note: We could call self._Update(M) here, but that is slower.
+            level = self.stack_levels[which_stack]
+        if right_not_left:
+            # This should copy the matrix M into stack.M
+            stack.PushRight(M)
         else:
-            self._Update()
+            stack.PushLeft(M)
+        # Only the products which include this stack need to be updated.
+        # (If this stack is the last one, this means replacing the last matrix
+        #  on self.tot_stack with the updated version.)
+        self._Update(level)
 
     def PushRight(self, M, which_stack=None):
         self.Push(M, which_stack, right_not_left=True)
@@ -798,12 +864,9 @@ class MultiAffineStack(object):
                     stack.PopRight()
                 else:
                     stack.PopLeft()
-                # Note: We could call self._Update(M) here, but that is slower
-                self.tot_stack.PopRight()  # Replace the last matrix on self.tot_stack
-                # Note: Always use tot_stack.PopRight (even if
-                # right_not_left=False)
+                # Replace the last matrix on self.tot_stack
                 # with the the updated version.
-                self.tot_stack.PushRight(stack.M)
+                self._Update(len(self.stacks) - 1)
             else:
                 assert(False)
             # OPTIONAL CODE BELOW AUTOMATICALLY INVOKES self.PopStack() WHEN
@@ -824,7 +887,7 @@ class MultiAffineStack(object):
                     stack.PopRight()
                 else:
                     stack.PopLeft()
-                self._Update()
+                self._Update(self.stack_levels[which_stack])
             else:
                 assert(False)
                 #empty_stack_error = True
@@ -866,19 +929,26 @@ def RotMatAXYZ(dest, angle, axis_x, axis_y, axis_z):
     #    on second thought, let the caller worry about angle units.
     c = math.cos(angle)
     s = math.sin(angle)
+    t = 1 - c
+    XYt = X * Y * t
+    XZt = X * Z * t
+    YZt = Y * Z * t
+    Xs = X * s
+    Ys = Y * s
+    Zs = Z * s
 
-    dest[0][0] = X * X * (1 - c) + c
-    dest[1][1] = Y * Y * (1 - c) + c
-    dest[2][2] = Z * Z * (1 - c) + c
+    dest[0][0] = X * X * t + c
+    dest[1][1] = Y * Y * t + c
+    dest[2][2] = Z * Z * t + c
 
-    dest[0][1] = X * Y * (1 - c) - Z * s
-    dest[0][2] = X * Z * (1 - c) + Y * s
+    dest[0][1] = XYt - Zs
+    dest[0][2] = XZt + Ys
 
-    dest[1][0] = Y * X * (1 - c) + Z * s
-    dest[2][0] = Z * X * (1 - c) - Y * s
+    dest[1][0] = XYt + Zs
+    dest[2][0] = XZt - Ys
 
-    dest[1][2] = Y * Z * (1 - c) - X * s
-    dest[2][1] = Z * Y * (1 - c) + X * s
+    dest[1][2] = YZt - Xs
+    dest[2][1] = YZt + Xs
 
     #   formula from these sources:
     # http://inside.mines.edu/~gmurray/ArbitraryAxisRotation/
@@ -934,19 +1004,19 @@ def Normalize(dest, source):
 def RotMatXYZXYZ(dest,
                  xold, yold, zold,
                  xnew, ynew, znew):
-    A = [xold, yold, zold]
-    B = [xnew, ynew, znew]
-    axis = [0.0, 0.0, 0.0]
-    CrossProd(axis, A, B)
-    La = Length(A)
-    Lb = Length(B)
-    Lc = Length(axis)
-    sinAng = Lc / (La * Lb)
-    cosAng = DotProd(A, B) / (La * Lb)
+    # This is equivalent to:
+    #   axis = CrossProd(A, B), angle = the angle between A and B
+    # (written out without temporary lists because it is invoked often)
+    ax = yold * znew - ynew * zold
+    ay = zold * xnew - znew * xold
+    az = xold * ynew - xnew * yold
+    Lc = math.sqrt(ax * ax + ay * ay + az * az)
     if Lc > 0.0:
-        Normalize(axis, axis)
+        LaLb = (math.sqrt(xold * xold + yold * yold + zold * zold) *
+                math.sqrt(xnew * xnew + ynew * ynew + znew * znew))
+        sinAng = Lc / LaLb
+        cosAng = (xold * xnew + yold * ynew + zold * znew) / LaLb
         angle = math.atan2(sinAng, cosAng)
+        RotMatAXYZ(dest, angle, ax / Lc, ay / Lc, az / Lc)
     else:
-        axis = [1.0, 0.0, 0.0]
-        angle = 0.0
-    RotMatAXYZ(dest, angle, axis[0], axis[1], axis[2])
+        RotMatAXYZ(dest, 0.0, 1.0, 0.0, 0.0)
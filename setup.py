@@ -57,6 +57,7 @@ setup(
         'ettree.py=moltemplate.ettree:main',
         'genpoly.py=moltemplate.ettree:main',
         'ltemplify.py=moltemplate.ltemplify:main',
+        'ltffdb.py=moltemplate.ltffdb:main',
         'lttree.py=moltemplate.lttree:main',
         'lttree_check.py=moltemplate.lttree_check:main',
         'lttree_postprocess.py=moltemplate.lttree_postprocess:main',
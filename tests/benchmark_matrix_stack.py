@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+"""
+   A micro-benchmark for the matrix stack (ttree_matrix_stack.py) used by
+   lttree.py to move and rotate atoms.  It mimics the sequence of matrix-stack
+   operations that lttree.py performs for a deeply nested system:
+   a 3-dimensional lattice of proteins, each containing residues,
+   each containing atoms.  (The lattice is created by an array command
+   similar to "proteins = new Protein [n].move(...) [n].move(...) ...",
+   so these move() commands modify the stack of the outermost object.)
+
+   Usage:
+
+   python benchmark_matrix_stack.py [n_lattice [n_residues [n_atoms]]]
+
+   The program prints the time taken, as well as a checksum of the atom
+   coordinates (which should not change if ttree_matrix_stack.py is modified).
+
+"""
+
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from moltemplate.ttree_matrix_stack import MultiAffineStack, AffineTransform
+
+
+def Run(n_lattice, n_residues, n_atoms):
+    matrix_stack = MultiAffineStack()
+    matrix_stack.PushStack('/')
+    x_new = [0.0, 0.0, 0.0]
+    checksum = 0.0
+    for i in range(0, n_lattice):
+        for j in range(0, n_lattice):
+            for k in range(0, n_lattice):
+                protein = ('proteins', i, j, k)
+                matrix_stack.PushStack(protein)
+                # The array commands ".move()" belong to the outer object.
+                matrix_stack.PushCommandsRight('move(50.0,0,0)', which_stack='/')
+                matrix_stack.PushCommandsRight('move(0,50.0,0)', which_stack='/')
+                matrix_stack.PushCommandsRight('move(0,0,50.0)', which_stack='/')
+                for r in range(0, n_residues):
+                    residue = protein + (r,)
+                    matrix_stack.PushStack(residue)
+                    # Each residue in a helix is rotated and moved
+                    matrix_stack.PushCommandsRight('rot(100,0,0,1).move(0,0,1.5)',
+                                                   which_stack=protein)
+                    for a in range(0, n_atoms):
+                        AffineTransform(x_new, matrix_stack.M,
+                                        [1.0 + 0.1 * a, 0.5, 0.0])
+                        checksum += x_new[0] + x_new[1] + x_new[2]
+                    matrix_stack.PopStack()
+                for r in range(0, n_residues):
+                    matrix_stack.Pop(which_stack=protein)
+                matrix_stack.Pop(which_stack='/')
+                matrix_stack.Pop(which_stack='/')
+                matrix_stack.Pop(which_stack='/')
+                matrix_stack.PopStack()
+    return checksum
+
+
+def main():
+    n_lattice = 6
+    n_residues = 40
+    n_atoms = 10
+    if len(sys.argv) > 1:
+        n_lattice = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        n_residues = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        n_atoms = int(sys.argv[3])
+    t_start = time.time()
+    checksum = Run(n_lattice, n_residues, n_atoms)
+    sys.stdout.write('lattice=' + str(n_lattice) + '^3, residues=' +
+                     str(n_residues) + ', atoms=' + str(n_atoms) + ': ' +
+                     ('%.3f' % (time.time() - t_start)) + ' s, checksum=' +
+                     repr(checksum) + '\n')
+
+
+if __name__ == '__main__':
+    main()